@@ -0,0 +1,288 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  Synchronous capture from several input devices
+#                        (1) each device has its own record stream, its callback copies chunks into the ring buffer of the device
+#                        (2) the aligner follows the first device (the reference), it cuts the chunks of the other devices
+#                            at the ADC time of each reference chunk and merges all channels into one chunk
+#                        (3) late, missing and overflowed chunks are counted per device, missing samples are zeros
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   devices = [MaintletInputDevice('seeed', channelCount=8, channelOffset=0, deviceIndex=1),
+#              MaintletInputDevice('seeed', channelCount=8, channelOffset=8, deviceIndex=2)]
+#   for device in devices:
+#       device.ringBuffer = MaintletRingBuffer(slotCount=50, slotSizeInByte=frameCount * device.channelCount * sampleWidth)
+#       ... record callback of the device: device.ringBuffer.write(in_data, adcTime, status) ...
+#   aligner = MaintletDeviceAligner(devices, sampleWidth=2, frameCount=4800, samplingRate=48000,
+#                                   outRingBuffer=recordRingBuffer, maxWait=0.5)
+#   aligner.start() ... aligner.stop()
+#
+#   The merged chunk has the channels of device 0, then the channels of device 1, ... and the ADC time of the reference chunk.
+#   All devices must run at the same sampling rate and chunk size, their ADC times must come from the same clock
+#   (PortAudio on ALSA uses CLOCK_MONOTONIC for every device).
+#==========================================================================
+
+import collections
+import threading
+import numpy as np
+from MaintletLog import logger
+
+class MaintletInputDevice:
+    def __init__(self, name, channelCount, channelOffset, deviceIndex):
+        """
+        An input device and the state of its record stream
+
+        Args:
+            name (str): The device name (or a part of it).
+            channelCount (int): The number of channels captured from the device.
+            channelOffset (int): The index of the first channel of the device in the merged chunk.
+            deviceIndex (int): The index of the device in the capture backend.
+        """
+        self.name = name
+        self.channelCount = int(channelCount)
+        self.channelOffset = int(channelOffset)
+        self.deviceIndex = deviceIndex
+        self.ringBuffer = None # the ring buffer written by the record callback of the device
+        self.stream = None
+        self.prevADCTime = -1 # for autoRetry
+        self.totalCallback = 0
+        self.totalOverflow = 0 # callbacks with a non-zero status
+        self.totalDroppedFrame = 0 # frames missing between two callbacks (ADC time delta)
+
+    def getStatus(self):
+        """
+        Get the statistics of the device
+
+        Returns:
+            dict: statistics
+        """
+        status = {}
+        status['name'] = self.name
+        status['channels'] = f"{self.channelOffset}-{self.channelOffset + self.channelCount - 1}"
+        status['totalCallback'] = self.totalCallback
+        status['totalOverflow'] = self.totalOverflow
+        status['totalDroppedFrame'] = self.totalDroppedFrame
+        return status
+
+
+class MaintletDeviceAligner:
+    def __init__(self, devices, sampleWidth, frameCount, samplingRate, outRingBuffer, maxWait=0.5):
+        """
+        Init the aligner, a reader is registered in the ring buffer of every device
+
+        Args:
+            devices (list): MaintletInputDevice with a ring buffer, devices[0] is the reference.
+            sampleWidth (int): The sample width in byte.
+            frameCount (int): The number of frames of a chunk.
+            samplingRate (int): The sampling rate of all devices.
+            outRingBuffer (MaintletRingBuffer): The ring buffer of merged chunks.
+            maxWait (float, optional): Seconds to wait for the chunk of a device before its samples are zeros. Defaults to 0.5.
+        """
+        self.devices = devices
+        self.sampleWidth = sampleWidth
+        self.frameCount = frameCount
+        self.samplingRate = samplingRate
+        self.outRingBuffer = outRingBuffer
+        self.maxWait = maxWait
+        self.chunkDuration = frameCount / samplingRate
+        self.tolerance = 0.5 / samplingRate # ADC times closer than half a frame are the same frame
+        self.readers = [device.ringBuffer.registerReader("deviceAligner") for device in devices]
+        self.history = [collections.deque() for device in devices] # fetched (seq, adcTime) of each device
+        self.channelCount = sum(device.channelCount for device in devices)
+        self.outBuffer = bytearray(frameCount * self.channelCount * sampleWidth)
+        self.outArray = np.frombuffer(self.outBuffer, dtype=np.uint8).reshape(frameCount, self.channelCount * sampleWidth)
+        # per device accounting
+        self.totalLateChunk = [0] * len(devices) # the chunk did not arrive within maxWait
+        self.totalMissingChunk = [0] * len(devices) # no chunk covers the reference time (e.g., the device started late)
+        self.totalSkippedChunk = [0] * len(devices) # chunks older than the reference time (e.g., the device clock runs fast)
+        self.totalInvalidChunk = [0] * len(devices) # chunks overwritten while they were copied
+        self.totalMergedChunk = 0
+        self.deviceOffsets = [0] * len(devices) # frames a device chunk starts before the reference chunk (negative: after)
+        self.isResetRequested = False
+        self.thread = None
+        self.stopThread = False
+
+    def start(self):
+        """ Start the aligner thread """
+        self.stopThread = False
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+        self.thread.name = 'deviceAligner'
+        self.thread.start()
+
+    def stop(self):
+        """ Stop the aligner thread """
+        self.stopThread = True
+        if self.thread != None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def reset(self):
+        """ Forget the fetched chunks (e.g., the record streams were reopened), done by the aligner thread """
+        self.isResetRequested = True
+
+    def loop(self):
+        """ The thread routine of the aligner """
+        referenceReader = self.readers[0]
+        while self.stopThread == False:
+            if self.isResetRequested:
+                self.isResetRequested = False
+                for history in self.history:
+                    history.clear()
+            seq = referenceReader.next(timeout=0.5)
+            if seq is None:
+                continue
+            self.mergeChunk(seq)
+
+    def fetch(self, deviceId, timeout):
+        """ Fetch the next chunk of a device into its history, return False if it does not arrive in time """
+        reader = self.readers[deviceId]
+        seq = reader.next(timeout=timeout)
+        if seq is None:
+            return False
+        self.history[deviceId].append((seq, reader.ringBuffer.getSlotAdcTime(seq)))
+        return True
+
+    def mergeChunk(self, referenceSeq):
+        """
+        Merge the chunks of all devices at the ADC time of a reference chunk and write the merged chunk
+
+        Args:
+            referenceSeq (int): The sequence number of the reference chunk.
+        """
+        referenceRing = self.readers[0].ringBuffer
+        adcTime = referenceRing.getSlotAdcTime(referenceSeq)
+        status = referenceRing.getSlotStatus(referenceSeq)
+        self.copyFrames(0, referenceSeq, 0, 0, self.frameCount)
+        if not referenceRing.isValid(referenceSeq):
+            self.totalInvalidChunk[0] += 1
+            return
+        for deviceId in range(1, len(self.devices)):
+            status |= self.mergeDevice(deviceId, adcTime)
+        self.outRingBuffer.write(self.outBuffer, adcTime, status)
+        self.totalMergedChunk += 1
+
+    def mergeDevice(self, deviceId, adcTime):
+        """
+        Copy the frames of a device from adcTime to adcTime + chunkDuration into the merged chunk
+
+        Returns:
+            int: The status of the used chunks.
+        """
+        history = self.history[deviceId]
+        # fetch until a chunk starts at or after adcTime
+        while len(history) == 0 or history[-1][1] < adcTime - self.tolerance:
+            if not self.fetch(deviceId, self.maxWait):
+                self.totalLateChunk[deviceId] += 1
+                self.fillZeros(deviceId, 0, self.frameCount)
+                return 0
+        # the chunk which contains adcTime
+        while len(history) > 1 and history[1][1] <= adcTime + self.tolerance:
+            history.popleft()
+            self.totalSkippedChunk[deviceId] += 1
+        seq, chunkAdcTime = history[0]
+        if chunkAdcTime > adcTime + self.tolerance:
+            # the device has no data at adcTime, its first frames are zeros
+            self.totalMissingChunk[deviceId] += 1
+            offset = min(int(round((chunkAdcTime - adcTime) * self.samplingRate)), self.frameCount)
+            self.updateOffset(deviceId, -offset)
+            self.fillZeros(deviceId, 0, offset)
+            self.copyFrames(deviceId, seq, 0, offset, self.frameCount - offset)
+            return self.readers[deviceId].ringBuffer.getSlotStatus(seq)
+
+        # the chunk starts offset frames before adcTime, the rest comes from the next chunk
+        offset = min(int(round((adcTime - chunkAdcTime) * self.samplingRate)), self.frameCount)
+        self.updateOffset(deviceId, offset)
+        ringBuffer = self.readers[deviceId].ringBuffer
+        status = ringBuffer.getSlotStatus(seq)
+        self.copyFrames(deviceId, seq, offset, 0, self.frameCount - offset)
+        if offset == 0:
+            history.popleft()
+            return status
+        if len(history) < 2 and not self.fetch(deviceId, self.maxWait):
+            self.totalLateChunk[deviceId] += 1
+            self.fillZeros(deviceId, self.frameCount - offset, offset)
+            return status
+        history.popleft()
+        nextSeq = history[0][0]
+        self.copyFrames(deviceId, nextSeq, 0, self.frameCount - offset, offset)
+        return status | ringBuffer.getSlotStatus(nextSeq)
+
+    def updateOffset(self, deviceId, offset):
+        """ Log the alignment offset of a device when it changes (e.g., the device was restarted or its clock drifts) """
+        if offset == self.deviceOffsets[deviceId]:
+            return
+        logger.info(f"DeviceAligner: the chunks of {self.devices[deviceId].name} (device {deviceId}) start {offset} frames "
+                    f"({round(offset / self.samplingRate * 1e3, 3)} ms) before the reference chunks (was {self.deviceOffsets[deviceId]})")
+        self.deviceOffsets[deviceId] = offset
+
+    def copyFrames(self, deviceId, seq, start, outStart, count):
+        """ Copy count frames of a device chunk from frame start into the merged chunk at frame outStart """
+        if count <= 0:
+            return
+        device = self.devices[deviceId]
+        reader = self.readers[deviceId]
+        frameSize = device.channelCount * self.sampleWidth
+        chunk = np.frombuffer(reader.getSlot(seq), dtype=np.uint8)[:self.frameCount * frameSize].reshape(self.frameCount, frameSize)
+        column = device.channelOffset * self.sampleWidth
+        self.outArray[outStart:outStart + count, column:column + frameSize] = chunk[start:start + count]
+        if not reader.isValid(seq):
+            self.totalInvalidChunk[deviceId] += 1
+
+    def fillZeros(self, deviceId, outStart, count):
+        """ Fill count frames of a device in the merged chunk with zeros """
+        device = self.devices[deviceId]
+        column = device.channelOffset * self.sampleWidth
+        self.outArray[outStart:outStart + count, column:column + device.channelCount * self.sampleWidth] = 0
+
+    def getStatus(self):
+        """
+        Get the statistics of the aligner and all devices
+
+        Returns:
+            dict: statistics
+        """
+        status = {}
+        status['totalMergedChunk'] = self.totalMergedChunk
+        devices = []
+        for deviceId, device in enumerate(self.devices):
+            deviceStatus = device.getStatus()
+            deviceStatus['totalLateChunk'] = self.totalLateChunk[deviceId]
+            deviceStatus['totalMissingChunk'] = self.totalMissingChunk[deviceId]
+            deviceStatus['totalSkippedChunk'] = self.totalSkippedChunk[deviceId]
+            deviceStatus['totalInvalidChunk'] = self.totalInvalidChunk[deviceId]
+            deviceStatus['offset'] = self.deviceOffsets[deviceId]
+            deviceStatus['totalLostSlot'] = self.readers[deviceId].totalLostSlot
+            devices.append(deviceStatus)
+        status['devices'] = devices
+        return status
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    from MaintletRingBuffer import MaintletRingBuffer
+    samplingRate, frameCount, sampleWidth = 1000, 100, 2
+    # two devices sample the same ramp (one value per frame), device 1 starts 37 frames later
+    devices = [MaintletInputDevice('a', 2, 0, 0), MaintletInputDevice('b', 1, 2, 1)]
+    for device in devices:
+        device.ringBuffer = MaintletRingBuffer(slotCount=10, slotSizeInByte=frameCount * device.channelCount * sampleWidth)
+    outRingBuffer = MaintletRingBuffer(slotCount=10, slotSizeInByte=frameCount * 3 * sampleWidth)
+    outReader = outRingBuffer.registerReader("test")
+    aligner = MaintletDeviceAligner(devices, sampleWidth, frameCount, samplingRate, outRingBuffer, maxWait=0.1)
+    def chunkOf(firstFrame, channelCount):
+        return np.repeat(np.arange(firstFrame, firstFrame + frameCount, dtype='<i2')[:, None], channelCount, axis=1).tobytes()
+    for i in range(5):
+        devices[0].ringBuffer.write(chunkOf(i * frameCount, 2), adcTime=i * frameCount / samplingRate, status=0)
+        devices[1].ringBuffer.write(chunkOf(i * frameCount + 37, 1), adcTime=(i * frameCount + 37) / samplingRate, status=0)
+    for i in range(4):
+        aligner.mergeChunk(aligner.readers[0].next(timeout=0))
+        merged = np.frombuffer(outRingBuffer.getSlot(outReader.next(timeout=0)), dtype='<i2').reshape(frameCount, 3)
+        # aligned channels have the same value in every frame (zeros before device 1 starts)
+        print(i, merged[0], merged[-1], np.all((merged[:, 2] == merged[:, 0]) | (merged[:, 2] == 0)))
+    print(aligner.getStatus())
+#============================= END OF TEST CODE ==============================
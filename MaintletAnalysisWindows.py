@@ -0,0 +1,205 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  Overlapping analysis windows of the continuous record mode
+#                        (1) the producer (data collection process) follows the shared record ring buffer and
+#                            sends a small descriptor for every window (window length and hop in chunks)
+#                        (2) the consumer (data analysis process) reads the window directly in the shared ring buffer,
+#                            no sample data is copied between processes or written to files for the analysis
+#                        (3) analysis windows are independent of the recorded files
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   1. Data collection: a shared ring buffer with windowChunkCount - 1 mirror slots
+#       ringBuffer = MaintletRingBuffer(slotCount, slotSizeInByte, mirrorSlotCount=windowChunkCount - 1, shared=True)
+#       producer = MaintletAnalysisWindowProducer(ringBuffer.registerReader("analysisWindows"), windowChunkCount=10,
+#                                                 hopChunkCount=5, outQ=dataCollectionToDataAnalysisQ, clock=clock,
+#                                                 gapDetector=gapDetector)
+#       producer.start() ... producer.stop()
+#   2. Data analysis
+#       consumer = MaintletAnalysisWindowConsumer()
+#       y, unixTime = consumer.read(message.payload, sampleWidth=2, channelCount=8)  # None if the window was overwritten
+#==========================================================================
+
+import threading
+from MaintletLog import logger
+from MaintletMessage import MaintletMessage
+from MaintletRingBuffer import MaintletSharedRingBufferView
+from MaintletPCM import decodePCM
+
+class MaintletAnalysisWindowProducer:
+    def __init__(self, reader, windowChunkCount, hopChunkCount, outQ, clock=None, gapDetector=None):
+        """
+        Init the window producer
+
+        Args:
+            reader (MaintletRingBufferReader): The reader of a shared record ring buffer.
+            windowChunkCount (int): The length of a window in chunks.
+            hopChunkCount (int): The distance between the starts of two windows in chunks (windowChunkCount / 2 is a 50% overlap).
+            outQ (multiprocessing.Queue): The queue of window descriptors (MaintletMessage 'analysisWindow').
+            clock (MaintletClock, optional): Maps the ADC time to the unix time. Defaults to None (the ADC time is sent).
+            gapDetector (MaintletGapDetector, optional): Finds the discontinuities of each window. Defaults to None (no gaps are sent).
+        """
+        self.reader = reader
+        self.ringDescriptor = reader.ringBuffer.getSharedDescriptor()
+        if self.ringDescriptor == None:
+            raise ValueError("Analysis windows need a shared ring buffer")
+        if windowChunkCount > self.ringDescriptor['mirrorSlotCount'] + 1:
+            raise ValueError(f"A window of {windowChunkCount} chunks needs {windowChunkCount - 1} mirror slots")
+        self.windowChunkCount = int(windowChunkCount)
+        self.hopChunkCount = max(int(hopChunkCount), 1)
+        self.outQ = outQ
+        self.clock = clock
+        self.gapDetector = gapDetector
+        self.nextWindowSeq = None # the first chunk of the next window
+        self.totalWindow = 0
+        self.thread = None
+        self.stopThread = False
+
+    def start(self):
+        """ Start the producer thread """
+        self.stopThread = False
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+        self.thread.name = 'analysisWindows'
+        self.thread.start()
+
+    def stop(self):
+        """ Stop the producer thread """
+        self.stopThread = True
+        if self.thread != None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def loop(self):
+        """ The thread routine of the producer """
+        while self.stopThread == False:
+            seq = self.reader.next(timeout=0.5)
+            if seq is None:
+                continue
+            self.processChunk(seq)
+
+    def processChunk(self, seq):
+        """
+        Send the descriptor of the window which ends at a chunk (if any)
+
+        Args:
+            seq (int): The sequence number of the latest chunk.
+        """
+        if self.nextWindowSeq == None or seq - self.nextWindowSeq >= self.reader.ringBuffer.slotCount:
+            # the first chunk, or chunks were lost
+            self.nextWindowSeq = seq
+        if seq - self.nextWindowSeq + 1 < self.windowChunkCount:
+            return
+        windowSeq = self.nextWindowSeq
+        self.nextWindowSeq += self.hopChunkCount
+        descriptor = {}
+        descriptor['ring'] = self.ringDescriptor
+        descriptor['seq'] = windowSeq
+        descriptor['chunkCount'] = self.windowChunkCount
+        adcTime = self.reader.ringBuffer.getSlotAdcTime(windowSeq)
+        descriptor['unixTime'] = self.clock.toUnixTime(adcTime) if self.clock != None else adcTime
+        # (offset, length) in frames from the start of the window
+        descriptor['gaps'] = self.gapDetector.findGaps(self.reader.ringBuffer, windowSeq, self.windowChunkCount) if self.gapDetector != None else []
+        self.outQ.put(MaintletMessage('analysisWindow', descriptor))
+        self.totalWindow += 1
+
+    def getStatus(self):
+        """
+        Get the statistics of the producer
+
+        Returns:
+            dict: statistics
+        """
+        status = {}
+        status['totalWindow'] = self.totalWindow
+        status.update(self.reader.getStatus())
+        return status
+
+
+class MaintletAnalysisWindowConsumer:
+    def __init__(self):
+        """ Init the window consumer, the shared ring buffer is attached at the first window """
+        self.view = None
+        self.totalWindow = 0
+        self.totalInvalidWindow = 0 # windows overwritten before (or while) we read them
+
+    def read(self, descriptor, sampleWidth, channelCount, channelIndices=None):
+        """
+        Read a window in the shared ring buffer
+
+        Args:
+            descriptor (dict): The payload of an 'analysisWindow' message.
+            sampleWidth (int): The sample width in byte.
+            channelCount (int): The number of captured channels.
+            channelIndices (list, optional): Captured channels to return. Defaults to None (all channels).
+
+        Returns:
+            tuple: (float32 samples with shape (frameCount, len(channelIndices)), unix time of the first sample),
+                   None if the window is not in the ring buffer anymore (overwritten, or its ring buffer is closed).
+        """
+        ringDescriptor = descriptor['ring']
+        if self.view == None or self.view.name != ringDescriptor['name']:
+            # the data collection module creates a new ring buffer after a restart
+            if self.view != None:
+                self.view.close()
+                self.view = None
+            try:
+                self.view = MaintletSharedRingBufferView(ringDescriptor)
+            except FileNotFoundError:
+                # a window of a ring buffer which was freed by the restart (it was queued before the restart)
+                self.totalWindow += 1
+                self.totalInvalidWindow += 1
+                logger.warning(f"Analysis window {descriptor['seq']} is in a closed ring buffer {ringDescriptor['name']} (total: {self.totalInvalidWindow})")
+                return None
+        seq = descriptor['seq']
+        chunkCount = descriptor['chunkCount']
+        self.totalWindow += 1
+        if not self.view.isValid(seq):
+            self.totalInvalidWindow += 1
+            logger.warning(f"Analysis window {seq} is overwritten before we read it (total: {self.totalInvalidWindow})")
+            return None
+        # decodePCM copies the samples out of the shared memory
+        y = decodePCM(self.view.getWindow(seq, chunkCount), sampleWidth, channelCount, asFloat=True)
+        if channelIndices != None:
+            y = y[:, channelIndices]
+        if not self.view.isValid(seq):
+            self.totalInvalidWindow += 1
+            logger.warning(f"Analysis window {seq} is overwritten while we read it (total: {self.totalInvalidWindow})")
+            return None
+        return y, descriptor['unixTime']
+
+    def close(self):
+        """ Detach from the shared ring buffer """
+        if self.view != None:
+            self.view.close()
+            self.view = None
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    import queue
+    import numpy as np
+    from MaintletRingBuffer import MaintletRingBuffer
+    channelCount, recordChunk, sampleWidth = 2, 480, 2
+    ringBuffer = MaintletRingBuffer(slotCount=20, slotSizeInByte=recordChunk * channelCount * sampleWidth, mirrorSlotCount=3, shared=True)
+    outQ = queue.Queue()
+    producer = MaintletAnalysisWindowProducer(ringBuffer.registerReader("analysisWindows"), windowChunkCount=4, hopChunkCount=2, outQ=outQ)
+    consumer = MaintletAnalysisWindowConsumer()
+    for i in range(30):
+        ringBuffer.write(np.full((recordChunk, channelCount), i, dtype='<i2').tobytes(), adcTime=i * 0.01, status=0)
+        producer.processChunk(producer.reader.next(timeout=0))
+        while not outQ.empty():
+            message = outQ.get()
+            y, unixTime = consumer.read(message.payload, sampleWidth, channelCount, channelIndices=[1])
+            # chunk values of the window (as integers)
+            print(message.payload['seq'], round(unixTime, 2), np.unique(np.round(y[:, 0] * 32768)).astype(int))
+    consumer.close()
+    ringBuffer.close()
+    # a window queued before a restart, its ring buffer is freed
+    print(consumer.read(message.payload, sampleWidth, channelCount), consumer.totalInvalidWindow)
+#============================= END OF TEST CODE ==============================
@@ -0,0 +1,393 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  Pluggable capture backends of the data collection module
+#                        (1) pyaudio : the audio interface on the Raspberry Pi (PortAudio, gpiozero)
+#                        (2) virtual : a headless device which replays WAV files or synthetic signals at 1x - Nx real time
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   backend = createCaptureBackend(config['recordingConfig'])
+#   deviceIndex = backend.getDeviceIndex("seeed")
+#   stream = backend.openInputStream(rate=48000, channels=8, sampleWidth=2, deviceIndex=deviceIndex,
+#                                    framesPerBuffer=4800, callback=recordCallback)
+#   ...
+#   stream.stop_stream()
+#   stream.close()
+#   backend.terminate()
+#
+#   Both backends call callback(in_data, frame_count, time_info, status) with the same arguments as PyAudio.
+#   time_info['input_buffer_adc_time'] is in seconds since boot, readClocks() samples it with the unix time (see MaintletClock).
+#   The callback returns (out_data, flag), flag is one of paContinue, paComplete and paAbort.
+#==========================================================================
+
+import glob
+import threading
+import time
+import wave
+import numpy as np
+from MaintletLog import logger
+from MaintletError import *
+from MaintletPCM import decodePCM, getFullScale
+
+# the hardware modules only exist on the Raspberry Pi
+try:
+    import pyaudio
+except ImportError:
+    pyaudio = None
+try:
+    from gpiozero import CPUTemperature
+except ImportError:
+    CPUTemperature = None
+
+# callback return flags, same values as PortAudio
+paContinue = 0
+paComplete = 1
+paAbort = 2
+
+def createCaptureBackend(recordingConfig):
+    """
+    Create the capture backend selected in the recording config
+
+    Args:
+        recordingConfig (dict): config['recordingConfig'].
+
+    Returns:
+        MaintletPyAudioBackend or MaintletVirtualBackend: The backend object.
+    """
+    backendName = recordingConfig.get('captureBackend', 'pyaudio')
+    if backendName == 'pyaudio':
+        return MaintletPyAudioBackend()
+    elif backendName == 'virtual':
+        return MaintletVirtualBackend(source=recordingConfig['virtualSource'],
+                                      files=recordingConfig['virtualFiles'],
+                                      speed=recordingConfig['virtualSpeed'])
+    raise CaptureBackendError(backendName)
+
+#===========================================================================
+#                            PyAudio Backend
+#===========================================================================
+class MaintletPyAudioBackend:
+    """ The audio interface of the Raspberry Pi """
+
+    def __init__(self):
+        if pyaudio == None:
+            raise CaptureBackendError("pyaudio (module not installed)")
+        self.pyaudio = pyaudio.PyAudio()
+        self.cpuTemperature = CPUTemperature() if CPUTemperature != None else None
+
+    def getDeviceIndex(self, targetDeviceName, excludedIndices=()):
+        """
+        get the system index given index name or part of the name
+
+        Args:
+            targetDeviceName (str): output device: ac101; input device: seeed
+            excludedIndices (tuple, optional): Indices already in use, e.g., the first of two identical HATs. Defaults to ().
+
+        Returns:
+            int: the index of the device
+        """
+        info = self.pyaudio.get_host_api_info_by_index(0)
+        numdevices = info.get('deviceCount')
+
+        for i in range(0, numdevices):
+            deviceName = self.pyaudio.get_device_info_by_host_api_device_index(0, i).get('name')
+            print(deviceName)
+            if targetDeviceName in deviceName and i not in excludedIndices:
+                print("Device name", deviceName, "id -", i)
+                return i
+
+        raise GetDeviceIndexError(targetDeviceName)
+
+    def getDeviceName(self, deviceIndex):
+        """ Get the full name of a device given its index """
+        return self.pyaudio.get_device_info_by_host_api_device_index(0, deviceIndex).get('name')
+
+    def openInputStream(self, rate, channels, sampleWidth, deviceIndex, framesPerBuffer, callback):
+        """ Open and start a record stream in callback mode """
+        return self.pyaudio.open(
+            rate = rate,
+            channels = channels,
+            format = self.pyaudio.get_format_from_width(sampleWidth),
+            input = True,
+            input_device_index= deviceIndex,
+            frames_per_buffer= framesPerBuffer,
+            start = True,
+            stream_callback= callback
+        )
+
+    def openOutputStream(self, rate, channels, sampleWidth, deviceIndex, framesPerBuffer, callback):
+        """ Open and start a play stream in callback mode """
+        return self.pyaudio.open(
+            rate = rate,
+            channels = channels,
+            format = self.pyaudio.get_format_from_width(sampleWidth),
+            output = True,
+            output_device_index= deviceIndex,
+            frames_per_buffer= framesPerBuffer,
+            stream_callback= callback
+        )
+
+    def readClocks(self):
+        """
+        Read the clock of the ADC time (CLOCK_MONOTONIC for PortAudio on ALSA) and the unix time,
+        same as ./getclock without starting a process
+
+        Returns:
+            tuple: (ADC clock, unix time at the middle of the read, duration of the read) in second
+        """
+        startTime = time.time()
+        adcClock = time.clock_gettime(time.CLOCK_MONOTONIC)
+        endTime = time.time()
+        return adcClock, (startTime + endTime) / 2, endTime - startTime
+
+    def getCpuTemperature(self):
+        """ Get the CPU temperature in Celsius """
+        return self.cpuTemperature.temperature if self.cpuTemperature != None else 0
+
+    def terminate(self):
+        """ Terminate the PyAudio object """
+        self.pyaudio.terminate()
+
+#===========================================================================
+#                            Virtual Backend
+#===========================================================================
+class MaintletVirtualBackend:
+    """ A headless audio device for running the pipeline on a dev box """
+
+    def __init__(self, source='files', files=[], speed=1.0):
+        """
+        Init the virtual backend
+
+        Args:
+            source (str, optional): 'files' replays WAV files, 'synthetic' generates sines and noise. Defaults to 'files'.
+            files (list, optional): WAV file paths or glob patterns, e.g. ['testAudio/*.wav']. Defaults to [].
+            speed (float, optional): Replay speed, 1 is real time, N is N times faster, 0 is as fast as possible. Defaults to 1.0.
+        """
+        self.source = source
+        self.files = []
+        for pattern in files:
+            self.files += sorted(glob.glob(pattern))
+        if self.source == 'files' and len(self.files) == 0:
+            raise CaptureBackendError(f"virtual (no WAV file matches {files})")
+        self.speed = float(speed)
+        # the virtual clocks start at the real clocks and run speed times faster
+        self.monotonicOrigin = time.monotonic()
+        self.unixOrigin = time.time()
+
+    def getStreamClock(self):
+        """ Get the virtual ADC clock: the monotonic clock sped up by the replay speed (the monotonic clock if speed is 0) """
+        if self.speed <= 0:
+            return time.monotonic()
+        return self.monotonicOrigin + (time.monotonic() - self.monotonicOrigin) * self.speed
+
+    def getDeviceIndex(self, targetDeviceName, excludedIndices=()):
+        """ The virtual device has only one device, every virtual stream replays the same signal """
+        return 0
+
+    def getDeviceName(self, deviceIndex):
+        """ Get the name of the virtual device """
+        return f"virtual {self.source}"
+
+    def loadSignal(self, rate, channels, sampleWidth):
+        """
+        Load the replayed signal as one interleaved PCM buffer in the stream format.
+        WAV files are converted to the sample width of the stream, and their channels are repeated to fill all channels.
+
+        Returns:
+            bytes: The PCM data.
+        """
+        if self.source == 'synthetic':
+            # 10 s of a different sine per channel plus noise
+            rng = np.random.default_rng(0)
+            t = np.arange(rate * 10) / rate
+            x = np.stack([0.3 * np.sin(2 * np.pi * 50 * (i + 1) * t) for i in range(channels)], axis=1)
+            x += 0.05 * rng.standard_normal(x.shape)
+            return self.encode(x, sampleWidth)
+
+        signals = []
+        for filepath in self.files:
+            with wave.open(filepath) as wf:
+                fileRate = wf.getframerate()
+                fileChannels = wf.getnchannels()
+                fileSampleWidth = wf.getsampwidth()
+                data = wf.readframes(wf.getnframes())
+            if fileRate != rate:
+                logger.warning(f"VirtualBackend: {filepath} is sampled at {fileRate} Hz, it is replayed at {rate} Hz")
+            x = decodePCM(data, fileSampleWidth, fileChannels, asFloat=True)
+            x = x[:, np.arange(channels) % fileChannels]
+            signals.append(x)
+        return self.encode(np.concatenate(signals, axis=0), sampleWidth)
+
+    def encode(self, x, sampleWidth):
+        """ Encode float samples in [-1, 1) to interleaved little-endian PCM """
+        fullScale = getFullScale(sampleWidth)
+        y = np.clip(np.round(x * fullScale), -fullScale, fullScale - 1).astype('<i4')
+        if sampleWidth == 3:
+            return y.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+        return y.astype(f'<i{sampleWidth}').tobytes()
+
+    def openInputStream(self, rate, channels, sampleWidth, deviceIndex, framesPerBuffer, callback):
+        """ Open and start a virtual record stream in callback mode """
+        stream = MaintletVirtualStream(rate, channels, sampleWidth, framesPerBuffer, callback, self.speed,
+                                       isInput=True, signal=self.loadSignal(rate, channels, sampleWidth), clock=self.getStreamClock)
+        stream.start_stream()
+        return stream
+
+    def openOutputStream(self, rate, channels, sampleWidth, deviceIndex, framesPerBuffer, callback):
+        """ Open and start a virtual play stream in callback mode, the played data is discarded """
+        stream = MaintletVirtualStream(rate, channels, sampleWidth, framesPerBuffer, callback, self.speed, isInput=False,
+                                       clock=self.getStreamClock)
+        stream.start_stream()
+        return stream
+
+    def readClocks(self):
+        """
+        Read the virtual ADC clock of the streams and a unix time which runs at the same speed, see MaintletPyAudioBackend.readClocks.
+        With speed N, the timestamps of the files follow the replayed signal (N times faster than the wall clock).
+        """
+        startTime = time.time()
+        adcClock = self.getStreamClock()
+        endTime = time.time()
+        unixTime = (startTime + endTime) / 2
+        if self.speed > 0:
+            unixTime = self.unixOrigin + (unixTime - self.unixOrigin) * self.speed
+        return adcClock, unixTime, (endTime - startTime) * max(self.speed, 1)
+
+    def getCpuTemperature(self):
+        """ Get the CPU temperature of the dev box if Linux exposes it """
+        try:
+            with open('/sys/class/thermal/thermal_zone0/temp') as f:
+                return int(f.read()) / 1000
+        except (OSError, ValueError):
+            return 0
+
+    def terminate(self):
+        pass
+
+
+class MaintletVirtualStream:
+    """ A stream thread which calls the callback every framesPerBuffer frames, with the same interface as a PyAudio stream """
+
+    def __init__(self, rate, channels, sampleWidth, framesPerBuffer, callback, speed, isInput, signal=None, clock=time.monotonic):
+        self.rate = rate
+        self.channels = channels
+        self.sampleWidth = sampleWidth
+        self.framesPerBuffer = framesPerBuffer
+        self.callback = callback
+        self.speed = speed
+        self.isInput = isInput
+        self.signal = signal
+        self.clock = clock # the ADC clock of the backend
+        self.chunkSizeInByte = framesPerBuffer * channels * sampleWidth
+        self.chunkDuration = framesPerBuffer / rate
+        self.thread = None
+        self.stopThread = False
+        self.active = False
+        # cpu load: the fraction of the stream time spent in the callback
+        self.totalCallbackTime = 0
+        self.startTime = 0
+
+    def start_stream(self):
+        self.stopThread = False
+        self.active = True
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+        self.thread.name = 'virtualInputStream' if self.isInput else 'virtualOutputStream'
+        self.thread.start()
+
+    def stop_stream(self):
+        self.stopThread = True
+        if self.thread != None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+        self.active = False
+
+    def close(self):
+        self.stop_stream()
+
+    def is_active(self):
+        return self.active
+
+    def get_cpu_load(self):
+        elapsedTime = time.monotonic() - self.startTime
+        return self.totalCallbackTime / elapsedTime if elapsedTime > 0 else 0
+
+    def get_input_latency(self):
+        return self.chunkDuration
+
+    def get_output_latency(self):
+        return self.chunkDuration
+
+    def nextChunk(self, offset):
+        """ Get the next chunk of the replayed signal, it wraps around at the end """
+        signalSize = len(self.signal)
+        chunk = self.signal[offset:offset + self.chunkSizeInByte]
+        while len(chunk) < self.chunkSizeInByte:
+            chunk += self.signal[:self.chunkSizeInByte - len(chunk)]
+        return chunk, (offset + self.chunkSizeInByte) % signalSize
+
+    def loop(self):
+        """
+        The thread routine of the stream.
+        The ADC time of chunk n is the ADC clock at the start + n * chunkDuration like a free-running ADC clock.
+        With speed N, the ADC clock of the backend runs N times faster than the wall clock.
+        """
+        self.startTime = time.monotonic()
+        streamStartTime = self.clock()
+        self.totalCallbackTime = 0
+        signalOffset = 0
+        chunkIndex = 0
+        while self.stopThread == False:
+            streamTime = streamStartTime + chunkIndex * self.chunkDuration
+            if self.speed > 0:
+                # wait until the chunk is "captured"
+                waitTime = self.startTime + (chunkIndex + 1) * self.chunkDuration / self.speed - time.monotonic()
+                if waitTime > 0:
+                    time.sleep(waitTime)
+            if self.isInput:
+                inData, signalOffset = self.nextChunk(signalOffset)
+                timeInfo = {'input_buffer_adc_time': streamTime, 'current_time': time.monotonic(), 'output_buffer_dac_time': 0}
+            else:
+                inData = None
+                timeInfo = {'input_buffer_adc_time': 0, 'current_time': time.monotonic(), 'output_buffer_dac_time': streamTime}
+            callbackStartTime = time.monotonic()
+            try:
+                _, flag = self.callback(inData, self.framesPerBuffer, timeInfo, 0)
+            except Exception as e:
+                # PortAudio stops the stream if the callback raises
+                logger.error(f"VirtualStream: callback raises {type(e).__name__} {e}, the stream is stopped")
+                break
+            finally:
+                self.totalCallbackTime += time.monotonic() - callbackStartTime
+            chunkIndex += 1
+            if flag != paContinue:
+                break
+        self.active = False
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    rate, channels, sampleWidth, chunk = 48000, 8, 2, 4800
+    for source, files in [('files', ['testAudio/*.wav']), ('synthetic', [])]:
+        backend = MaintletVirtualBackend(source=source, files=files, speed=10)
+        adcTimes = []
+        def callback(in_data, frame_count, time_info, status):
+            adcTimes.append(time_info['input_buffer_adc_time'])
+            assert len(in_data) == chunk * channels * sampleWidth
+            return None, paContinue if len(adcTimes) < 50 else paComplete
+        startTime = time.monotonic()
+        stream = backend.openInputStream(rate, channels, sampleWidth, backend.getDeviceIndex("seeed"), chunk, callback)
+        while stream.is_active():
+            time.sleep(0.05)
+        stream.close()
+        print(source, len(adcTimes), f"stream time {adcTimes[-1] - adcTimes[0] + chunk / rate:.2f} S",
+              f"wall time {time.monotonic() - startTime:.2f} S", f"cpu load {stream.get_cpu_load():.4f}")
+        # the ADC times of the stream follow the clock of readClocks (the last chunk ends about now)
+        adcClock, unixTime, uncertainty = backend.readClocks()
+        print(f"ADC clock - last chunk end {adcClock - adcTimes[-1] - chunk / rate:.2f} S, lead of the unix clock - lead of the ADC clock {unixTime - time.time() - (adcClock - time.monotonic()):.2f} S")
+#============================= END OF TEST CODE ==============================
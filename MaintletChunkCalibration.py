@@ -0,0 +1,236 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  Automatic record chunk sizing
+#                        (1) at startup, record a few seconds with each candidate chunk size and measure the callback CPU load
+#                            (stream.get_cpu_load()), the input latency and the overflows
+#                        (2) the smallest chunk whose CPU load is below the target and whose latency is bounded is used
+#                        (3) the result is saved per device model (board, audio devices and stream format) and reused at the next start
+#                        (4) while recording, the live CPU load can move the chunk to the next larger or smaller candidate
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   candidates = getChunkCandidates([480, 960, 2400, 4800], samplingRate=48000, decimationFactors=[1, 4])
+#   calibrator = MaintletChunkCalibrator(backend, devices, samplingRate=48000, sampleWidth=2, candidates=candidates,
+#                                        targetCpuLoad=0.3, maxLatency=0.2, duration=2)
+#   deviceModel = getDeviceModel(backend, devices, samplingRate=48000, sampleWidth=2)
+#   result = loadChunkCalibration(path, deviceModel)           # None if this device model is not calibrated yet
+#   if result == None:
+#       result = calibrator.calibrate()                          # {'recordChunk': 960, 'cpuLoad': ..., 'latency': ..., ...}
+#       saveChunkCalibration(path, deviceModel, result)
+#   newChunk = calibrator.recommend(recordChunk, liveCpuLoad)   # None: keep the current chunk
+#==========================================================================
+
+import functools
+import json
+import os
+import platform
+import time
+from MaintletLog import logger
+from MaintletRingBuffer import MaintletRingBuffer
+from MaintletCaptureBackend import paContinue
+
+def getChunkCandidates(candidates, samplingRate, decimationFactors):
+    """
+    Keep the candidate chunk sizes which divide the sampling rate (a file and an interval are whole chunks)
+    and are a multiple of every decimation factor
+
+    Args:
+        candidates (list): Chunk sizes in frames.
+        samplingRate (int): The sampling rate.
+        decimationFactors (list): The decimation factors of the stored channels.
+
+    Returns:
+        list: The valid chunk sizes in ascending order.
+    """
+    valid = [int(chunk) for chunk in candidates
+             if chunk > 0 and samplingRate % chunk == 0 and all(chunk % factor == 0 for factor in decimationFactors)]
+    return sorted(set(valid))
+
+def getDeviceModel(captureBackend, devices, samplingRate, sampleWidth):
+    """
+    Get the key of a device model: the board, the input devices and the stream format
+
+    Args:
+        captureBackend: The capture backend.
+        devices (list): MaintletInputDevice of the record streams.
+        samplingRate (int): The sampling rate.
+        sampleWidth (int): The sample width in byte.
+
+    Returns:
+        str: e.g., 'Raspberry Pi 4 Model B Rev 1.4|seeed-8mic-voicecard 8ch|48000Hz|16bit'
+    """
+    try:
+        with open('/proc/device-tree/model') as f:
+            board = f.read().strip('\x00\n ')
+    except OSError:
+        board = platform.machine()
+    deviceNames = '+'.join(f"{captureBackend.getDeviceName(device.deviceIndex)} {device.channelCount}ch" for device in devices)
+    return f"{board}|{deviceNames}|{samplingRate}Hz|{sampleWidth * 8}bit"
+
+def loadChunkCalibration(filepath, deviceModel):
+    """ Get the saved calibration of a device model, None if there is none """
+    try:
+        with open(filepath) as f:
+            return json.load(f).get(deviceModel)
+    except (OSError, ValueError):
+        return None
+
+def saveChunkCalibration(filepath, deviceModel, result):
+    """ Save the calibration of a device model, the calibrations of other models are kept """
+    calibrations = {}
+    try:
+        with open(filepath) as f:
+            calibrations = json.load(f)
+    except (OSError, ValueError):
+        pass
+    calibrations[deviceModel] = result
+    # write a temporary file and rename it, a crash never leaves a truncated file
+    with open(filepath + '.tmp', 'w') as f:
+        json.dump(calibrations, f, indent=4)
+    os.replace(filepath + '.tmp', filepath)
+
+class MaintletChunkCalibrator:
+    def __init__(self, captureBackend, devices, samplingRate, sampleWidth, candidates, targetCpuLoad, maxLatency, duration):
+        """
+        Init the calibrator
+
+        Args:
+            captureBackend: The capture backend, the calibration opens its own record streams.
+            devices (list): MaintletInputDevice of the record streams.
+            samplingRate (int): The sampling rate.
+            sampleWidth (int): The sample width in byte.
+            candidates (list): Valid chunk sizes in ascending order (getChunkCandidates).
+            targetCpuLoad (float): The maximum callback CPU load (0 - 1) of a stream.
+            maxLatency (float): The maximum chunk duration plus input latency in second.
+            duration (float): Seconds recorded with each candidate.
+        """
+        if len(candidates) == 0:
+            raise ValueError("No valid record chunk candidate")
+        self.captureBackend = captureBackend
+        self.devices = devices
+        self.samplingRate = samplingRate
+        self.sampleWidth = sampleWidth
+        self.candidates = list(candidates)
+        self.targetCpuLoad = float(targetCpuLoad)
+        self.maxLatency = float(maxLatency)
+        self.duration = float(duration)
+
+    def measure(self, chunk):
+        """
+        Record with a chunk size, the callback copies each chunk into a ring buffer like the record callback
+
+        Args:
+            chunk (int): The chunk size in frames.
+
+        Returns:
+            dict: cpuLoad (maximum over the streams), latency, totalOverflow and totalCallback.
+        """
+        counters = {'totalOverflow': 0, 'totalCallback': 0}
+        def callback(in_data, frame_count, time_info, status, ringBuffer):
+            counters['totalCallback'] += 1
+            if status != 0:
+                counters['totalOverflow'] += 1
+            ringBuffer.write(in_data, time_info['input_buffer_adc_time'], status)
+            return None, paContinue
+
+        streams = []
+        try:
+            for device in self.devices:
+                ringBuffer = MaintletRingBuffer(slotCount=4, slotSizeInByte=chunk * device.channelCount * self.sampleWidth)
+                streams.append(self.captureBackend.openInputStream(
+                    rate = self.samplingRate,
+                    channels = device.channelCount,
+                    sampleWidth = self.sampleWidth,
+                    deviceIndex = device.deviceIndex,
+                    framesPerBuffer = chunk,
+                    callback = functools.partial(callback, ringBuffer=ringBuffer)
+                ))
+            time.sleep(self.duration)
+            cpuLoad = max(stream.get_cpu_load() for stream in streams)
+            inputLatency = max(stream.get_input_latency() for stream in streams)
+        finally:
+            for stream in streams:
+                stream.stop_stream()
+                stream.close()
+        result = {}
+        result['recordChunk'] = chunk
+        result['cpuLoad'] = round(float(cpuLoad), 4)
+        result['latency'] = round(chunk / self.samplingRate + float(inputLatency), 4)
+        result.update(counters)
+        logger.info(f"ChunkCalibration: {result}")
+        return result
+
+    def isAcceptable(self, result):
+        """ Check the CPU load, the latency and the overflows of a measurement """
+        return result['cpuLoad'] <= self.targetCpuLoad and result['latency'] <= self.maxLatency and result['totalOverflow'] == 0
+
+    def calibrate(self):
+        """
+        Measure the candidates from the smallest one and stop at the first acceptable one
+
+        Returns:
+            dict: The measurement of the chosen chunk size plus the calibration time.
+        """
+        results = []
+        chosen = None
+        for chunk in self.candidates:
+            if chunk / self.samplingRate > self.maxLatency and len(results) > 0:
+                # larger chunks only add latency
+                break
+            result = self.measure(chunk)
+            results.append(result)
+            if self.isAcceptable(result):
+                chosen = result
+                break
+        if chosen == None:
+            # nothing meets all bounds, use the lowest CPU load
+            chosen = min(results, key=lambda e: (e['totalOverflow'], e['cpuLoad']))
+            logger.warning(f"ChunkCalibration: no chunk meets the CPU load {self.targetCpuLoad} and the latency {self.maxLatency} S, use {chosen['recordChunk']}")
+        chosen = dict(chosen)
+        chosen['calibratedOn'] = time.time()
+        return chosen
+
+    def recommend(self, chunk, cpuLoad):
+        """
+        Move to the next larger candidate if the live CPU load is above the target, or to the next smaller one
+        if its load (assuming the cost is per callback) stays below 80% of the target
+
+        Args:
+            chunk (int): The current chunk size.
+            cpuLoad (float): The live callback CPU load.
+
+        Returns:
+            int: The new chunk size, None if the current one is kept.
+        """
+        larger = [e for e in self.candidates if e > chunk and e / self.samplingRate <= self.maxLatency]
+        smaller = [e for e in self.candidates if e < chunk]
+        if cpuLoad > self.targetCpuLoad and len(larger) > 0:
+            return larger[0]
+        if len(smaller) > 0 and cpuLoad * chunk / smaller[-1] < 0.8 * self.targetCpuLoad:
+            return smaller[-1]
+        return None
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    import tempfile
+    from MaintletCaptureBackend import MaintletVirtualBackend
+    from MaintletAlignment import MaintletInputDevice
+    print(getChunkCandidates([480, 700, 960, 2400, 4800, 9600], 48000, [1, 4]))
+    backend = MaintletVirtualBackend(source='synthetic', speed=1)
+    devices = [MaintletInputDevice('virtual', channelCount=8, channelOffset=0, deviceIndex=0)]
+    calibrator = MaintletChunkCalibrator(backend, devices, samplingRate=48000, sampleWidth=2, candidates=[480, 960, 4800],
+                                         targetCpuLoad=0.3, maxLatency=0.2, duration=0.5)
+    deviceModel = getDeviceModel(backend, devices, 48000, 2)
+    filepath = os.path.join(tempfile.mkdtemp(), 'chunkCalibration.json')
+    result = calibrator.calibrate()
+    saveChunkCalibration(filepath, deviceModel, result)
+    print(deviceModel, loadChunkCalibration(filepath, deviceModel))
+    print(calibrator.recommend(960, 0.5), calibrator.recommend(960, 0.01), calibrator.recommend(960, 0.2))
+#============================= END OF TEST CODE ==============================
@@ -0,0 +1,214 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  Mapping of the ADC time (monotonic clock) to the unix time
+#                        (1) the offset between both clocks is sampled periodically, each sample is the read with the
+#                            smallest latency out of a few reads
+#                        (2) a linear fit over the latest samples gives the offset and its drift, the drift is
+#                            extrapolated between two samples
+#                        (3) a step of the wall clock (e.g., the first NTP sync of a Raspberry Pi without RTC) restarts the fit
+#                        (4) timestamps are formatted from a cached prefix of the current second (no strftime per file)
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   clock = MaintletClock(sampler=backend.readClocks, updateInterval=60, windowSize=30, stepThreshold=0.05)
+#   clock.start()                               # re-estimate the offset every updateInterval seconds
+#   unixTime = clock.toUnixTime(adcTime)
+#   clock.formatTimestamp(unixTime)             # 10_17_2026_13_05_09_123456 (same as "%m_%d_%Y_%H_%M_%S_%f")
+#   clock.getStatus()                           # offset, drift (ppm) and jitter (ms)
+#   clock.stop()
+#
+#   sampler() returns (adcClock, unixTime, uncertainty): the ADC clock, the unix time at the same moment and the
+#   duration of the read in second
+#==========================================================================
+
+import math
+import threading
+import time
+import numpy as np
+from MaintletLog import logger
+
+CLOCK_READ_COUNT = 5 # reads per sample, the fastest read is kept
+
+class MaintletClock:
+    def __init__(self, sampler, updateInterval, windowSize, stepThreshold, readCount=CLOCK_READ_COUNT):
+        """
+        Init the clock and take the first sample
+
+        Args:
+            sampler (function): Returns (adcClock, unixTime, uncertainty), e.g., MaintletPyAudioBackend.readClocks.
+            updateInterval (float): Seconds between two samples.
+            windowSize (int): The number of latest samples used by the linear fit.
+            stepThreshold (float): A sample further than stepThreshold seconds from the fit is a step of the wall clock.
+            readCount (int, optional): Reads per sample. Defaults to CLOCK_READ_COUNT.
+        """
+        self.sampler = sampler
+        self.updateInterval = float(updateInterval)
+        self.windowSize = max(int(windowSize), 2)
+        self.stepThreshold = float(stepThreshold)
+        self.readCount = max(int(readCount), 1)
+
+        self.adcClocks = [] # ADC clock of the latest samples
+        self.offsets = [] # unix time - ADC clock of the latest samples
+        # unix time = adcTime + offset + drift * (adcTime - referenceAdcTime), replaced as a whole (no lock for readers)
+        self.model = (0.0, 0.0, 0.0)
+        self.jitter = 0.0 # standard deviation of the fit residuals in second
+        self.lastUncertainty = 0.0
+        self.totalSample = 0
+        self.totalStep = 0
+        self.formatCache = (None, "") # (second, formatted second)
+
+        self.thread = None
+        self.stopEvent = threading.Event()
+        self.update()
+
+    def start(self):
+        """ Start the update thread """
+        self.stopEvent.clear()
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+        self.thread.name = 'clock'
+        self.thread.start()
+
+    def stop(self):
+        """ Stop the update thread """
+        self.stopEvent.set()
+        if self.thread != None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def loop(self):
+        """ The thread routine of the clock """
+        while not self.stopEvent.wait(self.updateInterval):
+            try:
+                self.update()
+            except Exception as e:
+                logger.warning(f"Clock: cannot sample the clocks, keep the current estimate ({e})")
+
+    def sample(self):
+        """ Read both clocks readCount times and keep the read with the smallest uncertainty """
+        best = None
+        for i in range(self.readCount):
+            reading = self.sampler()
+            if best == None or reading[2] < best[2]:
+                best = reading
+        return best
+
+    def update(self):
+        """ Take a sample and refit the offset and the drift """
+        adcClock, unixTime, uncertainty = self.sample()
+        offset = unixTime - adcClock
+        if len(self.offsets) > 0:
+            error = adcClock + offset - self.toUnixTime(adcClock)
+            if abs(error) > self.stepThreshold:
+                # the wall clock was set, the older samples are useless
+                self.totalStep += 1
+                logger.warning(f"Clock: the wall clock stepped by {error:.3f} S, restart the drift estimation")
+                self.adcClocks.clear()
+                self.offsets.clear()
+        self.adcClocks.append(adcClock)
+        self.offsets.append(offset)
+        del self.adcClocks[:-self.windowSize]
+        del self.offsets[:-self.windowSize]
+        self.lastUncertainty = uncertainty
+        self.totalSample += 1
+
+        if len(self.offsets) < 2:
+            self.model = (adcClock, offset, 0.0)
+            self.jitter = 0.0
+            return
+        # fit around the latest sample, it keeps the intercept well conditioned
+        x = np.array(self.adcClocks) - adcClock
+        y = np.array(self.offsets)
+        drift, intercept = np.polyfit(x, y, 1)
+        self.jitter = float(np.std(y - (intercept + drift * x)))
+        self.model = (adcClock, float(intercept), float(drift))
+        logger.debug(f"Clock: {self.getStatus()}")
+
+    def toUnixTime(self, adcTime):
+        """
+        Map an ADC time to the unix time
+
+        Args:
+            adcTime (float): The ADC time in second (e.g., time_info['input_buffer_adc_time']).
+
+        Returns:
+            float: The unix time.
+        """
+        referenceAdcTime, offset, drift = self.model
+        return adcTime + offset + drift * (adcTime - referenceAdcTime)
+
+    def formatTimestamp(self, unixTime):
+        """
+        Format a unix time in local time, same as datetime.fromtimestamp(unixTime).strftime("%m_%d_%Y_%H_%M_%S_%f")
+
+        Args:
+            unixTime (float): The unix time.
+
+        Returns:
+            str: The formatted time.
+        """
+        second = math.floor(unixTime)
+        microsecond = round((unixTime - second) * 1e6)
+        if microsecond >= 1000000:
+            second += 1
+            microsecond -= 1000000
+        cachedSecond, prefix = self.formatCache
+        if cachedSecond != second:
+            prefix = time.strftime("%m_%d_%Y_%H_%M_%S", time.localtime(second))
+            self.formatCache = (second, prefix)
+        return f"{prefix}_{microsecond:06d}"
+
+    def getStatus(self):
+        """
+        Get the estimate and the statistics of the clock
+
+        Returns:
+            dict: statistics
+        """
+        status = {}
+        referenceAdcTime, offset, drift = self.model
+        status['offset'] = offset
+        status['driftPpm'] = drift * 1e6
+        status['jitterMs'] = self.jitter * 1000
+        status['uncertaintyMs'] = self.lastUncertainty * 1000
+        status['fitSampleCount'] = len(self.offsets)
+        status['totalSample'] = self.totalSample
+        status['totalStep'] = self.totalStep
+        return status
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    from datetime import datetime
+    # a simulated wall clock which runs 50 ppm fast, with 0.2 ms of read noise and a step of 2 S at sample 20
+    rng = np.random.default_rng(0)
+    state = {'adc': 1000.0, 'step': 0.0}
+    def sampler():
+        adc = state['adc']
+        return adc, 1.7e9 + adc * (1 + 50e-6) + state['step'] + 2e-4 * rng.standard_normal(), 1e-5
+    clock = MaintletClock(sampler, updateInterval=60, windowSize=10, stepThreshold=0.05)
+    for i in range(1, 30):
+        state['adc'] += 60
+        if i == 20:
+            state['step'] = 2.0
+        clock.update()
+    print(clock.getStatus())
+    adcTime = state['adc'] + 30
+    print("error (ms)", round((clock.toUnixTime(adcTime) - (1.7e9 + adcTime * (1 + 50e-6) + 2.0)) * 1000, 3))
+
+    unixTime = time.time()
+    print(clock.formatTimestamp(unixTime), datetime.fromtimestamp(unixTime).strftime("%m_%d_%Y_%H_%M_%S_%f"))
+    startTime = time.time()
+    for i in range(10000):
+        clock.formatTimestamp(unixTime + i * 1e-4)
+    cachedTime = time.time() - startTime
+    startTime = time.time()
+    for i in range(10000):
+        datetime.fromtimestamp(unixTime + i * 1e-4).strftime("%m_%d_%Y_%H_%M_%S_%f")
+    print(f"cached {cachedTime * 100:.2f} us, strftime {(time.time() - startTime) * 100:.2f} us per timestamp")
+#============================= END OF TEST CODE ==============================
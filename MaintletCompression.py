@@ -0,0 +1,288 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  Lossless compression of recorded WAV files with a pool of encoder processes
+#                        (1) flac: FLAC through soundfile (16 and 24 bit)
+#                        (2) mdz : per-channel first-order delta, byte planes and zlib (any sample width, numpy only)
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   compressor = MaintletCompressor(storageFormat='flac', workerCount=2, queueSize=8, onFinish=handleResult)
+#   compressor.submit('records/xxx.wav')   # False if too many files are being compressed
+#   handleResult(result) is called in the result thread of the pool, result is a dict:
+#       {'rawFilepath', 'compressedFilepath', 'storageFormat', 'rawSize', 'compressedSize', 'ratio', 'cpuTime', 'wallTime'}
+#   compressor.stop()
+#
+#   y, samplingRate, sampleWidth = readCompressedFile('records/xxx.mdz')   # y: (frameCount, channelCount) int array
+#   restoreWavFile('records/xxx.mdz', 'xxx.wav')
+#==========================================================================
+
+import os
+import struct
+import threading
+import time
+import wave
+import zlib
+import multiprocessing
+import numpy as np
+from MaintletLog import logger
+from MaintletPCM import decodePCM
+# soundfile (libsndfile) is optional, we use mdz if it is not installed
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
+COMPRESSED_EXTENSIONS = {'flac': '.flac', 'mdz': '.mdz'}
+MDZ_MAGIC = b'MDZ1'
+MDZ_HEADER_FORMAT = '<4sHHIQ' # magic, channelCount, sampleWidth, samplingRate, frameCount
+MDZ_HEADER_SIZE = struct.calcsize(MDZ_HEADER_FORMAT)
+MDZ_COMPRESSION_LEVEL = 6
+
+def getStorageFormat(storageFormat, sampleWidth):
+    """ Get the format we can actually use, flac needs soundfile and supports 16 and 24 bit only """
+    if storageFormat == 'flac' and (soundfile == None or sampleWidth not in (2, 3)):
+        return 'mdz'
+    return storageFormat
+
+def encodeDeltaZlib(y, sampleWidth, level=MDZ_COMPRESSION_LEVEL):
+    """
+    Encode samples to the mdz payload.
+    The first-order delta of each channel is kept modulo 2^(8 * sampleWidth), so it has the original sample width
+    and the cumulative sum restores the samples exactly. The bytes of the deltas are grouped by byte position
+    (the high bytes are almost always 0x00 or 0xFF), then zlib compresses the planes.
+
+    Args:
+        y (np.ndarray): Samples with shape (frameCount, channelCount) from decodePCM.
+        sampleWidth (int): The sample width in byte.
+        level (int, optional): The zlib level. Defaults to MDZ_COMPRESSION_LEVEL.
+
+    Returns:
+        bytes: The compressed payload.
+    """
+    x = np.ascontiguousarray(y.T, dtype=np.int32) # (channelCount, frameCount)
+    d = np.diff(x, axis=1, prepend=0)
+    d = d.astype('<i2') if sampleWidth == 2 else d.astype('<i4')
+    planes = d.view(np.uint8).reshape(x.shape[0], x.shape[1], -1)[:, :, :sampleWidth]
+    return zlib.compress(np.ascontiguousarray(planes.transpose(0, 2, 1)).tobytes(), level)
+
+def decodeDeltaZlib(payload, sampleWidth, channelCount, frameCount):
+    """
+    Decode the mdz payload
+
+    Returns:
+        np.ndarray: Samples with shape (frameCount, channelCount), int16 for 16 bit and int32 otherwise.
+    """
+    planes = np.frombuffer(zlib.decompress(payload), dtype=np.uint8).reshape(channelCount, sampleWidth, frameCount)
+    if sampleWidth == 2:
+        d = np.empty((channelCount, frameCount), dtype='<i2')
+        d.view(np.uint8).reshape(channelCount, frameCount, 2)[...] = planes.transpose(0, 2, 1)
+        x = np.cumsum(d, axis=1, dtype=np.int16)
+    else:
+        d = np.zeros((channelCount, frameCount), dtype='<i4')
+        # 24 bit: fill the upper three bytes, the arithmetic shift below extends the sign
+        d.view(np.uint8).reshape(channelCount, frameCount, 4)[:, :, 4 - sampleWidth:] = planes.transpose(0, 2, 1)
+        shift = 8 * (4 - sampleWidth)
+        x = np.cumsum(d >> shift, axis=1, dtype=np.int32)
+        if shift:
+            x = (x << shift) >> shift # wrap to 24 bit
+    return x.T
+
+def compressWavFile(wavFilepath, storageFormat):
+    """
+    Compress one WAV file next to it (the routine of an encoder process)
+
+    Args:
+        wavFilepath (str): The path of the WAV file.
+        storageFormat (str): flac or mdz.
+
+    Returns:
+        dict: The result (see Usage).
+    """
+    startTime = time.time()
+    startCpuTime = time.process_time()
+    with wave.open(wavFilepath) as wf:
+        channelCount = wf.getnchannels()
+        sampleWidth = wf.getsampwidth()
+        samplingRate = wf.getframerate()
+        data = wf.readframes(wf.getnframes())
+    storageFormat = getStorageFormat(storageFormat, sampleWidth)
+    compressedFilepath = os.path.splitext(wavFilepath)[0] + COMPRESSED_EXTENSIONS[storageFormat]
+    y = decodePCM(data, sampleWidth, channelCount)
+
+    # write to a temporary name, a complete compressed file always has its final name
+    tmpFilepath = compressedFilepath + '.part'
+    if storageFormat == 'flac':
+        soundfile.write(tmpFilepath, y if sampleWidth == 2 else y << 8, samplingRate, subtype=f'PCM_{8 * sampleWidth}', format='FLAC')
+    else:
+        with open(tmpFilepath, 'wb') as f:
+            f.write(struct.pack(MDZ_HEADER_FORMAT, MDZ_MAGIC, channelCount, sampleWidth, samplingRate, y.shape[0]))
+            f.write(encodeDeltaZlib(y, sampleWidth))
+    os.replace(tmpFilepath, compressedFilepath)
+
+    result = {}
+    result['rawFilepath'] = wavFilepath
+    result['compressedFilepath'] = compressedFilepath
+    result['storageFormat'] = storageFormat
+    result['rawSize'] = os.path.getsize(wavFilepath)
+    result['compressedSize'] = os.path.getsize(compressedFilepath)
+    result['ratio'] = round(result['rawSize'] / result['compressedSize'], 3)
+    result['cpuTime'] = round(time.process_time() - startCpuTime, 5)
+    result['wallTime'] = round(time.time() - startTime, 5)
+    return result
+
+def readCompressedFile(filepath):
+    """
+    Read a compressed record file
+
+    Returns:
+        tuple: (samples with shape (frameCount, channelCount), samplingRate, sampleWidth)
+    """
+    if filepath.endswith(COMPRESSED_EXTENSIONS['flac']):
+        info = soundfile.info(filepath)
+        sampleWidth = 3 if info.subtype == 'PCM_24' else 2
+        y, samplingRate = soundfile.read(filepath, dtype='int16' if sampleWidth == 2 else 'int32', always_2d=True)
+        return (y if sampleWidth == 2 else y >> 8), samplingRate, sampleWidth
+    with open(filepath, 'rb') as f:
+        magic, channelCount, sampleWidth, samplingRate, frameCount = struct.unpack(MDZ_HEADER_FORMAT, f.read(MDZ_HEADER_SIZE))
+        if magic != MDZ_MAGIC:
+            raise ValueError(f"{filepath} is not an mdz file")
+        return decodeDeltaZlib(f.read(), sampleWidth, channelCount, frameCount), samplingRate, sampleWidth
+
+def restoreWavFile(filepath, wavFilepath):
+    """ Restore the WAV file of a compressed record file """
+    y, samplingRate, sampleWidth = readCompressedFile(filepath)
+    y = np.ascontiguousarray(y, dtype='<i4')
+    data = y.astype('<i2').tobytes() if sampleWidth == 2 else y.view(np.uint8).reshape(-1, 4)[:, :sampleWidth].tobytes()
+    with wave.open(wavFilepath, 'wb') as wf:
+        wf.setnchannels(y.shape[1])
+        wf.setsampwidth(sampleWidth)
+        wf.setframerate(samplingRate)
+        wf.writeframes(data)
+
+class MaintletCompressor:
+    def __init__(self, storageFormat, workerCount, queueSize, onFinish=None, onError=None):
+        """
+        Init a pool of encoder processes.
+        Create it before starting threads, the workers are forked from the current process.
+
+        Args:
+            storageFormat (str): flac or mdz.
+            workerCount (int): The number of encoder processes.
+            queueSize (int): The maximum number of files being compressed, new files stay in WAV when it is reached.
+            onFinish (function, optional): Called with the result dict after each file. Defaults to None.
+            onError (function, optional): Called with the WAV file path when a file fails (it stays in WAV). Defaults to None.
+        """
+        self.storageFormat = storageFormat
+        if getStorageFormat(storageFormat, 2) != storageFormat:
+            logger.warning(f"Compressor: soundfile is not installed, use mdz instead of {storageFormat}")
+        self.queueSize = int(queueSize)
+        self.onFinish = onFinish
+        self.onError = onError
+        self.pool = multiprocessing.Pool(processes=int(workerCount))
+        self.inFlightFiles = 0
+        self.lock = threading.Lock() # submit and the result thread of the pool both update inFlightFiles
+        # statistics
+        self.totalCompressedFile = 0
+        self.totalFailedFile = 0
+        self.totalSkippedFile = 0 # files left in WAV because the encoders fall behind
+        self.totalRawBytes = 0
+        self.totalCompressedBytes = 0
+        self.totalCpuTime = 0
+
+    def submit(self, wavFilepath):
+        """
+        Compress a WAV file in the background
+
+        Returns:
+            bool: False if the file is not accepted.
+        """
+        with self.lock:
+            if self.inFlightFiles >= self.queueSize:
+                self.totalSkippedFile += 1
+                logger.warning(f"Compressor falls behind, keep {wavFilepath} in WAV (total skipped: {self.totalSkippedFile})")
+                return False
+            self.inFlightFiles += 1
+        self.pool.apply_async(compressWavFile, (wavFilepath, self.storageFormat), callback=self.handleResult,
+                              error_callback=lambda e: self.handleError(wavFilepath, e))
+        return True
+
+    def handleResult(self, result):
+        """ Update the statistics and call onFinish (the result thread of the pool) """
+        with self.lock:
+            self.inFlightFiles -= 1
+        self.totalCompressedFile += 1
+        self.totalRawBytes += result['rawSize']
+        self.totalCompressedBytes += result['compressedSize']
+        self.totalCpuTime += result['cpuTime']
+        logger.info(f"Compress {result['rawFilepath']} to {result['storageFormat']}: ratio {result['ratio']}, CPU {result['cpuTime']} S")
+        if self.onFinish != None:
+            self.onFinish(result)
+
+    def handleError(self, wavFilepath, e):
+        """ The file stays in WAV """
+        with self.lock:
+            self.inFlightFiles -= 1
+        self.totalFailedFile += 1
+        logger.error(f"Compressor: fail to compress {wavFilepath}: {e}")
+        if self.onError != None:
+            self.onError(wavFilepath)
+
+    def stop(self):
+        """ Finish all submitted files and stop the encoder processes """
+        self.pool.close()
+        self.pool.join()
+
+    def getStatus(self):
+        """
+        Get the statistics of the compressor
+
+        Returns:
+            dict: statistics
+        """
+        status = {}
+        status['inFlightFiles'] = self.inFlightFiles
+        status['totalCompressedFile'] = self.totalCompressedFile
+        status['totalFailedFile'] = self.totalFailedFile
+        status['totalSkippedFile'] = self.totalSkippedFile
+        status['ratio'] = round(self.totalRawBytes / self.totalCompressedBytes, 3) if self.totalCompressedBytes else 0
+        status['meanCpuTime'] = round(self.totalCpuTime / self.totalCompressedFile, 5) if self.totalCompressedFile else 0
+        return status
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    import tempfile
+    rng = np.random.default_rng(0)
+    t = np.arange(48000 * 2) / 48000
+    x = np.stack([0.5 * np.sin(2 * np.pi * 100 * (i + 1) * t) for i in range(8)], axis=1) + 0.01 * rng.standard_normal((t.size, 8))
+    folder = tempfile.mkdtemp()
+    for sampleWidth in (2, 3, 4):
+        samples = np.round(x * (2 ** (8 * sampleWidth - 1) - 1)).astype('<i4')
+        data = samples.astype('<i2').tobytes() if sampleWidth == 2 else samples.view(np.uint8).reshape(-1, 4)[:, :sampleWidth].tobytes()
+        wavFilepath = f"{folder}/test{sampleWidth}.wav"
+        with wave.open(wavFilepath, 'wb') as wf:
+            wf.setnchannels(8)
+            wf.setsampwidth(sampleWidth)
+            wf.setframerate(48000)
+            wf.writeframes(data)
+        for storageFormat in ('mdz', 'flac'):
+            result = compressWavFile(wavFilepath, storageFormat)
+            y, samplingRate, _ = readCompressedFile(result['compressedFilepath'])
+            print(sampleWidth, result['storageFormat'], np.array_equal(y, samples), result['ratio'], result['cpuTime'])
+            restoreWavFile(result['compressedFilepath'], f"{folder}/restored.wav")
+            with wave.open(f"{folder}/restored.wav") as wf:
+                print(wf.readframes(wf.getnframes()) == data)
+
+    results = []
+    compressor = MaintletCompressor('mdz', workerCount=2, queueSize=8, onFinish=results.append)
+    for sampleWidth in (2, 3, 4):
+        compressor.submit(f"{folder}/test{sampleWidth}.wav")
+    compressor.stop()
+    print(len(results), compressor.getStatus())
+#============================= END OF TEST CODE ==============================
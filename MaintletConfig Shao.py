@@ -11,18 +11,31 @@ import getmac
 import os
 from datetime import datetime
 import json
+from MaintletStorageLayout import getStorageGroupSpecs, getStorageGroupSuffix
 #===========================================================================
 #                           HELPER FUNCTIONS 
 #===========================================================================
-def createExperimentFolder():
+def createExperimentFolder(resume=False):
     """
     Create a folder with the name of current timestamp for storing all information of this experiment
 
+    Args:
+        resume (bool, optional): Reuse the latest experiment folder (its records, database and manifest) if there is one. Defaults to False.
+
     Returns:
         str: The experiment folder path. 
     """
     if not os.path.exists('./results'):
         os.system("mkdir results")
+    if resume:
+        experimentFolders = []
+        for name in os.listdir('./results'):
+            try:
+                experimentFolders.append((datetime.strptime(name, "%m-%d-%Y-%H-%M-%S"), name))
+            except ValueError:
+                continue
+        if len(experimentFolders) > 0:
+            return "./results/" + max(experimentFolders)[1]
     experimentFolderPath = "./results/" + datetime.now().strftime("%m-%d-%Y-%H-%M-%S")
     os.system(f"mkdir {experimentFolderPath}")
     return experimentFolderPath
@@ -52,20 +65,25 @@ pathNameConfig["recordFolderName"] = 'records'
 pathNameConfig["tmpFolderName"] = 'tmp'
 pathNameConfig["databaseName"] = 'MaintletTest'
 pathNameConfig["tableName"] = 'experiment'   # (1) experiment, or (2) test
+# (1) flat: all record files in the record folder, (2) daily: records/YYYY/MM/DD/, (3) hourly: records/YYYY/MM/DD/HH/
+# use utilities/migrateRecordLayout.py to convert the record folders of earlier experiments
+pathNameConfig["recordFolderLayout"] = 'flat'
+# continue the latest experiment folder after a restart (the manifest journal requeues its unfinished files) instead of starting a new one
+pathNameConfig["resumeExperiment"] = False
 # create paths and make folders
-experimentFolderPath = createExperimentFolder() # createExperimentFolder will only be executed once because of the import cache mechanism
+experimentFolderPath = createExperimentFolder(resume=pathNameConfig["resumeExperiment"]) # createExperimentFolder will only be executed once because of the import cache mechanism
 pathNameConfig["experimentFolderPath"] = experimentFolderPath
 pathNameConfig["logFolderPath"] = f"{experimentFolderPath}/{pathNameConfig['logFolderName']}"
 pathNameConfig["recordFolderPath"] = f"{experimentFolderPath}/{pathNameConfig['recordFolderName']}"
 pathNameConfig["outputFolderPath"] = f"{experimentFolderPath}/{pathNameConfig['outputFolderName']}"
 pathNameConfig["datasetFolderPath"] = f"{experimentFolderPath}/{pathNameConfig['datasetFolderName']}"
 pathNameConfig["tmpFolderPath"] = f"{experimentFolderPath}/{pathNameConfig['tmpFolderName']}"
-os.system(f"mkdir {pathNameConfig['logFolderPath']}")
-os.system(f"mkdir {pathNameConfig['recordFolderPath']}")
-os.system(f"mkdir {pathNameConfig['outputFolderPath']}")
-os.system(f"mkdir {pathNameConfig['datasetFolderPath']}")
-os.system(f"mkdir {pathNameConfig['tmpFolderPath']}")
+# the folders exist if the experiment is resumed
+for folderPath in [pathNameConfig['logFolderPath'], pathNameConfig['recordFolderPath'], pathNameConfig['outputFolderPath'], pathNameConfig['datasetFolderPath'], pathNameConfig['tmpFolderPath']]:
+    os.makedirs(folderPath, exist_ok=True)
 pathNameConfig["databasePath"] = f"{pathNameConfig['datasetFolderPath']}/{pathNameConfig['databaseName']}.sqlite3"
+# append-only journal of the recording lifecycle (captured, written, analysed, uploaded, evicted)
+pathNameConfig["manifestPath"] = f"{pathNameConfig['datasetFolderPath']}/manifest.jsonl"
 messageQMaxSize = 100
 
 #=================== DEVICE ===================
@@ -88,13 +106,83 @@ networkConfig["MQTTQoS"] = 2
 #=================== RECORDING ===================
 recordingConfig = {}
 recordingConfig["enableRecording"] = True 
+# captureBackend
+# (1) pyaudio: the audio interface of the Raspberry Pi
+# (2) virtual: a headless device for load tests on a dev box, it replays virtualFiles (source 'files') or sines and noise (source 'synthetic')
+recordingConfig["captureBackend"] = 'pyaudio'
+recordingConfig["virtualSource"] = 'files'
+recordingConfig["virtualFiles"] = ['testAudio/*.wav']
+# replay speed of the virtual device: 1 is real time, N is N times faster, 0 is as fast as possible
+recordingConfig["virtualSpeed"] = 1
+# autoRetry: when the ADC time of the record stream is wrong (e.g., after a reboot), only reopen the record stream
+# and keep the capture backend, the device index, the clock offset, the buffers and all threads (False: reconfigure everything)
+recordingConfig["enableWarmRestart"] = True
+# the clock offset between the ADC time and the unix time is sampled every clockUpdateInterval seconds,
+# a linear fit of the latest clockWindowSize samples corrects the drift, a jump above clockStepThreshold seconds restarts the fit
+recordingConfig["clockUpdateInterval"] = 60
+recordingConfig["clockWindowSize"] = 30
+recordingConfig["clockStepThreshold"] = 0.05
+# gap accounting: a delta between the ADC times of two chunks larger than one chunk plus gapTolerance seconds is a gap (dropped frames),
+# the gaps of a file are stored in its table entry (offset:length in frames of the file)
+recordingConfig["gapTolerance"] = 0.002
 recordingConfig["samplingRate"] = 48000 
-recordingConfig["channelCount"] = 8 
+# input devices captured at the same time (the device name or a part of it), their channels are merged in this order:
+# device 0 gives the first channels of the merged chunk, then device 1, ... (e.g., two 8-channel HATs give 16 channels)
+# the devices are aligned on the ADC time of device 0, a device whose chunk is later than alignMaxWait seconds is filled with zeros
+recordingConfig["inputDevices"] = [{'name': 'seeed', 'channelCount': 8}]
+recordingConfig["alignMaxWait"] = 0.5
+recordingConfig["channelCount"] = sum(device['channelCount'] for device in recordingConfig["inputDevices"])
 # 2 -> int16
 # 3 -> int24
 # 4 -> int32
 recordingConfig["sampleWidth"] = 2
 recordingConfig["recordChunk"] = 4800 
+# recordChunkMode
+# (1) fixed: always use recordChunk
+# (2) auto : at the first start of a device model (board, input devices, stream format), record chunkCalibrationDuration seconds with each
+#            of recordChunkCandidates and use the smallest chunk whose callback CPU load is below targetCallbackCpuLoad and whose latency
+#            (chunk duration + input latency) is below maxChunkLatency seconds, the result is saved in chunkCalibrationPath for the next starts
+recordingConfig["recordChunkMode"] = 'fixed'
+recordingConfig["recordChunkCandidates"] = [480, 960, 1200, 1600, 2400, 4800, 9600]
+recordingConfig["targetCallbackCpuLoad"] = 0.3
+recordingConfig["maxChunkLatency"] = 0.2
+recordingConfig["chunkCalibrationDuration"] = 2
+recordingConfig["chunkCalibrationPath"] = './chunkCalibration.json'
+# auto mode: every chunkRecalibrationInterval seconds, the live callback CPU load moves recordChunk to the next larger (or smaller) candidate
+# and the data collection module restarts with it (0: never)
+recordingConfig["chunkRecalibrationInterval"] = 0
+# length of the ring buffer between the record callback and its consumers, unit: second
+recordingConfig["ringBufferDuration"] = 5
+# writerMode
+# (1) buffered : keep each file in a RAM buffer and write it when it is complete
+# (2) streaming: write each chunk to a preallocated memory-mapped file as it arrives
+recordingConfig["writerMode"] = 'buffered'
+# number of preallocated file buffers reused by the file assembler (buffered mode only)
+recordingConfig["recordBufferPoolSize"] = 3
+# writer service: number of writer threads and maximum number of queued files
+recordingConfig["writerWorkerCount"] = 2
+recordingConfig["writerQueueSize"] = 4
+# summary sidecar (<name>.summary.npz) of each file: min/max envelopes, RMS of each chunk and the statistics of the file,
+# computed while the file is assembled, consumers (waveform plots, stats) do not need to load the PCM data
+recordingConfig["enableSummary"] = True
+# the record writer notifies the file system of each committed file directly,
+# the watchdog observer of the record folder only picks up files copied there by other programs
+recordingConfig["enableWatchdogFallback"] = False
+# streaming features: rolling RMS, peak, crest factor and kurtosis of each chunk, computed without touching the disk
+recordingConfig["enableStreamingFeatures"] = True
+# length of the rolling window, unit: chunk (recordChunk)
+recordingConfig["streamingFeatureWindow"] = 10
+# storageFormat of recorded files
+# (1) wav : keep the raw WAV files
+# (2) flac: compress each file to FLAC (needs soundfile, 16/24 bit), the raw WAV is deleted after the data analysis has loaded it
+# (3) mdz : lossless delta + zlib format of MaintletCompression (numpy only, any sample width)
+recordingConfig["storageFormat"] = 'wav'
+# number of encoder processes and maximum number of files being compressed
+recordingConfig["encoderWorkerCount"] = 2
+recordingConfig["encoderQueueSize"] = 8
+# channel masking: only store the channels of connected sensors (type is not NC) in the recorded files
+# the audio interface still captures channelCount channels, the channel map is saved in the database
+recordingConfig["enableChannelMask"] = False
 
 #=================== PLAYBACK ===================
 playbackConfig = {}
@@ -110,25 +198,32 @@ playbackConfig["files"] = ['testAudio/testRecordAndPlay.wav',
             'testAudio/testRecordAndPlay.wav']
 
 #=================== EXPERIMENT ===================
+# any number of sensors, sensor i is recorded on the merged channel i unless its 'channel' is set
 sensorConfig = {}
 sensorConfig['sensor1'] = {}
 sensorConfig['sensor1']['type'] = 'vibration'
 sensorConfig['sensor1']['location'] = 'left side'
+sensorConfig['sensor1']['decimation'] = 1 # keep 1 of every N samples after low-pass filtering, e.g., 4 for a low-bandwidth sensor (must divide samplingRate and recordChunk)
 sensorConfig['sensor2'] = {}
 sensorConfig['sensor2']['type'] = 'microphone'
 sensorConfig['sensor2']['location'] = 'left side'
+sensorConfig['sensor2']['decimation'] = 1
 sensorConfig['sensor3'] = {}
 sensorConfig['sensor3']['type'] = 'NC'
 sensorConfig['sensor3']['location'] = 'top'
+sensorConfig['sensor3']['decimation'] = 1
 sensorConfig['sensor4'] = {}
 sensorConfig['sensor4']['type'] = 'NC'
 sensorConfig['sensor4']['location'] = 'top'
+sensorConfig['sensor4']['decimation'] = 1
 sensorConfig['sensor5'] = {}
 sensorConfig['sensor5']['type'] = 'NC'
 sensorConfig['sensor5']['location'] = 'top'
+sensorConfig['sensor5']['decimation'] = 1
 sensorConfig['sensor6'] = {}
 sensorConfig['sensor6']['type'] = 'NC'
 sensorConfig['sensor6']['location'] = 'top'
+sensorConfig['sensor6']['decimation'] = 1
 
 experimentConfig = {}
 experimentConfig["experimentName"] = 'TestGain'
@@ -138,6 +233,45 @@ experimentConfig["recordCount"] = 0
 # unit: second
 experimentConfig["recordFileDuration"] = 20
 experimentConfig["recordInterval"] = 0
+# recordMode
+# (1) interval: record recordFileDuration, then wait for recordInterval
+# (2) trigger : keep a pre-trigger window in memory and record a file only when the streaming features
+#               (enableStreamingFeatures) cross a threshold or change quickly, plus a periodic keep-alive file
+# (3) continuous: capture never pauses (recordInterval is ignored), files are back-to-back storage segments
+#                 and the data analysis reads overlapping windows in the shared record ring buffer
+experimentConfig["recordMode"] = 'interval'
+# unit: second, recorded before the triggering chunk (shorter than recordFileDuration)
+experimentConfig["triggerPreDuration"] = 0.5
+# feature name (RMS, Peak, CrestFactor, Kurtosis) -> threshold, samples are in [-1, 1)
+experimentConfig["triggerThresholds"] = {'RMS': 0.2, 'Kurtosis': 8}
+# relative change of the RMS between two chunks, 0 disables it
+experimentConfig["triggerChangeRate"] = 1.0
+# unit: second, record a file if nothing is recorded for this long, 0 disables it
+experimentConfig["triggerKeepAliveInterval"] = 600
+# unit: second, continuous mode: overlapping analysis windows read in the record ring buffer (no copy), independent of the recorded files
+experimentConfig["analysisWindowDuration"] = 1
+experimentConfig["analysisWindowHop"] = 0.5 # 50% overlap
+# adaptive duty cycle (interval mode): the data analysis results change recordInterval at runtime
+# the interval is halved (down to minRecordInterval, 0 is continuous) when the anomaly scores trend up or a safezone is left
+# and doubled (up to maxRecordInterval) after adaptiveStableCount normal results
+experimentConfig["enableAdaptiveInterval"] = False
+experimentConfig["minRecordInterval"] = 0
+experimentConfig["maxRecordInterval"] = 60
+experimentConfig["adaptiveStableCount"] = 10
+# the scores trend up if the slope of the latest adaptiveTrendWindow scores is above adaptiveTrendThreshold * their mean (per result)
+experimentConfig["adaptiveTrendWindow"] = 10
+experimentConfig["adaptiveTrendThreshold"] = 0.01
+# budgets: the interval is never shortened (and is lengthened) while one is exceeded
+experimentConfig["maxCpuLoad"] = 0.8 # 1-minute load average per core
+experimentConfig["maxCpuTemperature"] = 75 # unit: Celsius
+experimentConfig["minFreeDiskSpace"] = 1024 # unit: MB
+# data analysis of files or windows with gaps: 'mask' (interpolate the spectrogram frames across a gap), 'skip' (no anomaly score) or 'ignore'
+experimentConfig["gapPolicy"] = 'mask'
+# retention of the record files: a disk cleanup evicts files by retention key (their timestamp, moved by the labels of the data analysis)
+experimentConfig["maxFileAge"] = 0 # unit: day, older files are evicted even if the disk is not full, 0 disables it
+experimentConfig["anomalyRetention"] = 7 # unit: day, a file labelled anomalous is evicted as if it was recorded this much later
+experimentConfig["stableThinning"] = 10 # in a run of files labelled normal, only every Nth file keeps its place, 1 disables it
+experimentConfig["stableEarlyEviction"] = 1 # unit: day, the other files of the run are evicted as if they were recorded this much earlier
 experimentConfig["enableDataAnalysis"] = False
 #============================= END OF CONFIGS ==============================
 
@@ -174,9 +308,31 @@ config['playbackConfig'] = playbackConfig
 config['sensorConfig'] = sensorConfig
 config['experimentConfig'] = experimentConfig
 
-targetFileSize = recordingConfig["samplingRate"] * recordingConfig["channelCount"] * recordingConfig["sampleWidth"] * experimentConfig["recordFileDuration"] + 44 # for wav
+# channels stored in the recorded files
+storedChannelIndices = list(range(recordingConfig["channelCount"]))
+if recordingConfig["enableChannelMask"]:
+    connectedChannelIndices = sorted(set(sensor.get('channel', i) for i, sensor in enumerate(sensorConfig.values()) if sensor['type'] != 'NC'))
+    if len(connectedChannelIndices) > 0:
+        storedChannelIndices = connectedChannelIndices
+
+# stored channels are grouped by decimation factor, each group is saved in its own file: [(factor, channelIndices), ...]
+storageGroupSpecs = getStorageGroupSpecs(storedChannelIndices,
+                                         {sensor.get('channel', i): sensor.get('decimation', 1) for i, sensor in enumerate(sensorConfig.values())},
+                                         recordingConfig["samplingRate"], recordingConfig["recordChunk"])
+storageGroupSuffixes = [getStorageGroupSuffix(factor, recordingConfig["samplingRate"]) for factor, channelIndices in storageGroupSpecs]
+targetFileSizes = [recordingConfig["samplingRate"] // factor * len(channelIndices) * recordingConfig["sampleWidth"] * experimentConfig["recordFileDuration"] + 44 # for wav
+                   for factor, channelIndices in storageGroupSpecs]
+targetFileSize = targetFileSizes[0]
+
+# the channel used by the data analysis (sensor1 if it is stored) and the storage group containing it
+sensor1Channel = list(sensorConfig.values())[0].get('channel', 0)
+analysisChannelIndex = sensor1Channel if sensor1Channel in storedChannelIndices else storedChannelIndices[0]
+analysisGroupIndex = [i for i, (factor, channelIndices) in enumerate(storageGroupSpecs) if analysisChannelIndex in channelIndices][0]
 
+# disk cleanup watermarks: a cleanup starts when the free disk space drops below minimumDiskSpace,
+# and evicts a batch of files until cleanupTargetDiskSpace is free
 minimumDiskSpace = 100 # unit: MB
+cleanupTargetDiskSpace = 500 # unit: MB
 
 WiFiIP = os.popen("ifconfig wlan0 | grep 'inet ' | awk {'print $2'}").read().strip()
 
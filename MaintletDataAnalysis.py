@@ -11,7 +11,7 @@
 
 import cv2
 import os
-from MaintletConfig import experimentConfig, pathNameConfig, recordingConfig, deviceHeader, WiFiIP, HTTPPort
+from MaintletConfig import experimentConfig, pathNameConfig, recordingConfig, deviceHeader, WiFiIP, HTTPPort, storageGroupSpecs, analysisChannelIndex, analysisGroupIndex
 from MaintletLog import logger
 import numpy as np
 import scipy.io.wavfile as wav
@@ -22,6 +22,13 @@ import more_itertools as mit
 import matplotlib.pyplot as plt
 from matplotlib.patches import Rectangle
 from MaintletNetworkManager import MaintletPayload
+from MaintletMessage import MaintletMessage
+from MaintletAnalysisWindows import MaintletAnalysisWindowConsumer
+from MaintletGaps import getGapFrameMask
+from MaintletSummary import loadSummary, getSummaryEnvelope
+from MaintletStatistics import STATISTICS_FIELD_NAMES
+import queue
+from datetime import datetime
 from MaintletGainControl import gainControl, channelNames
 import requests
 alertSystemURL = f"http://10.193.199.26:8000/send-email"
@@ -64,6 +71,13 @@ power = 2.0
 as_state_train = 0
 as_state_test = 1
 
+# the analysed channel (sensor1 if it is stored), its position in a file is given by the channel map of its storage group
+analysisChannel = analysisChannelIndex
+analysisChannelInFile = storageGroupSpecs[analysisGroupIndex][1].index(analysisChannel)
+
+# files or windows with dropped frames: 'mask', 'skip' or 'ignore'
+gapPolicy = experimentConfig['gapPolicy']
+
 isPlot = False
 
 class MaintletDataAnalysis:
@@ -90,6 +104,16 @@ class MaintletDataAnalysis:
         self.curFileName = ''
         self.rawDataToPlot = ''
         self.spectrogramToPlot = ''
+        self.curSummary = None # the summary sidecar of the current file, None for a window or a file without sidecar
+        # continuous mode: analyse overlapping windows in the shared record ring buffer instead of files
+        self.isWindowSource = experimentConfig['recordMode'] == 'continuous'
+        # the data collection only reads the results when it adapts its interval, otherwise they would pile up in the queue
+        self.isResultToDataCollection = experimentConfig['enableAdaptiveInterval'] and experimentConfig['recordMode'] == 'interval'
+        self.windowConsumer = MaintletAnalysisWindowConsumer() if self.isWindowSource else None
+        # discontinuities (offset, length) in samples of the current data, and of the files not analysed yet (by file name)
+        self.curGaps = []
+        self.pendingGaps = {}
+        self.totalSkippedData = 0
         # for plots
         if isPlot:
             self.means_x = []
@@ -102,17 +126,59 @@ class MaintletDataAnalysis:
     def _loadData(self, filePath):
         self.curFilePath = filePath
         self.curFileName = filePath.split('/')[-1].split('.wav')[0]
+        self.curSummary = loadSummary(filePath)
         data, _ = librosa.load(filePath, sr=sr, mono=False)
-        dataCh1 = data[0, :]
+        # a file with one stored channel is loaded as a 1-D array
+        data = np.atleast_2d(data)
+        dataCh1 = data[analysisChannelInFile, :]
         self.rawDataToPlot = dataCh1
         return dataCh1    
 
+    def _loadWindow(self, descriptor):
+        """ Read the analysed channel of a window in the shared record ring buffer, return None if the window is overwritten """
+        result = self.windowConsumer.read(descriptor, recordingConfig['sampleWidth'], recordingConfig['channelCount'], channelIndices=[analysisChannel])
+        if result == None:
+            return None
+        y, unixTime = result
+        self.curGaps = descriptor.get('gaps', [])
+        self.curSummary = None
+        # windows are named like record files
+        self.curFilePath = ''
+        self.curFileName = datetime.fromtimestamp(unixTime).strftime("%m_%d_%Y_%H_%M_%S_%f") + "_" + deviceHeader["macAddress"] + "_window"
+        dataCh1 = y[:, 0]
+        self.rawDataToPlot = dataCh1
+        return dataCh1
+
+    def _getFileGaps(self, fileName, inQ):
+        """ Get the discontinuities of a file, the data collection sends them before the file is written """
+        while inQ != None:
+            try:
+                message = inQ.get_nowait()
+            except queue.Empty:
+                break
+            if message.command == 'recordGaps':
+                self.pendingGaps[message.payload['file']] = message.payload['gaps']
+        return self.pendingGaps.pop(fileName, [])
+
+    def _maskGaps(self, melSpectrogram):
+        """ Replace the spectrogram frames across a discontinuity by interpolating the other frames (gapPolicy 'mask') """
+        if gapPolicy != 'mask' or len(self.curGaps) == 0:
+            return melSpectrogram
+        mask = getGapFrameMask(self.curGaps, melSpectrogram.shape[0], n_fft, hop_length)
+        if mask.all():
+            return melSpectrogram
+        frames = np.arange(len(mask))
+        for k in range(melSpectrogram.shape[1]):
+            melSpectrogram[mask, k] = np.interp(frames[mask], frames[~mask], melSpectrogram[~mask, k])
+        logger.info(f"{self.curFileName}: {np.count_nonzero(mask)} spectrogram frames across {len(self.curGaps)} gaps are masked")
+        return melSpectrogram
+
     def _setReferenceData(self, data):
         testDataCh1 = data
         # make spectrogram
         testMelSpectrogram = librosa.feature.melspectrogram(y=testDataCh1, sr=sr, n_mels=64, n_fft=n_fft, hop_length=hop_length)
         # expected shape should be (?, 64)
-        testMelSpectrogram = librosa.power_to_db(testMelSpectrogram).T
+        testMelSpectrogram = self._maskGaps(librosa.power_to_db(testMelSpectrogram).T)
         # reshape
         testFrameSequence = np.reshape(testMelSpectrogram, (testMelSpectrogram.shape[0], frameSize[0], frameSize[1]))
         self.frameSequenceTemplate = np.zeros((testMelSpectrogram.shape[0]*2,frameSize[0], frameSize[1]))
@@ -125,7 +191,7 @@ class MaintletDataAnalysis:
         # make spectrogram
         testMelSpectrogram = librosa.feature.melspectrogram(y=testDataCh1, sr=sr, n_mels=64, n_fft=n_fft, hop_length=hop_length)
         # expected shape should be (?, 64)
-        testMelSpectrogram = librosa.power_to_db(testMelSpectrogram).T
+        testMelSpectrogram = self._maskGaps(librosa.power_to_db(testMelSpectrogram).T)
         
         self.spectrogramToPlot = testMelSpectrogram.T
 
@@ -330,10 +396,15 @@ class MaintletDataAnalysis:
         return isBuildSafezone, anomalyScore, 0 if label > 0 or label == -999 else 1
    
     def _basicAnalysis(self, data):
-        std = np.std(data)
-        range = np.ptp(data)
-        _max = np.max(data)
-        _min = np.min(data)
+        if self.curSummary != None:
+            # computed at capture time
+            stats = self.curSummary['stats'][analysisChannelInFile]
+            std, range, _max, _min = (stats[STATISTICS_FIELD_NAMES.index(e)] for e in ['STD', 'Range', 'MAX', 'MIN'])
+        else:
+            std = np.std(data)
+            range = np.ptp(data)
+            _max = np.max(data)
+            _min = np.min(data)
         absMax = max(_max, _min)
         # send range to autogaincontrol
         # send these data to network handler
@@ -361,7 +432,13 @@ class MaintletDataAnalysis:
     
     def _getRawDataImageAddress(self):
         fig, ax = plt.subplots()
-        librosa.display.waveplot(self.rawDataToPlot,sr=sr, ax=ax, offset=1)
+        if self.curSummary != None:
+            # plot the min/max envelope of the sidecar instead of every sample
+            envelopeMin, envelopeMax, binSize = getSummaryEnvelope(self.curSummary, maxBinCount=2000)
+            t = np.arange(len(envelopeMin)) * binSize / int(self.curSummary['samplingRate'])
+            ax.fill_between(t, envelopeMin[:, analysisChannelInFile], envelopeMax[:, analysisChannelInFile], step='post', linewidth=0)
+        else:
+            librosa.display.waveplot(self.rawDataToPlot,sr=sr, ax=ax, offset=1)
         ax.set_xlabel("Offset Time (S)")
         ax.set_ylabel("Amplitude")
         plt.close(fig)
@@ -383,18 +460,40 @@ class MaintletDataAnalysis:
         fig.savefig(imagePath, bbox_inches='tight')
         return imageName + '.png', f"http://{WiFiIP}:{HTTPPort}/{imagePath}", imagePath
 
-    def run(self, fileSystemToDataAnalysisQ, networkingOutQ):
+    def run(self, fileSystemToDataAnalysisQ, networkingOutQ, dataAnalysisToFileSystemQ=None, dataAnalysisToDataCollectionQ=None, dataCollectionToDataAnalysisQ=None):
         try:
             while True:
-                filePath = fileSystemToDataAnalysisQ.get()
+                if self.isWindowSource:
+                    message = dataCollectionToDataAnalysisQ.get()
+                    data = self._loadWindow(message.payload)
+                    if data is None:
+                        continue
+                    filePath = self.curFileName
+                else:
+                    filePath = fileSystemToDataAnalysisQ.get()
+                    data = self._loadData(filePath=filePath)
+                    self.curGaps = self._getFileGaps(filePath.split('/')[-1], dataCollectionToDataAnalysisQ)
+                    # tell the file system we do not need the raw file anymore (it can be deleted after compression)
+                    if dataAnalysisToFileSystemQ != None:
+                        dataAnalysisToFileSystemQ.put(filePath)
+                if len(self.curGaps) > 0 and gapPolicy == 'skip':
+                    # dropped frames would look like an anomaly
+                    self.totalSkippedData += 1
+                    logger.warning(f"Skip {self.curFileName}, it has {len(self.curGaps)} gaps (total skipped: {self.totalSkippedData})")
+                    continue
                 self.counter += 1
-                data = self._loadData(filePath=filePath)
                 # gain control
                 std, range, absMax = self._basicAnalysis(data=data)
                 channelName = channelNames[0]
                 #gainControl(absMax, channelName)
                 if experimentConfig['enableDataAnalysis']:
                     isBuildSafezone, anomalyScore, label = self._anomalyDetection(data=data)
+                    # feed the adaptive duty cycle of the data collection module (after training)
+                    if dataAnalysisToDataCollectionQ != None and self.isResultToDataCollection and self.state == as_state_test:
+                        dataAnalysisToDataCollectionQ.put(MaintletMessage('analysisResult', {'anomalyScore': anomalyScore, 'label': label, 'file': filePath}))
+                    # the retention policies of the file system keep anomalous files longer
+                    if dataAnalysisToFileSystemQ != None and not self.isWindowSource and self.state == as_state_test:
+                        dataAnalysisToFileSystemQ.put(MaintletMessage('analysisResult', {'anomalyScore': anomalyScore, 'label': label, 'file': filePath}))
                     # networking
                     if self.counter == when2Alert:
                         # simulate we detect an error
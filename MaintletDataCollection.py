@@ -12,34 +12,45 @@
 #===========================================================================
 #                            Import Required Modules
 #===========================================================================
-import pyaudio # for reading data from audio interface
 import wave # for saving audio data to WAV files
 import time # for calculating running time
-from datetime import datetime # for get current time
 import numpy as np # for data processing
-import copy
+import logging
 # multi-threading related
-import subprocess 
 import threading
+import queue
+import functools
 
 # Some system modules
 import sys
-from gpiozero import CPUTemperature # get current CPU temperature 
 import shutil
 import os
-from os.path import isfile, join
-from os import listdir
 import traceback
 
 # Other Maintlet modules
-from MaintletSensor import MaintletSensor
+from MaintletSensor import createSensors, getConnectedChannelIndices
 from MaintletTable import TableEntryForRecordedFile
 from MaintletLog import logger
 from MaintletError import *
-from MaintletConfig import config 
-from MaintletSharedObjects import timer
+from MaintletConfig import config, analysisChannelIndex
+from MaintletSharedObjects import timer, dataAnalysisToDataCollectionQ, dataCollectionToDataAnalysisQ, fileCommittedQ, manifest
 from MaintletDatabase import MaintletDatabase
 from MaintletMessage import MaintletMessage
+from MaintletRingBuffer import MaintletRingBuffer
+from MaintletPCM import decodePCM
+from MaintletStatistics import computeChannelStatistics, STATISTICS_FIELD_NAMES
+from MaintletRecordWriter import MaintletRecordWriter, MaintletStreamingWavFile
+from MaintletStreamingFeatures import MaintletStreamingFeatures
+from MaintletCaptureBackend import createCaptureBackend, paContinue, paAbort
+from MaintletStorageLayout import MaintletStorageGroup, getStorageGroupSpecs, getRecordFilepath, scanRecordFolder
+from MaintletTrigger import MaintletRecordTrigger
+from MaintletScheduler import MaintletDutyCycleScheduler
+from MaintletAnalysisWindows import MaintletAnalysisWindowProducer
+from MaintletClock import MaintletClock
+from MaintletAlignment import MaintletInputDevice, MaintletDeviceAligner
+from MaintletSummary import MaintletFileSummary
+from MaintletGaps import MaintletGapDetector, scaleGaps, formatGaps
+from MaintletChunkCalibration import MaintletChunkCalibrator, getChunkCandidates, getDeviceModel, loadChunkCalibration, saveChunkCalibration
 import MaintletGainControl
 #============================= END OF IMPORT ==============================
 
@@ -52,10 +63,19 @@ class MaintletDataCollection():
         self.databaseHandler = databaseHandler # an object which handles all database related operations
         self.networkHandler = networkHandler # an object which handles all network/communication related operations
 
+        # autoRetry statistics, they are kept across restarts
+        self.totalColdRestart = 0 # restarts which reconfigure everything (capture backend, device, buffers, threads)
+        self.totalWarmRestart = 0 # restarts which only reopen the record stream
+        self.restartRequestTime = None # time.monotonic() of the first failure of the current restart
+        self.restartPrevADCTime = -1 # the ADC time of the last good chunk before the failure
+        self.lastRestartLatency = 0 # seconds from the failure to the first good chunk
+        self.maxRestartLatency = 0
+        self.totalRestartGap = 0 # ADC time lost by all restarts in second
+
     def configAll(self):
         """ do all configurations """
-        # create pyaudio obj
-        self.createPyaudio()
+        # create the capture backend (pyaudio or virtual)
+        self.createCaptureBackend()
 
         # setup shared configurations
         self.configCommon()
@@ -76,7 +96,6 @@ class MaintletDataCollection():
         self.enableNetwork = self.config['networkConfig']['enableNetwork']  # If false, all data will be stored locally
 
         # Init some variables for performance tracking
-        self.cpuTemperature = CPUTemperature() # CPU temperature
         self.maxCpuTemp = 0
         self.diskPath = os.getcwd() # we want to know the remaining space of the disk mounted to the current folder
         self.remainingSpace = self.getCurrentRemainingDiskSpace() # remaining space control
@@ -92,6 +111,7 @@ class MaintletDataCollection():
 
         # Load configurations (folders)
         self.recordFolderPath = self.config['pathNameConfig']['recordFolderPath']
+        self.recordFolderLayout = self.config['pathNameConfig']['recordFolderLayout'] # flat, or sharded by the time of the file
 
         # Load configurations (edge device information)
         self.deviceMac = self.config['deviceConfig']['deviceMac']
@@ -109,20 +129,19 @@ class MaintletDataCollection():
         self.recordCount = int(self.config['experimentConfig']['recordCount'])
         self.recordFileDuration = int(self.config['experimentConfig']['recordFileDuration'])
         self.recordInterval = int(self.config['experimentConfig']['recordInterval'])
+        self.recordMode = self.config['experimentConfig']['recordMode']
+        if self.recordMode == 'continuous':
+            # capture never pauses, files are back-to-back storage segments
+            self.recordInterval = 0
 
-        # Load configurations (sensor)
-        self.sensor1 = MaintletSensor(self.config['sensorConfig']['sensor1'])
-        self.sensor2 = MaintletSensor(self.config['sensorConfig']['sensor2'])
-        self.sensor3 = MaintletSensor(self.config['sensorConfig']['sensor3'])
-        self.sensor4 = MaintletSensor(self.config['sensorConfig']['sensor4'])
-        self.sensor5 = MaintletSensor(self.config['sensorConfig']['sensor5'])
-        self.sensor6 = MaintletSensor(self.config['sensorConfig']['sensor6'])
-        self.sensors = [self.sensor1, self.sensor2, self.sensor3, self.sensor4, self.sensor5, self.sensor6]
+        # Load configurations (sensor), any number of sensors mapped to the merged channels of all input devices
+        self.sensors = createSensors(self.config['sensorConfig'])
         
         # After the device is rebooted, starting data collection module (driver or portAudio, we do not know the reason) will fail in the first several trials. 
         # Here we detect these failures and automatically retry to start the data collection module. 
         # We name this operation as autoRetry
-        self.prevADCTime = -1
+        self.isRestartRequested = False # set by the record callback, the restart is done by the main loop in start()
+        self.enableWarmRestart = self.config['recordingConfig']['enableWarmRestart']
 
 #===========================================================================
 #                            Utility Methods
@@ -134,9 +153,9 @@ class MaintletDataCollection():
         return(round(stat.free/1024/1024,2))
 
     def getAllFilepaths(self, data_dir):
-        """ Get all absolute file paths in a directory and sort them in alphabetical order """
+        """ Get all absolute file paths in a directory (and its shards) and sort them in alphabetical order """
         filepaths = []
-        filepaths = sorted([join(data_dir, f) for f in listdir(data_dir) if isfile(join(data_dir, f)) and 'wav' in f])
+        filepaths = sorted([entry.path for entry in scanRecordFolder(data_dir) if 'wav' in entry.name])
         return filepaths
 
     def getOldestFilepath(self, filepaths):
@@ -144,32 +163,19 @@ class MaintletDataCollection():
         return filepaths[0]
 
     
-    def getDeviceIndex(self, targetDeviceName):
+    def getDeviceIndex(self, targetDeviceName, excludedIndices=()):
         """
         get the system index given index name or part of the name
 
         Args:
             targetDeviceName (str): output device: ac101; input device: seeed
+            excludedIndices (tuple, optional): Indices already in use (several devices with the same name). Defaults to ().
 
         Returns:
-            int: -1 means fail, other number is the index of the device
+            int: the index of the device (raise GetDeviceIndexError if fail)
         """
-        info = self.pyaudio.get_host_api_info_by_index(0)
-        numdevices = info.get('deviceCount')
-
-        for i in range(0, numdevices):
-            deviceName = self.pyaudio.get_device_info_by_host_api_device_index(0, i).get('name')
-            print(deviceName)
-            if targetDeviceName in deviceName:
-                print("Device name", deviceName, "id -", i)
-                return i
-
-        raise GetDeviceIndexError(targetDeviceName)
+        return self.captureBackend.getDeviceIndex(targetDeviceName, excludedIndices)
     
-    def flipDoubleBufferSelector(self):
-        """ Flip the doubleBufferSelector after one buffer is full. """        
-        self.doubleBufferSelector = 1 - self.doubleBufferSelector
-
     def safeQuery(self, variable, default = -1):
         """
         Dereference the variable after checking if it exists in this instance
@@ -196,18 +202,11 @@ class MaintletDataCollection():
         table.playbackSampleWidth = self.safeQuery("playbackSampleWidth")
         table.playbackChunk = self.safeQuery("playChunk")
         table.playbackFileNames = ';'.join(self.safeQuery("self.playbackAudioFilesPathList", default=['-1']))
-        table.sensor1Type = self.safeQuery("sensor1").type
-        table.sensor1Location = self.safeQuery("sensor1").location
-        table.sensor2Type = self.safeQuery("sensor2").type
-        table.sensor2Location = self.safeQuery("sensor2").location
-        table.sensor3Type = self.safeQuery("sensor3").type
-        table.sensor3Location = self.safeQuery("sensor3").location
-        table.sensor4Type = self.safeQuery("sensor4").type
-        table.sensor4Location = self.safeQuery("sensor4").location
-        table.sensor5Type = self.safeQuery("sensor5").type
-        table.sensor5Location = self.safeQuery("sensor5").location
-        table.sensor6Type = self.safeQuery("sensor6").type
-        table.sensor6Location = self.safeQuery("sensor6").location
+        # the first six sensors keep their own columns, the sensors column has all sensors
+        for i, sensor in enumerate(self.safeQuery("sensors", default=[])[:6]):
+            setattr(table, f"sensor{i + 1}Type", sensor.type)
+            setattr(table, f"sensor{i + 1}Location", sensor.location)
+        table.sensors = ';'.join(str(sensor) for sensor in self.safeQuery("sensors", default=[]))
         table.volumes = ','.join(str(e) for e in MaintletGainControl.currentVolumes)
         table.experimentName = self.safeQuery("experimentName")
         table.experimentDescription = self.safeQuery("experimentDescription")
@@ -222,34 +221,50 @@ class MaintletDataCollection():
 
     def createTableEntry(self, tableTemplate):
         """ create database entry """ 
-        table = copy.deepcopy(tableTemplate)
-        return table
+        return tableTemplate.clone()
     
-    def createPyaudio(self):
-        """ Create the PyAudio object"""
-        self.pyaudio = pyaudio.PyAudio()
+    def createCaptureBackend(self):
+        """ Create the capture backend selected by recordingConfig['captureBackend'] """
+        self.captureBackend = createCaptureBackend(self.config['recordingConfig'])
 
-    def terminatePyaudio(self):
-        """ Terminate the PyAudio object """
-        self.pyaudio.terminate()
+    def terminateCaptureBackend(self):
+        """ Terminate the capture backend """
+        self.captureBackend.terminate()
 
     def start(self):
         """ Start the loop for record or playback or both"""
         if self.enableRecording:
+            self.startRecordAssembler()
+            if self.streamingFeatures != None:
+                self.streamingFeatures.start()
+            if self.enableAdaptiveInterval:
+                self.startDutyCycleScheduler()
+            if self.analysisWindowProducer != None:
+                self.analysisWindowProducer.start()
+            if self.deviceAligner != None:
+                self.deviceAligner.start()
             self.openRecordStream()
         if self.enablePlayback:
             self.openPlayStream()
+        self.monitor()
+
+    def monitor(self):
+        """ The main loop: track statistics and hand failures of the record callback to autoRetry """
         while True and self.stopThread == False:
+            if self.isRestartRequested:
+                raise ADCTimeError
             try:
                 time.sleep(0.5)
                 # track some statistics
                 # cpu temperature
-                temp = self.cpuTemperature.temperature
+                temp = self.captureBackend.getCpuTemperature()
                 if temp > self.maxCpuTemp:
                     self.maxCpuTemp = temp
                 # RAM ... 
                 # log or send results to server
                 logger.info(f"CPU Temperature {temp}, MAX Temp {self.maxCpuTemp}")
+                if self.enableRecording:
+                    self.checkRecordChunk()
 
             except KeyboardInterrupt:
                 # if use want to leave, we close everything and exit
@@ -260,38 +275,119 @@ class MaintletDataCollection():
         """ close everything in this instance (threads, opened streams, files...)"""
         if self.enableRecording:
             self.stopRecordStream()
+            if hasattr(self, 'deviceAligner') and self.deviceAligner != None:
+                self.deviceAligner.stop()
+            self.stopRecordAssembler()
+            if hasattr(self, 'streamingFeatures') and self.streamingFeatures != None:
+                self.streamingFeatures.stop()
+            if hasattr(self, 'dutyCycleSchedulerThread'):
+                self.stopDutyCycleScheduler()
+            if hasattr(self, 'analysisWindowProducer') and self.analysisWindowProducer != None:
+                self.analysisWindowProducer.stop()
+            if hasattr(self, 'recordRingBuffer'):
+                # free the shared memory of the continuous mode, a restart creates a new ring buffer
+                self.recordRingBuffer.close()
         if self.enablePlayback:
             self.stopPlayStream()
             self.closePlayFile()
-        #self.terminatePyaudio()
+        #self.terminateCaptureBackend()
         self.stopThread = True
 
     def prepareRestart(self):
         """ close everything in this instance for retry """
         self.closeAll()
+
+    def warmRestart(self):
+        """
+        Only reopen the record stream for retry.
+        The capture backend, the device index, the boot time offset, the ring buffer, the file buffers and all threads are kept.
+        """
+        self.stopRecordStream()
+        # the file assembler discards the unfinished file, it would contain a gap
+        self.recordRestartSeq = self.recordRingBuffer.writeIndex
+        for device in self.inputDevices:
+            device.prevADCTime = -1
+        if self.deviceAligner != None:
+            self.deviceAligner.reset()
+        self.isRestartRequested = False
+        self.openRecordStream()
+
+    def getRestartStatus(self):
+        """
+        Get the statistics of autoRetry
+
+        Returns:
+            dict: statistics
+        """
+        status = {}
+        status['totalColdRestart'] = self.totalColdRestart
+        status['totalWarmRestart'] = self.totalWarmRestart
+        status['lastRestartLatency'] = self.lastRestartLatency
+        status['maxRestartLatency'] = self.maxRestartLatency
+        status['totalRestartGap'] = self.totalRestartGap
+        return status
+
+    def getCaptureStatus(self):
+        """
+        Get the statistics of every input device (overflows, and late or missing chunks with several devices)
+
+        Returns:
+            dict: statistics
+        """
+        if self.deviceAligner != None:
+            return self.deviceAligner.getStatus()
+        return {'devices': [device.getStatus() for device in self.inputDevices]}
         
     def closeAndExit(self):
         """ close everyting in this instance and exit """
         self.timer.saveTimeToFile()
         self.closeAll()
+        if hasattr(self, 'recordWriter') and threading.current_thread() not in self.recordWriter.workers:
+            # write all queued files
+            self.recordWriter.stop()
+        if hasattr(self, 'inputDevices'):
+            logger.info(f"Capture: {self.getCaptureStatus()}")
+        if hasattr(self, 'clock'):
+            logger.info(f"Clock: {self.clock.getStatus()}")
+            self.clock.stop()
         sys.exit(0)
 
     def run(self):
         """ wrapper for start, autoRetry """
-        start = True
+        error = None
         # auto retry
         while True:
             try:
-                if start != True:
-                    # only run this step when restart
+                if error == None:
+                    self.configAll()
+                    self.start()
+                elif isinstance(error, RecordChunkChangedError):
+                    # not a failure, restart everything with the new record chunk
                     self.prepareRestart()
-                self.configAll()
-                self.start()
-                start = False 
+                    self.configAll()
+                    self.start()
+                elif isinstance(error, ADCTimeError) and self.enableWarmRestart:
+                    # warm restart: the record stream is the only thing which failed
+                    self.totalWarmRestart += 1
+                    self.warmRestart()
+                    self.monitor()
+                else:
+                    # cold restart
+                    self.totalColdRestart += 1
+                    self.prepareRestart()
+                    self.configAll()
+                    self.start()
+                error = None
             except Exception as e:
-                traceback.print_exc()
-                logger.error(f"RESTART: {e}")
-                time.sleep(1)
+                error = e
+                if isinstance(e, RecordChunkChangedError):
+                    logger.warning(f"RESTART: {e}")
+                elif isinstance(e, ADCTimeError) and self.enableWarmRestart:
+                    logger.warning(f"RESTART (warm): {e}")
+                else:
+                    traceback.print_exc()
+                    logger.error(f"RESTART: {e}")
+                    time.sleep(1)
 #============================= END OF Utility Methods ==============================
 
 #===========================================================================
@@ -299,8 +395,8 @@ class MaintletDataCollection():
 #===========================================================================
     def configRecord(self):
         """ Config record interface """
-        # placeholder for recordStream object
-        self.recordStream = None
+        # placeholder for the input devices and their record streams
+        self.inputDevices = []
 
         # Load configurations (recording)
         self.samplingRate = int(self.config['recordingConfig']['samplingRate'])
@@ -308,45 +404,253 @@ class MaintletDataCollection():
         self.sampleWidth = int(self.config['recordingConfig']['sampleWidth'])
         self.recordChunk= int(self.config['recordingConfig']['recordChunk'])
 
+        # Input devices: each device has its own record stream, their channels are merged in the order of the config
+        channelOffset = 0
+        for inputDevice in self.config['recordingConfig']['inputDevices']:
+            deviceIndex = self.getDeviceIndex(inputDevice['name'], excludedIndices=[device.deviceIndex for device in self.inputDevices])
+            self.inputDevices.append(MaintletInputDevice(inputDevice['name'], inputDevice['channelCount'], channelOffset, deviceIndex))
+            channelOffset += int(inputDevice['channelCount'])
+        if channelOffset != self.channelCount:
+            raise ValueError(f"The input devices have {channelOffset} channels, channelCount is {self.channelCount}")
+
+        # Channel masking: the interface captures channelCount channels, but only connected channels are stored in files
+        self.enableChannelMask = self.config['recordingConfig']['enableChannelMask']
+        self.storedChannelIndices = list(range(self.channelCount))
+        if self.enableChannelMask:
+            connectedChannelIndices = getConnectedChannelIndices(self.sensors)
+            if len(connectedChannelIndices) > 0:
+                self.storedChannelIndices = connectedChannelIndices
+            else:
+                logger.warning("Channel mask: no sensor is connected, store all channels")
+
+        # recordChunkMode auto: the chunk size is calibrated once per device model and saved in chunkCalibrationPath
+        # The chosen chunk is kept across restarts, the live callback CPU load may change it (see checkRecordChunk)
+        self.recordChunkMode = self.config['recordingConfig']['recordChunkMode']
+        self.chunkCalibrator = None
+        if self.recordChunkMode == 'auto':
+            candidates = getChunkCandidates(self.config['recordingConfig']['recordChunkCandidates'], self.samplingRate,
+                                            [sensor.decimation for sensor in self.sensors if sensor.channel in self.storedChannelIndices])
+            self.chunkCalibrator = MaintletChunkCalibrator(self.captureBackend, self.inputDevices, self.samplingRate, self.sampleWidth,
+                                                           candidates=candidates,
+                                                           targetCpuLoad=self.config['recordingConfig']['targetCallbackCpuLoad'],
+                                                           maxLatency=self.config['recordingConfig']['maxChunkLatency'],
+                                                           duration=self.config['recordingConfig']['chunkCalibrationDuration'])
+            if not hasattr(self, 'calibratedRecordChunk'):
+                self.calibratedRecordChunk = self.calibrateRecordChunk()
+            self.recordChunk = self.calibratedRecordChunk
+        self.chunkRecalibrationInterval = float(self.config['recordingConfig']['chunkRecalibrationInterval'])
+        self.lastChunkCheckTime = time.monotonic()
+
+        # Storage layout: stored channels are grouped by their decimation factor (sensorConfig[...]['decimation'])
+        # each group is saved in its own file, decimated groups have a rate suffix in the filename
+        decimationFactors = {sensor.channel: sensor.decimation for sensor in self.sensors}
+        self.storageGroups = [MaintletStorageGroup(factor, channelIndices, self.samplingRate, self.sampleWidth, self.channelCount,
+                                                   self.recordChunk, self.recordFileDuration)
+                              for factor, channelIndices in getStorageGroupSpecs(self.storedChannelIndices, decimationFactors,
+                                                                                 self.samplingRate, self.recordChunk)]
+
+        # Adaptive duty cycle: the data analysis results change recordInterval at runtime (interval mode only)
+        # The scheduler is long-lived, the adapted interval is kept across restarts
+        self.enableAdaptiveInterval = self.config['experimentConfig']['enableAdaptiveInterval'] and self.recordMode == 'interval'
+        if self.enableAdaptiveInterval:
+            if not hasattr(self, 'dutyCycleScheduler'):
+                self.dutyCycleScheduler = MaintletDutyCycleScheduler(initialInterval=self.recordInterval,
+                                                                     minInterval=self.config['experimentConfig']['minRecordInterval'],
+                                                                     maxInterval=self.config['experimentConfig']['maxRecordInterval'],
+                                                                     stableCount=self.config['experimentConfig']['adaptiveStableCount'],
+                                                                     trendWindow=self.config['experimentConfig']['adaptiveTrendWindow'],
+                                                                     trendThreshold=self.config['experimentConfig']['adaptiveTrendThreshold'],
+                                                                     maxCpuLoad=self.config['experimentConfig']['maxCpuLoad'],
+                                                                     maxCpuTemperature=self.config['experimentConfig']['maxCpuTemperature'],
+                                                                     minFreeDiskSpace=self.config['experimentConfig']['minFreeDiskSpace'])
+            self.recordInterval = self.dutyCycleScheduler.interval
+        self.dutyCycleSchedulerThread = None
+
         # Calculate other values for recording
-        self.recordFormat = self.pyaudio.get_format_from_width(self.sampleWidth)
-        self.recordDeviceIndex = self.getDeviceIndex("seeed")
         self.callbackCountBeforeSaveFile = self.recordFileDuration * self.samplingRate / self.recordChunk
         self.callbackCountBeforeRestartRecording = self.recordInterval * self.samplingRate / self.recordChunk
-        self.outputBufferSizeInByte = self.samplingRate * self.sampleWidth * self.channelCount * self.recordFileDuration
-        self.outputWAVFileSizeInByte = self.outputBufferSizeInByte + 44
-        self.callbackInDataSize = int(self.outputBufferSizeInByte / self.callbackCountBeforeSaveFile)
-        self.systemBootTime = float(subprocess.check_output(['./getclock']))
+        self.callbackInDataSize = self.recordChunk * self.sampleWidth * self.channelCount # a captured chunk
+
+        # Gap accounting: the frames dropped between two chunks are measured with their ADC times (overflows, lost slots)
+        # the discontinuities of a file are stored in its table entry and sent to the data analysis
+        self.gapDetector = MaintletGapDetector(self.samplingRate, self.recordChunk, tolerance=float(self.config['recordingConfig']['gapTolerance']))
+
+        # The clock maps the ADC time to the unix time, its offset and drift are re-estimated in the background
+        # It is long-lived, the estimate is kept across restarts (the sampler always reads the current capture backend)
+        if not hasattr(self, 'clock'):
+            self.clock = MaintletClock(sampler=lambda: self.captureBackend.readClocks(),
+                                       updateInterval=self.config['recordingConfig']['clockUpdateInterval'],
+                                       windowSize=self.config['recordingConfig']['clockWindowSize'],
+                                       stepThreshold=self.config['recordingConfig']['clockStepThreshold'])
+            self.clock.start()
         
+        # Trigger mode: a file starts triggerPreDuration before the chunk which triggers it, the file must contain the triggering chunk
+        self.triggerPreChunkCount = 0
+        if self.recordMode == 'trigger':
+            self.triggerPreChunkCount = int(np.ceil(float(self.config['experimentConfig']['triggerPreDuration']) * self.samplingRate / self.recordChunk))
+            if self.triggerPreChunkCount >= self.callbackCountBeforeSaveFile:
+                self.triggerPreChunkCount = int(self.callbackCountBeforeSaveFile) - 1
+                logger.warning(f"The pre-trigger window is longer than a file, use {self.triggerPreChunkCount} chunks")
+
+        # Continuous mode: the data analysis reads overlapping windows in the ring buffer (shared memory) instead of files
+        self.analysisWindowChunkCount = 0
+        if self.recordMode == 'continuous':
+            self.analysisWindowChunkCount = max(int(np.ceil(float(self.config['experimentConfig']['analysisWindowDuration']) * self.samplingRate / self.recordChunk)), 1)
+            self.analysisHopChunkCount = max(int(np.ceil(float(self.config['experimentConfig']['analysisWindowHop']) * self.samplingRate / self.recordChunk)), 1)
+
+        # Init the ring buffer between the record callback and the file assembler
+        # The record callback only copies each chunk into the next slot, the file assembler thread cuts the stream into files
+        # In trigger mode, the ring buffer also keeps the pre-trigger window
+        # In continuous mode, the ring buffer also keeps an analysis window and mirrors its first slots (contiguous windows)
+        self.ringBufferDuration = float(self.config['recordingConfig']['ringBufferDuration'])
+        self.ringBufferSlotCount = max(int(np.ceil(self.ringBufferDuration * self.samplingRate / self.recordChunk)), 2) + self.triggerPreChunkCount + self.analysisWindowChunkCount
+        self.recordRingBuffer = MaintletRingBuffer(slotCount=self.ringBufferSlotCount, slotSizeInByte=self.callbackInDataSize,
+                                                   mirrorSlotCount=max(self.analysisWindowChunkCount - 1, 0),
+                                                   shared=self.recordMode == 'continuous')
+        self.recordAssemblerReader = self.recordRingBuffer.registerReader("recordAssembler")
+
+        # One input device writes the ring buffer directly. With several devices, each record callback writes the ring buffer
+        # of its device and the aligner merges the chunks of all devices into the ring buffer at the ADC time of device 0
+        self.deviceAligner = None
+        if len(self.inputDevices) == 1:
+            self.inputDevices[0].ringBuffer = self.recordRingBuffer
+        else:
+            deviceSlotCount = max(int(np.ceil(self.ringBufferDuration * self.samplingRate / self.recordChunk)), 2)
+            for device in self.inputDevices:
+                device.ringBuffer = MaintletRingBuffer(slotCount=deviceSlotCount, slotSizeInByte=self.recordChunk * self.sampleWidth * device.channelCount)
+            self.deviceAligner = MaintletDeviceAligner(self.inputDevices, sampleWidth=self.sampleWidth, frameCount=self.recordChunk,
+                                                       samplingRate=self.samplingRate, outRingBuffer=self.recordRingBuffer,
+                                                       maxWait=float(self.config['recordingConfig']['alignMaxWait']))
+        self.recordAssemblerThread = None
+        self.stopRecordAssemblerThread = False
+
+        # Init the streaming feature stage, it reads the same ring buffer with its own reader
+        self.enableStreamingFeatures = self.config['recordingConfig']['enableStreamingFeatures']
+        self.streamingFeatures = None
+        if self.enableStreamingFeatures:
+            self.streamingFeatures = MaintletStreamingFeatures(reader=self.recordRingBuffer.registerReader("streamingFeatures"),
+                                                               sampleWidth=self.sampleWidth,
+                                                               channelCount=self.channelCount,
+                                                               channelIndices=getConnectedChannelIndices(self.sensors),
+                                                               windowChunkCount=self.config['recordingConfig']['streamingFeatureWindow'])
+
+        self.analysisWindowProducer = None
+        if self.recordMode == 'continuous':
+            self.analysisWindowProducer = MaintletAnalysisWindowProducer(reader=self.recordRingBuffer.registerReader("analysisWindows"),
+                                                                         windowChunkCount=self.analysisWindowChunkCount,
+                                                                         hopChunkCount=self.analysisHopChunkCount,
+                                                                         outQ=dataCollectionToDataAnalysisQ,
+                                                                         clock=self.clock,
+                                                                         gapDetector=self.gapDetector)
+
+        # recordMode
+        # (1) interval  : record recordFileDuration, then wait for recordInterval
+        # (2) trigger   : record a file when the streaming features cross a threshold or change quickly, plus a periodic keep-alive file
+        # (3) continuous: record back-to-back files, the data analysis reads overlapping windows in the ring buffer
+        self.recordTrigger = None
+        if self.recordMode == 'trigger':
+            self.recordTrigger = MaintletRecordTrigger(thresholds=self.config['experimentConfig']['triggerThresholds'],
+                                                       changeRate=self.config['experimentConfig']['triggerChangeRate'],
+                                                       preTriggerChunkCount=self.triggerPreChunkCount,
+                                                       keepAliveChunkCount=int(float(self.config['experimentConfig']['triggerKeepAliveInterval']) * self.samplingRate / self.recordChunk))
+            if self.streamingFeatures != None:
+                self.streamingFeatures.addListener(self.recordTrigger.onFeatures)
+            else:
+                logger.warning("Trigger mode without streaming features, only keep-alive files are recorded")
+
+        # writerMode
+        # (1) buffered : chunks are collected in a file buffer, the writer service writes the whole file
+        # (2) streaming: chunks are written to a preallocated memory-mapped file as they arrive (no file buffer)
+        self.writerMode = self.config['recordingConfig']['writerMode']
+        self.enableSummary = self.config['recordingConfig']['enableSummary']
+        self.tmpFolderPath = self.config['pathNameConfig']['tmpFolderPath']
+
+        # Init a pool of file buffers for each storage group. A buffer is taken by the file assembler and returned after the file is saved
+        self.recordBufferPoolSize = int(self.config['recordingConfig']['recordBufferPoolSize']) if self.writerMode == 'buffered' else 0
+        for group in self.storageGroups:
+            for i in range(self.recordBufferPoolSize):
+                group.bufferPool.put(bytearray(group.fileSizeInByte))
+        self.totalDroppedRecordFile = 0 # files dropped because all file buffers are in use or the writer queue is full (back-pressure)
+
+        # The writer service is long-lived, we keep it across restarts
+        if not hasattr(self, 'recordWriter'):
+            self.recordWriter = MaintletRecordWriter(tmpFolderPath=self.tmpFolderPath,
+                                                     workerCount=self.config['recordingConfig']['writerWorkerCount'],
+                                                     queueSize=self.config['recordingConfig']['writerQueueSize'],
+                                                     onPrepare=self.handleRecordData,
+                                                     onFinish=self.finishRecordData,
+                                                     commitQ=fileCommittedQ)
+            self.recordWriter.start()
+
         # Init some variables for recording
-        self.doubleBufferSelector = 0
-        self.recordData = [bytearray(self.outputBufferSizeInByte), bytearray(self.outputBufferSizeInByte)]
-        self.recordOutputFilepath = ""
+        self.recordOutputFilepath = "" # the file path of the current record, each storage group adds its suffix
         self.recordCallbackCounter = 0
+        self.recordFileStartSeq = -1 # the first chunk of the current file
+        self.recordRestartSeq = -1 # the first chunk after the latest warm restart
         self.totalRecordCallback = 0 
         self.allowRecord = True # True when recording, False wait for interval to finish 
         self.totalRecordOverflow = 0
+        self.totalDroppedFrame = 0 # frames dropped by the record streams (measured with the ADC time)
+        self.recordFileGaps = [] # (offset, length) in captured frames of the discontinuities of the current file
+        self.recordPrevAdcTime = -1 # the ADC time of the previous chunk of the current file
         self.recordCounter = 0 # track the number of recorded files
 
         # autoRetry related variables
         self.ADCInterval = self.recordChunk / self.samplingRate
         logger.debug(f"adc interval is {self.ADCInterval}")
 
+    def calibrateRecordChunk(self):
+        """
+        Get the record chunk of this device model, the chunk sizes are measured if it is not calibrated yet
+
+        Returns:
+            int: The record chunk size in frames.
+        """
+        deviceModel = getDeviceModel(self.captureBackend, self.inputDevices, self.samplingRate, self.sampleWidth)
+        calibrationPath = self.config['recordingConfig']['chunkCalibrationPath']
+        result = loadChunkCalibration(calibrationPath, deviceModel)
+        if result == None or result['recordChunk'] not in self.chunkCalibrator.candidates:
+            logger.info(f"ChunkCalibration: calibrate {deviceModel}")
+            result = self.chunkCalibrator.calibrate()
+            saveChunkCalibration(calibrationPath, deviceModel, result)
+        logger.info(f"ChunkCalibration: record chunk {result['recordChunk']} for {deviceModel}")
+        return result['recordChunk']
+
+    def checkRecordChunk(self):
+        """ Re-check the record chunk with the live callback CPU load every chunkRecalibrationInterval seconds (auto mode) """
+        if self.chunkCalibrator == None or self.chunkRecalibrationInterval <= 0:
+            return
+        if time.monotonic() - self.lastChunkCheckTime < self.chunkRecalibrationInterval:
+            return
+        self.lastChunkCheckTime = time.monotonic()
+        cpuLoads = [device.stream.get_cpu_load() for device in self.inputDevices if device.stream != None]
+        if len(cpuLoads) == 0:
+            return
+        cpuLoad = max(cpuLoads)
+        newChunk = self.chunkCalibrator.recommend(self.recordChunk, cpuLoad)
+        if newChunk == None:
+            return
+        result = {'recordChunk': newChunk, 'previousChunk': self.recordChunk, 'previousCpuLoad': round(float(cpuLoad), 4), 'calibratedOn': time.time()}
+        saveChunkCalibration(self.config['recordingConfig']['chunkCalibrationPath'],
+                             getDeviceModel(self.captureBackend, self.inputDevices, self.samplingRate, self.sampleWidth), result)
+        self.calibratedRecordChunk = newChunk
+        # all buffers depend on the chunk size, autoRetry reconfigures everything
+        raise RecordChunkChangedError(self.recordChunk, newChunk)
+
     def openRecordStream(self):
         """
-        Open the record stream
+        Open the record stream of every input device
         All parameters are defined in the config.ini file
         """        
-        self.recordStream = self.pyaudio.open(
-            rate = self.samplingRate,
-            channels = self.channelCount,
-            format = self.recordFormat,
-            input = True,
-            input_device_index= self.recordDeviceIndex,
-            frames_per_buffer= self.recordChunk,
-            start = True,
-            stream_callback= self.recordCallback
-        )
+        for device in self.inputDevices:
+            device.stream = self.captureBackend.openInputStream(
+                rate = self.samplingRate,
+                channels = device.channelCount,
+                sampleWidth = self.sampleWidth,
+                deviceIndex = device.deviceIndex,
+                framesPerBuffer = self.recordChunk,
+                callback = functools.partial(self.recordCallback, device=device)
+            )
 
     def stopRecordStream(self):
         """
@@ -359,200 +663,413 @@ class MaintletDataCollection():
         
         Stream will be considered inactive (!PaAlsaStream::isActive) after a call to this function
         """
-        # check if recordStream is created
-        if self.recordStream != None:
-            self.recordStream.stop_stream() # I assume when we stop the stream the buffer is cleaned and we cannot read or write the stream anymore
-            self.recordStream.close() # the difference is that after stop the stream, we can resume it while it is not true for close
+        # check if the record streams are created
+        for device in self.inputDevices:
+            if device.stream != None:
+                device.stream.stop_stream() # I assume when we stop the stream the buffer is cleaned and we cannot read or write the stream anymore
+                device.stream.close() # the difference is that after stop the stream, we can resume it while it is not true for close
+                device.stream = None
 
     def isRecordDataEnough(self):
         ''' check if we have collected enough number of files '''
         return not (self.recordCounter < self.recordCount or self.recordCount == 0)
 
-    def generateRecordFilepath(self, time_info):
-        ''' given the current time info, return the formatted (<timestamp>_<macAddress>.wav) record file path'''
-        systemBoottimeInUnixTime = self.systemBootTime + time_info['input_buffer_adc_time']
-        systemBoottimeInDatetime = datetime.fromtimestamp(systemBoottimeInUnixTime)
-        recordOutputFilePath = self.recordFolderPath + "/" + systemBoottimeInDatetime.strftime("%m_%d_%Y_%H_%M_%S_%f") + "_" + self.deviceMac + ".wav"
+    def generateRecordFilepath(self, adcTime):
+        ''' given the adc time of the first chunk, return the formatted (<timestamp>_<macAddress>.wav) record file path in the record folder layout'''
+        recordOutputFilename = self.clock.formatTimestamp(self.clock.toUnixTime(adcTime)) + "_" + self.deviceMac + ".wav"
+        recordOutputFilePath = getRecordFilepath(self.recordFolderPath, recordOutputFilename, self.recordFolderLayout)
         return recordOutputFilePath
 
-    def recordCallback(self, in_data, frame_count, time_info, status):
-        ''' this is the handler for each chunk of data'''
+    def recordCallback(self, in_data, frame_count, time_info, status, device):
+        ''' this is the handler for each chunk of data of an input device, it only copies the chunk into the ring buffer of the device'''
+        adcTime = float(time_info['input_buffer_adc_time'])
 
         # For autoRetry
-        if self.prevADCTime == -1:
-            self.prevADCTime = float(time_info['input_buffer_adc_time'])
+        if device.prevADCTime == -1:
+            device.prevADCTime = adcTime
         else:
-            adcTime = float(time_info['input_buffer_adc_time'])
-            if adcTime - self.prevADCTime < self.ADCInterval * 0.1:
-                raise ADCTimeError
+            if adcTime - device.prevADCTime < self.ADCInterval * 0.1:
+                # exceptions are lost in the callback thread, flag the failure and stop the stream
+                if self.restartRequestTime == None:
+                    self.restartRequestTime = time.monotonic()
+                    self.restartPrevADCTime = device.prevADCTime
+                self.isRestartRequested = True
+                return None, paAbort
             else:
-                self.prevADCTime = adcTime
+                # the same delta gives the frames dropped before this chunk (e.g., on an overflow)
+                droppedFrameCount = self.gapDetector.getDroppedFrameCount(device.prevADCTime, adcTime)
+                if droppedFrameCount > 0:
+                    device.totalDroppedFrame += droppedFrameCount
+                    self.totalDroppedFrame += droppedFrameCount
+                    logger.warning(f"Record stream of {device.name} dropped {droppedFrameCount} frames (total: {self.totalDroppedFrame})")
+                device.prevADCTime = adcTime
+                if self.restartRequestTime != None:
+                    # the first good chunk after a restart
+                    self.lastRestartLatency = time.monotonic() - self.restartRequestTime
+                    self.maxRestartLatency = max(self.maxRestartLatency, self.lastRestartLatency)
+                    if self.restartPrevADCTime != -1:
+                        self.totalRestartGap += max(adcTime - self.restartPrevADCTime - 2 * self.ADCInterval, 0)
+                    self.timer.addTime('autoRetry restart latency', time.time() - self.lastRestartLatency, self.lastRestartLatency)
+                    logger.warning(f"Record stream is back, {self.getRestartStatus()}")
+                    self.restartRequestTime = None
+
+        self.totalRecordCallback += 1 # this is an always running counter
+        device.totalCallback += 1
+
+        # Check the status of this callback. (From our experience, all error outputs are caused by overflow)
+        # Update the overflow counter 
+        # Overflow will cause the data collection module stops in an undetermined time in the future.
+        if status != 0:
+            logger.warning(f"Record Callback of {device.name} (channels {device.channelOffset}+) in Wrong Status: {status}")
+            self.totalRecordOverflow += 1
+            device.totalOverflow += 1
+
+        # Copy the chunk to the next slot of the ring buffer
+        device.ringBuffer.write(in_data, adcTime, status)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"{'RecordCallback Count:':<30} {self.totalRecordCallback:>5} \
+    {'Input Data length (Byte):':<30} {len(in_data):>7} \
+    {'CPU load:':<10} {round(device.stream.get_cpu_load(),4):>5} \
+    {'Input Latency:':<15} {round(device.stream.get_input_latency(),4):>5} \
+    {'Input ADC time:':<15} {round(adcTime,5):>10} \
+    {'Status:':<15} {status:>10} \
+    {'Total Overflow:':<15} {self.totalRecordOverflow:>10} \
+    {'Total Dropped Frame:':<15} {self.totalDroppedFrame:>10} \
+    {'Total Callback:':<15} {self.totalRecordCallback:>10} \
+    ")
+
+        # Continue the recording
+        return None, paContinue
+
+    def startRecordAssembler(self):
+        """ Start the file assembler thread which consumes chunks in the ring buffer """
+        self.stopRecordAssemblerThread = False
+        self.recordAssemblerThread = threading.Thread(target=self.recordAssemblerLoop, daemon=True)
+        self.recordAssemblerThread.name = 'recordAssembler'
+        self.recordAssemblerThread.start()
+
+    def stopRecordAssembler(self):
+        """ Stop the file assembler thread and discard the unfinished file """
+        self.stopRecordAssemblerThread = True
+        if self.recordAssemblerThread != None and self.recordAssemblerThread is not threading.current_thread():
+            self.recordAssemblerThread.join()
+        self.recordAssemblerThread = None
+        self.closeRecordOutput(isSave=False)
+
+    def recordAssemblerLoop(self):
+        """ The thread routine of the file assembler """
+        while self.stopRecordAssemblerThread == False:
+            seq = self.recordAssemblerReader.next(timeout=0.5)
+            if seq is None:
+                continue
+            self.assembleRecordChunk(seq)
+
+    def startDutyCycleScheduler(self):
+        """ Start the thread which applies the data analysis results to the record interval """
+        self.stopDutyCycleSchedulerThread = False
+        self.dutyCycleSchedulerThread = threading.Thread(target=self.dutyCycleSchedulerLoop, daemon=True)
+        self.dutyCycleSchedulerThread.name = 'dutyCycleScheduler'
+        self.dutyCycleSchedulerThread.start()
+
+    def stopDutyCycleScheduler(self):
+        """ Stop the duty cycle scheduler thread """
+        self.stopDutyCycleSchedulerThread = True
+        if self.dutyCycleSchedulerThread != None and self.dutyCycleSchedulerThread is not threading.current_thread():
+            self.dutyCycleSchedulerThread.join()
+        self.dutyCycleSchedulerThread = None
+
+    def dutyCycleSchedulerLoop(self):
+        """ The thread routine of the duty cycle scheduler """
+        while self.stopDutyCycleSchedulerThread == False:
+            try:
+                message = dataAnalysisToDataCollectionQ.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if message.command != 'analysisResult':
+                continue
+            newInterval = self.dutyCycleScheduler.update(anomalyScore=message.payload['anomalyScore'],
+                                                         label=message.payload['label'],
+                                                         cpuTemperature=self.captureBackend.getCpuTemperature(),
+                                                         freeDiskSpace=self.getCurrentRemainingDiskSpace())
+            if newInterval != None:
+                self.setRecordInterval(newInterval)
+
+    def setRecordInterval(self, recordInterval):
+        """
+        Change the interval between two records at runtime, the record stream keeps running
+
+        Args:
+            recordInterval (int): The new interval in second, 0 is continuous capture.
+        """
+        self.recordInterval = recordInterval
+        # a single assignment, the file assembler picks it up at its next chunk
+        self.callbackCountBeforeRestartRecording = recordInterval * self.samplingRate / self.recordChunk
+
+    def acquireRecordBuffer(self, group):
+        """ Take a free file buffer from the pool of a storage group, return None if all buffers are in use """
+        try:
+            return group.bufferPool.get_nowait()
+        except queue.Empty:
+            return None
+
+    def releaseRecordBuffer(self, group, dataBuffer):
+        """ Return a file buffer to the pool of a storage group """
+        group.bufferPool.put(dataBuffer)
+
+    def assembleRecordChunk(self, seq):
+        """
+        Cut the chunk stream into files (record for recordFileDuration, then wait for recordInterval or the next trigger)
+
+        Args:
+            seq (int): The sequence number of the chunk in the ring buffer.
+        """
+        if self.recordTrigger != None:
+            if self.recordCallbackCounter == 0:
+                startSeq = self.recordTrigger.poll(seq, oldestSeq=seq - self.ringBufferSlotCount + 2)
+                if startSeq is None:
+                    return
+                # the pre-trigger chunks are still in the ring buffer
+                for s in range(startSeq, seq):
+                    self.appendRecordChunk(s)
+                    if self.recordCallbackCounter == 0:
+                        return
+            self.appendRecordChunk(seq)
+            return
 
         # If we are waiting for the end of interval between two records
         if self.allowRecord == False:
             self.recordCallbackCounter += 1
-            # If it is the end of interval
-            if self.recordCallbackCounter == self.callbackCountBeforeRestartRecording:
-                # We will start recording in the next callback
+            # If it is the end of interval (the interval may be shortened at runtime)
+            if self.recordCallbackCounter >= self.callbackCountBeforeRestartRecording:
+                # We will start recording in the next chunk
                 self.recordCallbackCounter = 0
                 self.allowRecord = True
+            return
 
-        # If we are allowed to record
-        else:
-            # If this is the first chunk of the data for this recording, we will create the filename
-            if self.recordCallbackCounter == 0:
-                self.recordOutputFilepath = self.generateRecordFilepath(time_info)
+        self.appendRecordChunk(seq)
 
-            # Update the callback counters
-            self.recordCallbackCounter += 1 # this is a counter which will be reset after enough data is collected for a file
-            self.totalRecordCallback += 1 # this is an always running counter
+    def appendRecordChunk(self, seq):
+        """
+        Append a chunk to the current file, open the file at its first chunk and hand it to the writer service at its last chunk
 
-            # Check the status of this callback. (From our experience, all error outputs are caused by overflow)
-            # Update the overflow counter 
-            # Overflow will cause the data collection module stops in an undetermined time in the future.
-            if status != 0:
-                logger.warning(f"Record Callback in Wrong Status: {status}")
-                self.totalRecordOverflow += 1
+        Args:
+            seq (int): The sequence number of the chunk in the ring buffer.
+        """
+        # If this is the first chunk of the data for this recording, we will create the filename and open the output
+        if self.recordCallbackCounter == 0:
+            self.recordOutputFilepath = self.generateRecordFilepath(self.recordRingBuffer.getSlotAdcTime(seq))
+            self.recordFileStartSeq = seq
+            self.recordFileGaps = []
+            self.openRecordOutput()
+        elif self.recordFileStartSeq < self.recordRestartSeq <= seq:
+            # the record stream was restarted in the middle of this file, start a new file at this chunk
+            logger.warning(f"Discard {self.recordOutputFilepath}, the record stream was restarted")
+            self.closeRecordOutput(isSave=False)
+            self.recordCallbackCounter = 0
+            self.recordOutputFilepath = self.generateRecordFilepath(self.recordRingBuffer.getSlotAdcTime(seq))
+            self.recordFileStartSeq = seq
+            self.recordFileGaps = []
+            self.openRecordOutput()
+
+        # Update the chunk counter
+        self.recordCallbackCounter += 1 # this is a counter which will be reset after enough data is collected for a file
+
+        # Mark a discontinuity before this chunk: frames were dropped (overflow, slots lost by the assembler) or the chunk overflowed
+        adcTime = self.recordRingBuffer.getSlotAdcTime(seq)
+        if self.recordCallbackCounter > 1:
+            droppedFrameCount = self.gapDetector.getDroppedFrameCount(self.recordPrevAdcTime, adcTime)
+            if droppedFrameCount > 0 or self.recordRingBuffer.getSlotStatus(seq) != 0:
+                self.recordFileGaps.append(((self.recordCallbackCounter - 1) * self.recordChunk, droppedFrameCount))
+        self.recordPrevAdcTime = adcTime
+
+        # Copy the chunk from the ring buffer to the output
+        chunk = self.recordAssemblerReader.getSlot(seq)
+        if self.writeRecordOutput(self.recordCallbackCounter-1, chunk):
+            if not self.recordAssemblerReader.isValid(seq):
+                logger.warning(f"Chunk {seq} is overwritten while copying it to {self.recordOutputFilepath}")
+
+        # If we have recorded enough data, we will hand the data to the writer service
+        if self.recordCallbackCounter == self.callbackCountBeforeSaveFile:
+            if self.closeRecordOutput(isSave=not self.isRecordDataEnough()):
+                self.recordCounter += 1
+            self.recordOutputFilepath = ""
+            self.recordCallbackCounter = 0
+            if self.recordTrigger != None:
+                self.recordTrigger.notifyRecorded(seq)
+            elif self.callbackCountBeforeRestartRecording != 0:
+                self.allowRecord = False 
+
+    def openRecordOutput(self):
+        """
+        Open the output of a new file for each storage group: take a file buffer (buffered mode) or preallocate a memory-mapped file (streaming mode)
+        If the output of a group cannot be opened, the file of this group is dropped.
+        """
+        for group in self.storageGroups:
+            group.filepath = group.getFilepath(self.recordOutputFilepath)
+            # a new summary for each file, the writer service saves it after the assembler has moved on
+            group.summary = MaintletFileSummary(group.channelCount, self.sampleWidth, group.samplingRate, self.recordChunk // group.factor,
+                                                int(self.callbackCountBeforeSaveFile)) if self.enableSummary else None
+            if group.decimator != None and (self.recordTrigger != None or self.callbackCountBeforeRestartRecording != 0):
+                # there is a gap before this record, do not filter across it
+                group.decimator.reset()
+            if self.writerMode == 'streaming':
+                try:
+                    group.outputStream = MaintletStreamingWavFile(group.filepath, self.tmpFolderPath, group.channelCount,
+                                                                  self.sampleWidth, group.samplingRate, group.fileSizeInByte)
+                except OSError as e:
+                    logger.error(f"Cannot preallocate {group.filepath}: {e}")
+                    group.outputStream = None
+                isOpened = group.outputStream is not None
+            else:
+                group.outputBuffer = self.acquireRecordBuffer(group)
+                isOpened = group.outputBuffer is not None
+            if not isOpened:
+                # the savers fall behind, we drop this file instead of blocking the assembler
+                self.totalDroppedRecordFile += 1
+                logger.warning(f"Cannot open the record output, drop file {group.filepath} (total dropped: {self.totalDroppedRecordFile})")
+
+    def writeRecordOutput(self, chunkIndex, chunk):
+        """
+        Convert a chunk for each storage group (channel mask, decimation) and write it to the output of the current file
 
-            # Update the data buffer
-            self.recordData[self.doubleBufferSelector][(self.recordCallbackCounter-1)*self.callbackInDataSize:(self.recordCallbackCounter)*self.callbackInDataSize] = in_data
+        Args:
+            chunkIndex (int): The index of the chunk in the file.
+            chunk (bytes-like): The captured chunk.
 
-            logger.debug(f"{'RecordCallback Count:':<30} {self.recordCallbackCounter:>5} \
-    {'Input Data length (Byte):':<30} {len(in_data):>7} \
-    {'CPU load:':<10} {round(self.recordStream.get_cpu_load(),4):>5} \
-    {'Input Latency:':<15} {round(self.recordStream.get_input_latency(),4):>5} \
-    {'Input ADC time:':<15} {round(time_info['input_buffer_adc_time'],5):>10} \
-    {'Status:':<15} {status:>10} \
-    {'Total Overflow:':<15} {self.totalRecordOverflow:>10} \
-    {'Total Callback:':<15} {self.totalRecordCallback:>10} \
-    ")
-            # If we have recorded enough data, we will save the data in another thread
-            if self.recordCallbackCounter == self.callbackCountBeforeSaveFile and not self.isRecordDataEnough():
-                thread = threading.Thread(target=self.handleRecordData, args=(self.recordData[self.doubleBufferSelector], self.recordOutputFilepath, ))
-                thread.name = 'handleRecordData'
+        Returns:
+            bool: False if the files of all groups are dropped.
+        """
+        isWritten = False
+        for group in self.storageGroups:
+            offset = chunkIndex * group.chunkSizeInByte
+            if group.outputStream is not None:
+                converted = group.convertChunk(chunk, out=group.chunkBuffer)
+                group.outputStream.write(offset, converted)
+            elif group.outputBuffer is not None:
+                converted = group.convertChunk(chunk, out=memoryview(group.outputBuffer)[offset:offset+group.chunkSizeInByte])
+            else:
+                continue
+            if group.summary is not None:
+                group.summary.update(chunkIndex, converted)
+            isWritten = True
+        return isWritten
 
-                # clean buffer
-                self.recordData[self.doubleBufferSelector] = bytearray(self.outputBufferSizeInByte)
-                self.flipDoubleBufferSelector()
-                self.recordOutputFilepath = ""
+    def closeRecordOutput(self, isSave):
+        """
+        Close the output of the current file of each storage group and hand it to the writer service
 
-                # start the thread
-                thread.start()
+        Args:
+            isSave (bool): If False, the files are discarded.
 
-                self.recordCounter += 1
-                self.recordCallbackCounter = 0
-                if self.callbackCountBeforeRestartRecording != 0:
-                    self.allowRecord = False 
+        Returns:
+            bool: True if any file is accepted by the writer service.
+        """
+        isAccepted = False
+        for group in self.storageGroups:
+            if group.outputStream is not None:
+                if isSave and self.recordWriter.submitStream(group.outputStream, context=(group, self.recordFileGaps), summary=group.summary):
+                    manifest.append('captured', os.path.basename(group.outputStream.filepath), path=group.outputStream.filepath)
+                    isAccepted = True
+                else:
+                    if isSave:
+                        self.totalDroppedRecordFile += 1
+                    group.outputStream.abort()
+            elif group.outputBuffer is not None:
+                if isSave:
+                    isAccepted = self.submitRecordData(group, group.outputBuffer, group.filepath, self.recordFileGaps, group.summary) or isAccepted
+                else:
+                    self.releaseRecordBuffer(group, group.outputBuffer)
+            group.outputStream = None
+            group.outputBuffer = None
+            group.summary = None
+        return isAccepted
+
+    def convertRawToNpArray(self, dataBuffer, storageGroup=None):
+        """
+        Convert raw data in the file buffer to numpy array format
 
-        # Continue the recording
-        return None, pyaudio.paContinue
-
-    def convertRawToNpArray(self, dataBuffer):
-        """ Convert raw data in the databuffer to numpy array format"""
-        # ! Add handler for 32 bit and 16 bit PCM data
-        # data processing
-        # step 1: convert bytearray to numpy array
-        #y = np.frombuffer(dataBuffer, dtype=np.int16) # does not support 24 bit
-        #y = rawutil.unpack(f"{int(len(dataBuffer)/2)}b",dataBuffer) # slow takes 1.5 S
-
-        #==========================================================================
-        #                              Parameter Explanation
-        #  dx: x byte PCM data
-        #  dt: data type
-        #  y: data in numpy array format
-        #==========================================================================
-        y = np.array([])
-        if self.sampleWidth == 2:
-            # todo
-            pass
-        elif self.sampleWidth == 3:
-            d3 = np.frombuffer(dataBuffer, dtype=np.uint8).reshape(-1, 3) # This is the fastest solution and only takes several ms, reference https://stackoverflow.com/questions/49183514/more-pythonic-way-to-convert-24-bit-ints-to-32-bit-ints
-            signs = np.array((d3[:, 2] >= 0x80) * 0xFF)
-            d4 = np.concatenate((d3, signs.reshape(-1, 1)), axis=1)
-            d4 = d4.flatten()
-            d4 = d4.astype(np.ubyte)
-            d4 = d4.tobytes()
-            dt = np.dtype(np.int32)
-            dt = dt.newbyteorder('<')
-            y = np.frombuffer(d4, dtype=dt)
-        elif self.sampleWidth == 4:
-            # todo 
-            pass
+        Args:
+            dataBuffer (bytes-like): The file buffer.
+            storageGroup (MaintletStorageGroup, optional): The storage group of the file. Defaults to the first (full-rate) group.
 
-        return y
+        Returns:
+            np.ndarray: Samples with shape (frameCount, group channel count), y[:, k] is the data of channel storageGroup.channelIndices[k].
+                        For 16 bit and 32 bit data, y is a view of dataBuffer (no copy).
+        """
+        storageGroup = storageGroup or self.storageGroups[0]
+        return decodePCM(dataBuffer, self.sampleWidth, storageGroup.channelCount)
 
-    def processData(self, y, timestamp):
-        """ Compute simple stats of a piece of data (in numpy array format) and stream them to the server """
+    def processData(self, y, timestamp, storageGroup=None):
+        """
+        Compute simple stats of a piece of data (in numpy array format) for all connected channels of a storage group
 
-        mac = self.deviceMac
-        pump = self.deviceDescription
-        tt = timestamp
+        Args:
+            y (np.ndarray): Samples of a file buffer with shape (frameCount, group channel count).
+            timestamp (str/float): The timestamp of the data.
+            storageGroup (MaintletStorageGroup, optional): The storage group of the data. Defaults to the first (full-rate) group.
 
-        for i, sensorConfig in enumerate(self.sensors):
-            if sensorConfig.type == "NC":
-                continue
-            sensor = f"sensor_{i}_{sensorConfig.type}_{sensorConfig.location}"
-            topic = f"maintletDV/{mac}/{pump}/{sensor}" 
-            
-            channelData = y[i::8] / 100
-
-            # step 2: calculate useful stats
-            # we use value for RMS for back compatability
-            fieldNames = []
-            fieldValues = []
-            fieldNames.append('RMS')
-            fieldValues.append(np.sqrt(np.mean(channelData**2)))
-            fieldNames.append('Range')
-            fieldValues.append(np.max(channelData) - np.min(channelData))
-            fieldNames.append('MAX')
-            fieldValues.append(np.max(channelData))
-            fieldNames.append('MIN')
-            fieldValues.append(np.min(channelData))
-            fieldNames.append('STD')
-            fieldValues.append(np.std(channelData))
-            
-
-            # compose message with format time_field1_value1_field2_value2...
-            # ! maybe we can change to send struct instead? 
-            message=f"{tt}_"
-            for name, value in zip(fieldNames, fieldValues):
-                message+=f"{name}_{value}_"
-            # remove the last _
-            message = message[:-1]
-            
-            logger.info(topic)
-            logger.info(message)
-
-    def handleRecordData(self, dataBuffer, recordOutputFilepath):
-        # We should not write variables with states in any thread, because these states will be undetermined.
-        with self.timer.getTime(f"<SaveRecordDataThread>_<{os.path.basename(__file__)}:#x_#x>") as mt:
-            if recordOutputFilepath == "" or len(dataBuffer) <= self.outputBufferSizeInByte - 100:
-                logger.critical(f"file name is not ready or data is not ready, size: {len(dataBuffer)}, target: {self.outputBufferSizeInByte}") 
-                self.closeAndExit()
+        Returns:
+            np.ndarray: Stats with shape (connected channel count, len(STATISTICS_FIELD_NAMES)), row k belongs to channel connectedChannels[k].
+        """
+        storageGroup = storageGroup or self.storageGroups[0]
+        connectedChannels = [i for i in getConnectedChannelIndices(self.sensors) if i in storageGroup.channelIndices]
+        columns = [k for k, i in enumerate(storageGroup.channelIndices) if i in connectedChannels]
+        stats = computeChannelStatistics(y, columns, scale=1/100)
+        logger.info(f"{timestamp} {self.deviceMac} {self.deviceDescription} channels {connectedChannels} {STATISTICS_FIELD_NAMES}: {stats.tolist()}")
+        return stats
+
+    def submitRecordData(self, group, dataBuffer, recordOutputFilepath, gaps=(), summary=None):
+        """ Hand a complete file buffer of a storage group, the discontinuities of the file (captured frames) and its summary to the writer service """
+        isAccepted = self.recordWriter.submit(recordOutputFilepath, dataBuffer, group.channelCount, self.sampleWidth, group.samplingRate,
+                                              context=(group, gaps), summary=summary)
+        if not isAccepted:
+            # the writer service falls behind, we drop this file instead of blocking the assembler
+            self.totalDroppedRecordFile += 1
+            self.releaseRecordBuffer(group, dataBuffer)
+        else:
+            manifest.append('captured', os.path.basename(recordOutputFilepath), path=recordOutputFilepath)
+        return isAccepted
 
-            # extract metadata
-            recordOutputFilename = recordOutputFilepath.split('/')[-1]
-            recordTime = recordOutputFilename.split(':')[0][:-3]
-
-            # create a table entry and send it to database handler
-            tableEntry = self.createTableEntry(tableTemplate=self.table)
-            tableEntry.filename = recordOutputFilename
-            tableEntry.recordTime = recordTime
-            tableEntry.volumes = ','.join(str(e) for e in MaintletGainControl.currentVolumes)
-            # print(tableEntry.volumes)
-            tableEntry.updateKey()
-            #todo implement a message Queue Qos = 0 # MQTT QoS 2? 
-            self.databaseHandler.messageQPut(MaintletMessage(f"insert_{config['pathNameConfig']['tableName']}", tableEntry))
-            logger.debug(tableEntry)
-            
-            # save the data
-            with self.timer.getTime(f"<Save wave file wtih Duration {self.recordFileDuration} S>_<{os.path.basename(__file__)}:#x_#x>") as mt:
-                wf = wave.open(recordOutputFilepath, 'wb')
-                wf.setnchannels(self.channelCount)
-                wf.setsampwidth(self.sampleWidth)
-                wf.setframerate(self.samplingRate)
-                wf.writeframes(dataBuffer) 
-                wf.close()
+    def handleRecordData(self, job):
+        """ Create the table entry of a file and send it to the database (called by a writer thread before writing the file) """
+        # We should not write variables with states in any thread, because these states will be undetermined.
+        recordOutputFilepath = job.filepath
+        group, gaps = job.context
+        if recordOutputFilepath == "" or job.sizeInByte <= group.fileSizeInByte - 100:
+            logger.critical(f"file name is not ready or data is not ready, size: {job.sizeInByte}, target: {group.fileSizeInByte}") 
+            self.closeAndExit()
+
+        # extract metadata
+        recordOutputFilename = recordOutputFilepath.split('/')[-1]
+        recordTime = recordOutputFilename.split(':')[0][:-3]
+
+        # create a table entry and send it to database handler
+        tableEntry = self.createTableEntry(tableTemplate=self.table)
+        tableEntry.filename = recordOutputFilename
+        tableEntry.recordTime = recordTime
+        tableEntry.volumes = ','.join(str(e) for e in MaintletGainControl.currentVolumes)
+        # print(tableEntry.volumes)
+        tableEntry.samplingRate = group.samplingRate
+        tableEntry.channelMap = group.channelMap
+        tableEntry.channelRates = group.channelRates
+        tableEntry.gaps = formatGaps(scaleGaps(gaps, group.factor))
+        if len(gaps) > 0:
+            logger.warning(f"{recordOutputFilename} has {len(gaps)} discontinuities (offset:dropped frames): {tableEntry.gaps}")
+            if self.recordMode != 'continuous' and analysisChannelIndex in group.channelIndices:
+                # the data analysis masks them (continuous mode: the window descriptors have their own gaps)
+                dataCollectionToDataAnalysisQ.put(MaintletMessage('recordGaps', {'file': recordOutputFilename, 'gaps': list(gaps)}))
+        tableEntry.updateKey()
+        tableEntry.key += group.suffix # files of decimated groups share the record time
+        #todo implement a message Queue Qos = 0 # MQTT QoS 2? 
+        self.databaseHandler.messageQPut(MaintletMessage(f"insert_{config['pathNameConfig']['tableName']}", tableEntry))
+        logger.debug(tableEntry)
+
+    def finishRecordData(self, job):
+        """ Return the file buffer to the pool after the file is written (called by a writer thread) """
+        if job.dataBuffer is not None:
+            self.releaseRecordBuffer(job.context[0], job.dataBuffer)
+        logger.debug(f"RecordWriter: {self.recordWriter.getStatus()}")
 
 #============================= END OF Record Methods ==============================
 
@@ -581,7 +1098,6 @@ class MaintletDataCollection():
     def configOnePlaybackFile(self):
         self.wf = wave.open(self.currentPlaybackFilePath)
         self.playbackSampleWidth = self.wf.getsampwidth()
-        self.playbackFormat = self.pyaudio.get_format_from_width(self.playbackSampleWidth)
         self.playbackChannelCount = self.wf.getnchannels()
         self.playbackRate = self.wf.getframerate()
 
@@ -593,14 +1109,13 @@ class MaintletDataCollection():
         """        
 
 
-        self.playStream = self.pyaudio.open(
+        self.playStream = self.captureBackend.openOutputStream(
             rate = self.playbackRate,
             channels = self.playbackChannelCount,
-            format = self.playbackFormat,
-            output = True,
-            output_device_index= self.playDeviceIndex,
-            frames_per_buffer=self.playChunk,
-            stream_callback= self.playCallback
+            sampleWidth = self.playbackSampleWidth,
+            deviceIndex = self.playDeviceIndex,
+            framesPerBuffer = self.playChunk,
+            callback = self.playCallback
         )
     
     def stopPlayStream(self):
@@ -636,7 +1151,7 @@ class MaintletDataCollection():
 {'Output DAC time:':>20} {round(time_info['output_buffer_dac_time'],5):>20} \
                 ")
 
-        return (data, pyaudio.paContinue)
+        return (data, paContinue)
     
     def closePlayFile(self):
         self.wf.close()
@@ -32,6 +32,8 @@ class MaintletDatabase:
         self.messageQ = queue.Queue(maxsize=messageQMaxSize)
         # a small tableMetaData for table metadata
         self.tableMetaData = {}
+        # INSERT commands by (table name, column count), the same text reuses the statement cache of sqlite3
+        self.insertCommands = {}
 
     def messageQPut(self, message):
         """
@@ -51,6 +53,10 @@ class MaintletDatabase:
         Handle message in message Queues
             Command 1: insert_<tableName>
             Paylaod: Any object which implements methods in TableEntryForRecordedFile
+            Command 2: update_<tableName>_<column>_<keyName>_<keyValue>
+            Paylaod: The new value
+            Command 3: updateBatch_<tableName>_<column>_<keyName>
+            Paylaod: {'keyValues': [...], 'value': the new value of all rows}
             todo: try else insert the data back into the queue
         """
         while not self.messageQ.empty():
@@ -66,9 +72,18 @@ class MaintletDatabase:
                         continue
                     self.insertValue(tableName, withColumn=payload.getAttributeCount(), withValue=payload.getTableEntryValuesForDatabase())
                 
+                elif command.startswith('updateBatch'):
+                    # one transaction for all rows
+                    tokens = command.split('_', 3)
+                    tableName = tokens[1]
+                    if tableName not in self.tableMetaData.keys():
+                        logger.critical(f"Try to update entries for unknow table: {tableName}")
+                        continue
+                    self.updateValues(toTable = tableName, atColumn = tokens[2], withKeyName = tokens[3], withKeyValues = payload['keyValues'], withValue = payload['value'])
+
                 elif 'update' in command:
-                    # parse command and payload
-                    tokens = command.split('_')
+                    # parse command and payload, the key value (e.g., a filename) may contain '_'
+                    tokens = command.split('_', 4)
                     tableName = tokens[1]
                     column = tokens[2]
                     keyName = tokens[3]
@@ -95,6 +110,8 @@ class MaintletDatabase:
         tableAttributes = table.getTableAttributes()
         self.tableMetaData[tableName] = {}
         self.createTable(withName=tableName, withParameter=tableAttributes)
+        # the table of a resumed experiment may be older than the table object
+        self.addMissingColumns(tableName, table.getColumnDefaults())
 
     def createTable(self, withName, withParameter):
         """
@@ -110,6 +127,27 @@ class MaintletDatabase:
         with self.curLock:
             self.cur.execute(command)
 
+    def addMissingColumns(self, tableName, columnDefaults):
+        """
+        Add the columns which a table created by an older version does not have, the existing rows get the default values.
+        New columns are only appended to the table object, so the rows keep the column order of the INSERT command.
+
+        Args:
+            tableName (str): The table name.
+            columnDefaults (tuple): (attribute name, default value) in database order.
+        """
+        with self.curLock:
+            existingColumns = [row[1] for row in self.cur.execute(f"PRAGMA table_info({tableName})")]
+            columnNames = [name for name, default in columnDefaults]
+            if columnNames[:len(existingColumns)] != existingColumns:
+                logger.critical(f"The columns of table {tableName} do not match the table object: {existingColumns}")
+                return
+            for name, default in columnDefaults[len(existingColumns):]:
+                defaultValue = default if type(default) in (int, float) else "'" + str(default).replace("'", "''") + "'"
+                self.cur.execute(f"ALTER TABLE {tableName} ADD COLUMN {name} DEFAULT {defaultValue}")
+                logger.info(f"Add column {name} to table {tableName}")
+            self.con.commit()
+
     def insertValue(self, toTable, withColumn, withValue):
         """
         Insert value (entry) to a table.
@@ -120,9 +158,12 @@ class MaintletDatabase:
             withValue (list): [entry1, entry2, ...]. For each entry: entry1 = (value1, value2, ....).
         """
         tableName = toTable
-        valuePlaceholder = f"({['?,' * withColumn][0][:-1]})"
         data = withValue
-        command = f"INSERT INTO {tableName} VALUES{valuePlaceholder}"
+        command = self.insertCommands.get((tableName, withColumn))
+        if command == None:
+            valuePlaceholder = f"({['?,' * withColumn][0][:-1]})"
+            command = f"INSERT INTO {tableName} VALUES{valuePlaceholder}"
+            self.insertCommands[(tableName, withColumn)] = command
         thread = threading.Thread(target=self.__insertValue, args=(command,data,))
         thread.name = 'insertValue'
         thread.start()
@@ -160,7 +201,7 @@ class MaintletDatabase:
         value = withValue
         if type(value) is str:
             command = f"UPDATE {tableName} SET {attributeName} = '{str(value)}' WHERE {keyName} = '{str(keyValue)}'"
-        elif type(value) is int:
+        elif type(value) is int or type(value) is float:
             command = f"UPDATE {tableName} SET {attributeName} = {str(value)} WHERE {keyName} = '{str(keyValue)}'"
 
         thread = threading.Thread(target=self.__updateValue, args=(command, ))
@@ -168,6 +209,43 @@ class MaintletDatabase:
         thread.start()
         return command
 
+    def updateValues(self, toTable, atColumn, withKeyName, withKeyValues, withValue, isSync=False):
+        """
+        Set the same value in several rows of a table in one transaction.
+
+        Args:
+            toTable (str): The table name.
+            atColumn (str): The attribute name.
+            withKeyName (str): The primary key attribute name of a table.
+            withKeyValues (list): The primary key values of the target rows.
+            withValue (str/int): The new value.
+            isSync (bool, optional): Commit before returning instead of in a new thread. Defaults to False.
+
+        Returns:
+            str: The command for updating the values.
+        """
+        command = f"UPDATE {toTable} SET {atColumn} = ? WHERE {withKeyName} = ?"
+        data = [(withValue, keyValue) for keyValue in withKeyValues]
+        if isSync:
+            self.__updateValues(command, data)
+            return command
+        thread = threading.Thread(target=self.__updateValues, args=(command, data, ))
+        thread.name = 'updateValues'
+        thread.start()
+        return command
+
+    def __updateValues(self, command, data):
+        """
+        The thread routing of updateValues, all rows are committed together
+
+        Args:
+            command (str): The command to be sent to the database.
+            data (list): (value, keyValue) of each row.
+        """
+        with self.curLock:
+            self.cur.executemany(command, data)
+            self.con.commit()
+
     def __updateValue(self, command):
         """
         The thread routing of updateValue
@@ -0,0 +1,114 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  Block-wise polyphase FIR decimation of multi-channel data
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   decimator = MaintletPolyphaseDecimator(factor=4, channelCount=2)
+#   y = decimator.process(x)   # x: (frameCount, 2) float32 chunk, frameCount is a multiple of 4
+#                              # y: (frameCount // 4, 2) float32, the filter state is kept between chunks
+#   decimator.reset()          # at a discontinuity (e.g., the start of a new record after an interval)
+#
+#   The low-pass filter is a Kaiser windowed sinc with DECIMATION_TAPS_PER_PHASE * factor taps,
+#   flat up to about 70% of the new Nyquist frequency and more than 80 dB down above it.
+#   The output is delayed by the group delay of the filter (about DECIMATION_TAPS_PER_PHASE / 2 output samples).
+#==========================================================================
+
+import functools
+import numpy as np
+
+DECIMATION_TAPS_PER_PHASE = 32
+DECIMATION_KAISER_BETA = 8.6
+
+@functools.lru_cache(maxsize=None)
+def getDecimationTaps(factor, tapsPerPhase=DECIMATION_TAPS_PER_PHASE):
+    """
+    Design (once per factor) the anti-aliasing low-pass filter of a decimator
+
+    Args:
+        factor (int): The decimation factor.
+        tapsPerPhase (int, optional): The filter length is tapsPerPhase * factor. Defaults to DECIMATION_TAPS_PER_PHASE.
+
+    Returns:
+        np.ndarray: float32 taps with unit DC gain, read-only (shared by all decimators).
+    """
+    tapCount = tapsPerPhase * factor
+    n = np.arange(tapCount) - (tapCount - 1) / 2
+    cutoff = 0.85 * 0.5 / factor # cycles per input sample, below the new Nyquist frequency
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(tapCount, DECIMATION_KAISER_BETA)
+    taps = (taps / taps.sum()).astype(np.float32)
+    taps.flags.writeable = False
+    return taps
+
+class MaintletPolyphaseDecimator:
+    def __init__(self, factor, channelCount, tapsPerPhase=DECIMATION_TAPS_PER_PHASE):
+        """
+        Init a decimator of several channels
+
+        Args:
+            factor (int): The decimation factor.
+            channelCount (int): The number of channels.
+            tapsPerPhase (int, optional): The number of taps of each polyphase branch. Defaults to DECIMATION_TAPS_PER_PHASE.
+        """
+        self.factor = int(factor)
+        self.channelCount = channelCount
+        self.tapsPerPhase = tapsPerPhase
+        taps = getDecimationTaps(self.factor, tapsPerPhase)
+        # polyphase matrix: phases[p, r] multiplies input sample (k + p) * factor + r of output sample k
+        self.phases = np.ascontiguousarray(taps[::-1].reshape(tapsPerPhase, self.factor))
+        # the last (tapsPerPhase - 1) * factor input samples of each channel (channel-major)
+        self.history = np.zeros((channelCount, (tapsPerPhase - 1) * self.factor), dtype=np.float32)
+
+    def reset(self):
+        """ Clear the filter state """
+        self.history[...] = 0
+
+    def process(self, x):
+        """
+        Filter and downsample one block
+
+        Args:
+            x (np.ndarray): Samples with shape (frameCount, channelCount), frameCount is a multiple of factor.
+
+        Returns:
+            np.ndarray: float32 samples with shape (frameCount // factor, channelCount).
+        """
+        frameCount = x.shape[0]
+        if frameCount % self.factor != 0:
+            raise ValueError(f"The block length {frameCount} is not a multiple of the decimation factor {self.factor}")
+        outputCount = frameCount // self.factor
+        xx = np.concatenate((self.history, x.T), axis=1)
+        self.history[...] = xx[:, frameCount:]
+        # every polyphase branch of every input group in one matrix product: (C, Q, factor) @ (factor, P) -> (C, Q, P)
+        z = xx.reshape(self.channelCount, -1, self.factor) @ self.phases.T
+        # output k sums branch p of input group k + p
+        y = z[:, 0:outputCount, 0].copy()
+        for p in range(1, self.tapsPerPhase):
+            y += z[:, p:p + outputCount, p]
+        return y.T
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    import time
+    samplingRate, factor, chunk = 48000, 4, 4800
+    t = np.arange(samplingRate) / samplingRate
+    # 1 kHz is kept, 9 kHz is above the new Nyquist frequency (6 kHz) and has to be removed
+    x = np.stack([np.sin(2 * np.pi * 1000 * t), np.sin(2 * np.pi * 9000 * t)], axis=1).astype(np.float32)
+    decimator = MaintletPolyphaseDecimator(factor, channelCount=2)
+    startTime = time.time()
+    y = np.concatenate([decimator.process(x[i:i + chunk]) for i in range(0, x.shape[0], chunk)], axis=0)
+    print(f"{(time.time() - startTime) * 1000:.2f} ms for 1 S of 2 channels", y.shape)
+    # compare with a direct convolution
+    direct = np.stack([np.convolve(x[:, c], getDecimationTaps(factor))[:x.shape[0]] for c in range(2)], axis=1)
+    delay = (factor - 1) # the polyphase output k is the direct output k * factor + factor - 1
+    print(np.allclose(y, direct[delay::factor], atol=1e-5))
+    rms = np.sqrt(np.mean(y[1000:] ** 2, axis=0))
+    print("RMS 1 kHz", round(rms[0], 4), "9 kHz (dB)", round(20 * np.log10(rms[1] / np.sqrt(0.5)), 1))
+#============================= END OF TEST CODE ==============================
@@ -40,10 +40,18 @@ class ADCTimeError(Error):
     def __init__(self):
         Error.__init__(self, f"The ADC time is not correct. Retry...")
 
+class RecordChunkChangedError(Error):
+    def __init__(self, oldChunk, newChunk):
+        Error.__init__(self, f"The record chunk is re-calibrated from {oldChunk} to {newChunk} frames. Restart...")
+
 class GetDeviceIndexError(Error):
     def __init__(self, deviceName):
         Error.__init__(self, f"Cannot get the system index of device {deviceName}")
 
+class CaptureBackendError(Error):
+    def __init__(self, backendName):
+        Error.__init__(self, f"Cannot create the capture backend {backendName}")
+
 #===========================================================================
 #                            TEST CODE
 #===========================================================================
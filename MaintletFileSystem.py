@@ -6,8 +6,15 @@
 #  @createdOn      :  02/06/2023
 #  @description    :  Handle Files in a folder
 #===========================================================================
-from MaintletConfig import pathNameConfig, targetFileSize, minimumDiskSpace
-from MaintletSharedObjects import timer, fileSystemToDataAnalysisQ
+from MaintletConfig import pathNameConfig, recordingConfig, experimentConfig, storageGroupSuffixes, analysisGroupIndex, minimumDiskSpace, cleanupTargetDiskSpace
+from MaintletSharedObjects import timer, fileSystemToDataAnalysisQ, dataAnalysisToFileSystemQ, fileCommittedQ, manifest
+from MaintletCompression import MaintletCompressor, COMPRESSED_EXTENSIONS
+from MaintletStorageLayout import getStorageGroupSuffixOfFile
+from MaintletMessage import MaintletMessage
+from MaintletStorageCatalog import MaintletStorageCatalog
+from MaintletRetention import getRetentionPolicies, applyLabel, getExpiryKey
+from MaintletManifest import replayManifest, getManifestFilename
+from MaintletSummary import getSummaryFilepath
 from watchdog.observers import Observer
 from watchdog.events import PatternMatchingEventHandler
 from MaintletLog import logger
@@ -15,43 +22,278 @@ import os
 import time
 import threading 
 import shutil
-from os.path import isfile, join
-from os import listdir
+import queue
+import collections
+
+RECORD_FILE_EXTENSIONS = ('.wav',) + tuple(COMPRESSED_EXTENSIONS.values())
+HANDLED_FILE_HISTORY = 1024 # recently handled files, a file pushed by the writer is not handled again by the watchdog fallback
+EXTERNAL_FILE_POLL_INTERVAL = 0.2 # unit: second, a file dropped by another program is complete when its size stops changing
+EXTERNAL_FILE_TIMEOUT = 60 # unit: second
 
 class MaintletFileSystem:
-    def __init__(self, networkHandler = -1):
+    def __init__(self, networkHandler = -1, databaseHandler = None):
         self.recordFolderPath = pathNameConfig['recordFolderPath']
         self.totalFileCounter = 0 # counter for total file count
         self.networkHandler = networkHandler # network handelr for sending data to remote server
-        self.targetFileSize = targetFileSize
+        self.databaseHandler = databaseHandler # for updating the storage format of files
+        self.tableName = pathNameConfig['tableName']
+        self.storageGroupSuffixes = storageGroupSuffixes # the file name suffix of each storage group
+        self.analysisSuffix = storageGroupSuffixes[analysisGroupIndex] # only files of this storage group are analysed
+        self.isFileAnalysed = experimentConfig['recordMode'] != 'continuous' # the continuous mode analyses windows in the ring buffer
         self.curFilePath = ""
-        patterns = ["*"]
-        ignore_patterns = None
-        ignore_directories = False
-        case_sensitive = True
-        self.event_handler = PatternMatchingEventHandler(patterns, ignore_patterns, ignore_directories, case_sensitive)
-        self.event_handler.on_created = self.on_created
-        path = self.recordFolderPath
-        go_recursively = True
-        self.observer = Observer()
-        self.observer.schedule(self.event_handler, path, recursive=go_recursively)
-        
-    def on_created(self, event):
-        filePath = event.src_path
-        # The following while loop will block on_created until the wav file is completely saved in the file system
-        # This is OK because we want to process these files in FIFO order
+
+        # Lossless compression. A raw WAV file is kept until it is compressed and the data analysis has loaded it
+        # The encoder processes are forked here, so create this object before starting threads
+        self.storageFormat = recordingConfig['storageFormat']
+        self.compressor = None
+        if self.storageFormat != 'wav':
+            self.compressor = MaintletCompressor(storageFormat=self.storageFormat,
+                                                 workerCount=recordingConfig['encoderWorkerCount'],
+                                                 queueSize=recordingConfig['encoderQueueSize'],
+                                                 onFinish=self._compressedFileHandler,
+                                                 onError=self._compressionErrorHandler)
+        self.rawFileStates = {} # raw file path -> {'compressed': bool, 'consumed': bool}
+        self.rawFileStatesLock = threading.Lock()
+
+        # The record writer pushes a 'fileCommitted' event for each file it has moved to the record folder
+        self.handledFilePaths = collections.OrderedDict() # recently handled files (bounded)
+        self.handledFilePathsLock = threading.Lock()
+        self.fileEventThread = None
+
+        # Record files by timestamp, the oldest one is evicted when the disk is full
+        self.catalog = MaintletStorageCatalog(self.recordFolderPath, RECORD_FILE_EXTENSIONS)
+        self.cleanUpLock = threading.Lock()
+        # the labels of the data analysis move files in the eviction order, old files can expire
+        self.retentionPolicies = getRetentionPolicies(experimentConfig)
+
+        # The manifest journal of a resumed experiment rebuilds the catalog, unfinished files are requeued by run()
+        self.requeuedFiles = [] # (raw file path, isAnalysed)
+        self._reconcile()
+
+        # Fallback for files copied to the record folder by other programs
+        # only complete WAV files are handled, compressed files and temporary files are ignored
+        self.observer = None
+        if recordingConfig['enableWatchdogFallback']:
+            patterns = ["*.wav"]
+            ignore_patterns = None
+            ignore_directories = False
+            case_sensitive = True
+            self.event_handler = PatternMatchingEventHandler(patterns, ignore_patterns, ignore_directories, case_sensitive)
+            self.event_handler.on_created = self.on_created
+            path = self.recordFolderPath
+            go_recursively = True
+            self.observer = Observer()
+            self.observer.schedule(self.event_handler, path, recursive=go_recursively)
+
+    def _claimFile(self, filePath):
+        """ Return True if the file is not handled yet, and mark it as handled """
+        with self.handledFilePathsLock:
+            if filePath in self.handledFilePaths:
+                return False
+            self.handledFilePaths[filePath] = True
+            if len(self.handledFilePaths) > HANDLED_FILE_HISTORY:
+                self.handledFilePaths.popitem(last=False)
+            return True
+
+    def _fileEventLoop(self):
+        """ The thread routine which handles the 'fileCommitted' events of the record writer """
         while True:
-            if os.path.getsize(filePath) == self.targetFileSize:
-                self.curFilePath = filePath
-                logger.info(f"File: {self.curFilePath} is saved successfully")
-                self._newFileHandler(filePath)
-                threading.Thread(target=self._checkAndCleanUpSpace).start()
+            message = fileCommittedQ.get()
+            if message is None:
                 break
-                
-            time.sleep(0.05)
+            if message.command != 'fileCommitted':
+                continue
+            filePath = message.payload['filepath']
+            if not self._claimFile(filePath):
+                continue
+            self.curFilePath = filePath
+            logger.info(f"File: {filePath} is committed ({message.payload['sizeInByte']} byte)")
+            manifest.append('written', getManifestFilename(filePath), path=filePath, size=message.payload['sizeInByte'])
+            self.catalog.add(filePath, sizeInByte=message.payload['sizeInByte'])
+            self._newFileHandler(filePath)
+            threading.Thread(target=self._checkAndCleanUpSpace).start()
+
+    def on_created(self, event):
+        """ Watchdog fallback: a WAV file appears in the record folder, wait for it in another thread to keep the observer free """
+        thread = threading.Thread(target=self._handleExternalFile, args=(event.src_path,), daemon=True)
+        thread.name = 'externalFile'
+        thread.start()
+
+    def _handleExternalFile(self, filePath):
+        """ Handle a WAV file copied to the record folder by another program once its size stops changing """
+        prevSize = -1
+        startTime = time.monotonic()
+        while time.monotonic() - startTime < EXTERNAL_FILE_TIMEOUT:
+            time.sleep(EXTERNAL_FILE_POLL_INTERVAL)
+            with self.handledFilePathsLock:
+                # a file of the record writer (moved in from the tmp folder) is already handled by its event
+                if filePath in self.handledFilePaths:
+                    return
+            try:
+                size = os.path.getsize(filePath)
+            except OSError:
+                # removed or renamed
+                return
+            if size == prevSize and size > 0:
+                break
+            prevSize = size
+        else:
+            logger.warning(f"File: {filePath} is still growing after {EXTERNAL_FILE_TIMEOUT} S, skip it")
+            return
+        if not self._claimFile(filePath):
+            return
+        self.curFilePath = filePath
+        logger.info(f"File: {filePath} is found by the watchdog fallback")
+        manifest.append('written', getManifestFilename(filePath), path=filePath, size=size)
+        self.catalog.add(filePath)
+        self._newFileHandler(filePath)
+        threading.Thread(target=self._checkAndCleanUpSpace).start()
+
+    def _reconcile(self):
+        """ Replay the manifest journal: rebuild the catalog, mark the lost and evicted recordings, find the unfinished files """
+        startTime = time.monotonic()
+        recordings, lineCount, tornLineCount = replayManifest(manifest.filepath)
+        if lineCount == 0:
+            # a new experiment, or one recorded before the journal
+            self.catalog.seed()
+            return
+        lostFilenames = []
+        evictedFilenames = []
+        for filename, state in recordings.items():
+            if state['state'] == 'captured':
+                # the writer may have committed the file without its event
+                try:
+                    stat = os.stat(state['path'])
+                except OSError:
+                    lostFilenames.append(filename)
+                    continue
+                state.update({'state': 'written', 'time': stat.st_mtime, 'rawPath': state['path'], 'size': stat.st_size})
+                manifest.append('written', filename, path=state['path'], size=stat.st_size)
+            if state['state'] == 'evicted':
+                evictedFilenames.append(filename)
+                # the files of an eviction cut by a crash
+                for path in {state['path'], state['rawPath'], getSummaryFilepath(state['path'])}:
+                    if path != None and os.path.exists(path):
+                        os.unlink(path)
+                continue
+            if not os.path.exists(state['path']):
+                # deleted while the process was stopped, its summary sidecar is left
+                lostFilenames.append(filename)
+                try:
+                    os.unlink(getSummaryFilepath(state['path']))
+                except OSError:
+                    pass
+                continue
+            key = state['time']
+            for label in state['labels']:
+                key = applyLabel(self.retentionPolicies, key, label)
+            self.catalog.add(state['path'], key=key, sizeInByte=state['size'])
+            isAnalysed = self._isAnalysedFile(state['rawPath']) and not state['isLoaded']
+            if state['path'] == state['rawPath']:
+                # not compressed yet (or kept in WAV)
+                if isAnalysed or self.compressor != None:
+                    self.requeuedFiles.append((state['path'], isAnalysed))
+            elif os.path.exists(state['rawPath']):
+                # compressed, the raw file was kept for the data analysis
+                if not isAnalysed:
+                    os.unlink(state['rawPath'])
+                    continue
+                self.catalog.add(state['rawPath'], key=key)
+                self.rawFileStates[state['rawPath']] = {'compressed': True, 'consumed': False}
+                self.catalog.pin(state['rawPath'])
+                fileSystemToDataAnalysisQ.put(state['rawPath'])
+        for filename in lostFilenames:
+            recordings[filename]['state'] = 'evicted'
+            manifest.append('evicted', filename, reason='lost')
+        # repeat the updates which may have been lost with the process, they are committed before the journal forgets the recordings
+        self._markRecordings(lostFilenames, 'lost')
+        self._markRecordings(evictedFilenames, 'evicted')
+        manifest.compact(recordings)
+        logger.info(f"Manifest: {lineCount} lines ({tornLineCount} torn), {len(recordings)} recordings, {len(lostFilenames)} lost, "
+                    f"{len(self.requeuedFiles) + len(self.rawFileStates)} unfinished in {round(time.monotonic() - startTime, 3)} S")
 
-    def _newFileHandler(self, filePath):
-        fileSystemToDataAnalysisQ.put(filePath)
+    def _isAnalysedFile(self, filePath):
+        """ Return True if the data analysis loads this file """
+        return self.isFileAnalysed and getStorageGroupSuffixOfFile(filePath, self.storageGroupSuffixes) == self.analysisSuffix
+
+    def _newFileHandler(self, filePath, isAnalysed=None):
+        """
+        Compress a raw file and send it to the data analysis
+
+        Args:
+            filePath (str): The raw WAV file.
+            isAnalysed (bool, optional): Send it to the data analysis. Defaults to None (by its storage group).
+        """
+        if isAnalysed == None:
+            isAnalysed = self._isAnalysedFile(filePath)
+        # the file is not evicted while the compression or the data analysis can still open it
+        if self.compressor != None:
+            with self.rawFileStatesLock:
+                # a file which is not analysed is released once it is compressed
+                self.rawFileStates[filePath] = {'compressed': False, 'consumed': not isAnalysed}
+            self.catalog.pin(filePath)
+            if not self.compressor.submit(filePath):
+                # the file stays in WAV
+                with self.rawFileStatesLock:
+                    self.rawFileStates.pop(filePath, None)
+                self.catalog.unpin(filePath)
+        if isAnalysed:
+            self.catalog.pin(filePath)
+            fileSystemToDataAnalysisQ.put(filePath)
+
+    def _compressedFileHandler(self, result):
+        """ Update the database row of a compressed file (called by the result thread of the compressor) """
+        filePath = result['rawFilepath']
+        # the compressed file takes the place of the raw file in the catalog
+        self.catalog.add(result['compressedFilepath'], key=self.catalog.getRecordingKey(filePath), sizeInByte=result['compressedSize'])
+        manifest.append('written', getManifestFilename(filePath), path=result['compressedFilepath'], size=result['compressedSize'])
+        if self.databaseHandler != None:
+            filename = filePath.split('/')[-1]
+            newValues = {'storageFormat': result['storageFormat'], 'compressionRatio': result['ratio'], 'compressionCpuTime': result['cpuTime']}
+            for column, value in newValues.items():
+                self.databaseHandler.messageQPut(MaintletMessage(f"update_{self.tableName}_{column}_filename_{filename}", value))
+        self.catalog.unpin(filePath)
+        self._releaseRawFile(filePath, 'compressed')
+
+    def _compressionErrorHandler(self, filePath):
+        """ A file failed to compress, it stays in WAV (called by the result thread of the compressor) """
+        with self.rawFileStatesLock:
+            self.rawFileStates.pop(filePath, None)
+        self.catalog.unpin(filePath)
+
+    def _consumedFileHandler(self, filePath):
+        """ The data analysis has loaded a file """
+        manifest.append('loaded', getManifestFilename(filePath))
+        self.catalog.unpin(filePath)
+        self._releaseRawFile(filePath, 'consumed')
+
+    def _labelFileHandler(self, result):
+        """ The data analysis has labelled a file, apply the retention policies to its recording """
+        filePath = result['file']
+        manifest.append('analysed', getManifestFilename(filePath), label=result['label'])
+        key = self.catalog.getRecordingKey(filePath)
+        if key == None:
+            return
+        newKey = applyLabel(self.retentionPolicies, key, result['label'])
+        if newKey != key:
+            self.catalog.setRecordingKey(filePath, newKey)
+
+    def _releaseRawFile(self, filePath, event):
+        """ Record an event of a raw file and delete the file once it is compressed and consumed """
+        with self.rawFileStatesLock:
+            state = self.rawFileStates.get(filePath)
+            if state == None:
+                return
+            state[event] = True
+            if not (state['compressed'] and state['consumed']):
+                return
+            del self.rawFileStates[filePath]
+        try:
+            os.unlink(filePath)
+            self.catalog.remove(filePath)
+            logger.debug(f"Remove the raw file {filePath}")
+        except OSError as e:
+            logger.error(f"Cannot remove the raw file {filePath}: {e}")
     
     def getCurrentRemainingDiskSpace(self):
         """ Get the remaining disk space in MB """
@@ -60,49 +302,101 @@ class MaintletFileSystem:
         return diskSpaceInMB
 
     def _checkAndCleanUpSpace(self):
-        """ Remove the oldest file in the record folder """
+        """ Evict the expired files, and a batch of files when the free disk space is below minimumDiskSpace """
+        expiryKey = getExpiryKey(self.retentionPolicies, time.time())
+        if expiryKey != None:
+            self._handleEvictedFiles(self.catalog.evictBatch(maxKey=expiryKey, beforeDelete=self._journalEviction('expired')), reason='expired')
         currentDiskSpace = self.getCurrentRemainingDiskSpace()
         logger.debug(f"Remaining Disk Space = {currentDiskSpace} MB")
-        if currentDiskSpace < minimumDiskSpace:
-            logger.error(f"Disk is Full: Remaining disk space = {currentDiskSpace} MB")        
-            self._cleanUpSpace()
-        while self.getCurrentRemainingDiskSpace() <= minimumDiskSpace:
-            self._cleanUpSpace()
-
-    def _getAllRecordFilepaths(self, data_dir):
-        """ Get all absolute file paths in a directory and sort them in alphabetical order """
-        filepaths = []
-        filepaths = sorted([join(data_dir, f) for f in listdir(data_dir) if isfile(join(data_dir, f)) and 'wav' in f])
-        return filepaths
-
-    def _getOldestRecordFilepath(self, filepaths):
-        """ Get the latest file's filepath given filepaths sorted by create time in descending order """
-        return filepaths[0]
-
-    def _cleanUpSpace(self):
-        """ Remove the oldest file in the record folder """
-        #todo  Think about other cleanup strategies 
-        # get all filepaths
-        filepaths = self._getAllRecordFilepaths(self.recordFolderPath)
-        # get the oldest
-        filepath = self._getOldestRecordFilepath(filepaths)
-        # remove it
-        logger.warning(f"Delete file for more space: {filepath}")
+        if currentDiskSpace > minimumDiskSpace:
+            return
+        logger.error(f"Disk is Full: Remaining disk space = {currentDiskSpace} MB")
+        # one cleanup at a time, the other threads see the space it has freed
+        if not self.cleanUpLock.acquire(blocking=False):
+            return
         try:
-            os.system(f"rm {filepath}")
-        except Exception as e:
-            logger.critical(f"Cannot remove {filepath}")
-            raise     
+            while currentDiskSpace < cleanupTargetDiskSpace:
+                if not self._cleanUpSpace(sizeInMB=cleanupTargetDiskSpace - currentDiskSpace):
+                    logger.critical(f"Disk is Full: no record file is left to delete in {self.recordFolderPath}")
+                    break
+                currentDiskSpace = self.getCurrentRemainingDiskSpace()
+        finally:
+            self.cleanUpLock.release()
+
+    def _cleanUpSpace(self, sizeInMB):
+        """
+        Remove a batch of files in retention order (the oldest first)
+
+        Args:
+            sizeInMB (float): The space to free.
+
+        Returns:
+            bool: False if there is no file to remove.
+        """
+        evicted = self.catalog.evictBatch(minSizeInByte=sizeInMB * 1024 * 1024, beforeDelete=self._journalEviction('for more space'))
+        self._handleEvictedFiles(evicted, reason='for more space')
+        return len(evicted) > 0
+
+    def _journalEviction(self, reason):
+        """
+        Get the beforeDelete function of an eviction: the evicted recordings are in the manifest journal before
+        their files are deleted, the reconciliation finishes an eviction which was cut by a crash
+        """
+        def beforeDelete(batch):
+            for filepath, isLastFile in batch:
+                if isLastFile:
+                    manifest.append('evicted', getManifestFilename(filepath), reason=reason)
+            manifest.sync()
+        return beforeDelete
+
+    def _markRecordings(self, filenames, status):
+        """ Set the transactionStatus of the database rows of recordings (one transaction, committed before returning) """
+        if self.databaseHandler != None and len(filenames) > 0:
+            self.databaseHandler.updateValues(toTable=self.tableName, atColumn='transactionStatus', withKeyName='filename',
+                                              withKeyValues=filenames, withValue=status, isSync=True)
+
+    def _handleEvictedFiles(self, evicted, reason):
+        """ Forget the evicted raw files and mark the evicted recordings in the database (one transaction) """
+        if len(evicted) == 0:
+            return
+        sizeInMB = round(sum(sizeInByte for filepath, sizeInByte, isLastFile in evicted) / 1024 / 1024, 2)
+        logger.warning(f"Delete {len(evicted)} files ({sizeInMB} MB) {reason}: {evicted[0][0]} ... {evicted[-1][0]}")
+        with self.rawFileStatesLock:
+            for filepath, sizeInByte, isLastFile in evicted:
+                self.rawFileStates.pop(filepath, None)
+        # the database rows are keyed by the WAV filename, the evictions are already in the journal
+        self._markRecordings([getManifestFilename(filepath) for filepath, sizeInByte, isLastFile in evicted if isLastFile], 'evicted')
 
     def run(self):
-        self.observer.start()
+        self.fileEventThread = threading.Thread(target=self._fileEventLoop, daemon=True)
+        self.fileEventThread.name = 'fileEvents'
+        self.fileEventThread.start()
+        if self.observer != None:
+            self.observer.start()
+        for filePath, isAnalysed in self.requeuedFiles:
+            self._newFileHandler(filePath, isAnalysed=isAnalysed)
+        self.requeuedFiles = []
         try:
             while True:
-                time.sleep(1)
+                # file paths the data analysis has loaded, and its labels
+                try:
+                    message = dataAnalysisToFileSystemQ.get(timeout=1)
+                except queue.Empty:
+                    continue
+                if isinstance(message, MaintletMessage):
+                    if message.command == 'analysisResult':
+                        self._labelFileHandler(message.payload)
+                    continue
+                self._consumedFileHandler(message)
         except KeyboardInterrupt:
             logger.debug(f"MaintletFileSystem KeyboardInterrupt")
-            self.observer.stop()
-            self.observer.join()
+            fileCommittedQ.put(None)
+            if self.observer != None:
+                self.observer.stop()
+                self.observer.join()
+            if self.compressor != None:
+                self.compressor.stop()
+            manifest.close()
 
 
 
@@ -1,4 +1,8 @@
-import alsaaudio
+# the mixer only exists on the Raspberry Pi (e.g., not with the virtual capture backend)
+try:
+    import alsaaudio
+except ImportError:
+    alsaaudio = None
 import sys
 from MaintletLog import logger
 
@@ -19,6 +23,9 @@ def list_cards():
 
 def set_mixer(name, volume, cardindex = 1):
     global currentVolumes
+    if alsaaudio == None:
+        logger.warning(f"No mixer (alsaaudio is not installed), skip setting {name} to {volume}")
+        return
     # Demonstrates how to set mixer settings
     try:
         mixer = alsaaudio.Mixer(name, cardindex=cardindex)
@@ -0,0 +1,129 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  Gap accounting of the record stream
+#                        (1) the frames dropped between two consecutive chunks are measured with their ADC times
+#                        (2) a gap is (offset, length): the discontinuity is before the sample at offset (in the file),
+#                            length frames were dropped there (0 for an overflowed chunk without a measurable drop)
+#                        (3) gaps are stored as 'offset:length,...' in the database and can be masked by the data analysis
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   detector = MaintletGapDetector(samplingRate=48000, chunkFrameCount=4800, tolerance=0.002)
+#   droppedFrameCount = detector.getDroppedFrameCount(prevAdcTime, adcTime)  # 0 if the chunks are contiguous
+#   gaps = detector.findGaps(ringBuffer, seq, chunkCount)                    # gaps inside consecutive slots
+#   formatGaps(scaleGaps(gaps, factor=4))                                    # '1200:30,2400:0' in frames of a decimated file
+#   parseGaps('1200:30,2400:0')                                              # [(1200, 30), (2400, 0)]
+#   getGapFrameMask(gaps, spectrogramFrameCount, n_fft=2048, hop_length=512) # spectrogram frames across a discontinuity
+#==========================================================================
+
+import math
+import numpy as np
+
+class MaintletGapDetector:
+    def __init__(self, samplingRate, chunkFrameCount, tolerance):
+        """
+        Init the detector
+
+        Args:
+            samplingRate (int): The sampling rate of the record stream.
+            chunkFrameCount (int): The frames of a chunk.
+            tolerance (float): The jitter of the ADC time in second, smaller deltas are not gaps.
+        """
+        self.samplingRate = samplingRate
+        self.chunkFrameCount = int(chunkFrameCount)
+        self.toleranceFrameCount = round(tolerance * samplingRate)
+
+    def getDroppedFrameCount(self, prevAdcTime, adcTime):
+        """
+        Get the frames dropped between two consecutive chunks
+
+        Args:
+            prevAdcTime (float): The ADC time of the previous chunk.
+            adcTime (float): The ADC time of the chunk.
+
+        Returns:
+            int: The dropped frames, 0 if the delta is within the tolerance.
+        """
+        droppedFrameCount = round((adcTime - prevAdcTime) * self.samplingRate) - self.chunkFrameCount
+        return droppedFrameCount if droppedFrameCount > self.toleranceFrameCount else 0
+
+    def findGaps(self, ringBuffer, seq, chunkCount):
+        """
+        Find the gaps inside consecutive slots of a ring buffer (the gap before the first slot is not included)
+
+        Args:
+            ringBuffer (MaintletRingBuffer): The ring buffer.
+            seq (int): The first slot.
+            chunkCount (int): The number of slots.
+
+        Returns:
+            list: (offset, length) in frames from the start of the first slot.
+        """
+        gaps = []
+        prevAdcTime = ringBuffer.getSlotAdcTime(seq)
+        for i in range(1, chunkCount):
+            adcTime = ringBuffer.getSlotAdcTime(seq + i)
+            droppedFrameCount = self.getDroppedFrameCount(prevAdcTime, adcTime)
+            if droppedFrameCount > 0 or ringBuffer.getSlotStatus(seq + i) != 0:
+                gaps.append((i * self.chunkFrameCount, droppedFrameCount))
+            prevAdcTime = adcTime
+        return gaps
+
+def scaleGaps(gaps, factor):
+    """ Convert gaps in captured frames to the frames of a file decimated by factor """
+    if factor == 1:
+        return list(gaps)
+    return [(offset // factor, math.ceil(length / factor)) for offset, length in gaps]
+
+def formatGaps(gaps):
+    """ Format gaps for the database, e.g., '1200:30,2400:0' ('' if there is none) """
+    return ','.join(f"{offset}:{length}" for offset, length in gaps)
+
+def parseGaps(text):
+    """ Parse gaps formatted by formatGaps """
+    if text == None or text == '':
+        return []
+    return [tuple(int(e) for e in gap.split(':')) for gap in text.split(',')]
+
+def getGapFrameMask(gaps, frameCount, n_fft, hop_length):
+    """
+    Find the spectrogram frames (librosa, centered frames) whose window contains a discontinuity
+
+    Args:
+        gaps (list): (offset, length) in samples of the analysed data.
+        frameCount (int): The number of spectrogram frames.
+        n_fft (int): The window length of the spectrogram.
+        hop_length (int): The hop length of the spectrogram.
+
+    Returns:
+        np.ndarray: bool with shape (frameCount,), True for a frame across a discontinuity.
+    """
+    mask = np.zeros(frameCount, dtype=bool)
+    for offset, length in gaps:
+        # frame t covers the samples [t * hop_length - n_fft / 2, t * hop_length + n_fft / 2)
+        first = max(math.floor((offset - n_fft // 2) / hop_length) + 1, 0)
+        last = min((offset + n_fft // 2 - 1) // hop_length, frameCount - 1)
+        mask[first:last + 1] = True
+    return mask
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    from MaintletRingBuffer import MaintletRingBuffer
+    detector = MaintletGapDetector(samplingRate=48000, chunkFrameCount=480, tolerance=0.002)
+    ringBuffer = MaintletRingBuffer(slotCount=10, slotSizeInByte=4)
+    adcTime = 100.0
+    for i in range(10):
+        # 240 frames are dropped before chunk 4, chunk 7 overflows
+        adcTime += 0.01 + (0.005 if i == 4 else 0) + 0.00001 * (i % 2)
+        ringBuffer.write(b'\x00' * 4, adcTime, status=2 if i == 7 else 0)
+    gaps = detector.findGaps(ringBuffer, 0, 10)
+    print(gaps, formatGaps(scaleGaps(gaps, 4)), parseGaps(formatGaps(gaps)) == gaps)
+    print(np.flatnonzero(getGapFrameMask(gaps, frameCount=11, n_fft=2048, hop_length=512)))
+#============================= END OF TEST CODE ==============================
@@ -1,11 +1,42 @@
 import http.server
 import socketserver
-from MaintletConfig import HTTPPort
+import os
+from MaintletConfig import HTTPPort, pathNameConfig
 from MaintletLog import logger
+from MaintletStorageLayout import RECORD_FOLDER_LAYOUTS, getRecordFilepath
+from MaintletSharedObjects import manifest
+from MaintletManifest import getManifestFilename
+
+RECORD_FILE_EXTENSIONS = ('.wav', '.flac', '.mdz')
 
 PORT = HTTPPort
 
-Handler = http.server.SimpleHTTPRequestHandler
+class MaintletHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+    def translate_path(self, path):
+        """ A record file requested at the top of a record folder (e.g., a link stored before a migration) is also found in its shard """
+        filepath = super().translate_path(path)
+        if os.path.exists(filepath) or os.path.basename(os.path.dirname(filepath)) != pathNameConfig['recordFolderName']:
+            return filepath
+        for layout in RECORD_FOLDER_LAYOUTS:
+            shardFilepath = getRecordFilepath(os.path.dirname(filepath), os.path.basename(filepath), layout)
+            if os.path.exists(shardFilepath):
+                return shardFilepath
+        return filepath
+
+    def do_GET(self):
+        """ Serve a file like SimpleHTTPRequestHandler, a record file which is sent completely is journaled as uploaded """
+        f = self.send_head()
+        if f:
+            try:
+                self.copyfile(f, self.wfile)
+            finally:
+                f.close()
+            filepath = self.translate_path(self.path)
+            if filepath.endswith(RECORD_FILE_EXTENSIONS) and os.path.isfile(filepath):
+                # the journal descriptor is inherited from the main process, which compacts it before this process starts
+                manifest.append('uploaded', getManifestFilename(filepath), path=filepath, client=self.client_address[0])
+
+Handler = MaintletHTTPRequestHandler
 
 def run():
     with socketserver.TCPServer(("", PORT), Handler) as httpd:
@@ -0,0 +1,213 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  Append-only manifest journal of the recording lifecycle
+#                        (1) one JSON line per event: captured (handed to the writer), written (in the record folder, again with
+#                            the compressed file), loaded and analysed (read, then labelled by the data analysis), uploaded (a record file was sent
+#                            completely by the HTTP server, the only way files leave the device), evicted
+#                        (2) each event is a single write() to a file opened with O_APPEND, so a crash leaves at most one torn
+#                            last line, which the replay skips
+#                        (3) the replay folds the events into the latest state of each recording (keyed by the filename of
+#                            the database row), the file system reconciles the disk, the database and the analysis queue with it
+#                        (4) compact() rewrites the journal with the live recordings only (temporary file and rename)
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   manifest = MaintletManifest("datasets/manifest.jsonl")
+#   manifest.append('captured', "a_b.wav", path="records/a_b.wav")
+#   manifest.append('written', "a_b.wav", path="records/a_b.wav", size=768044)
+#   manifest.append('loaded', "a_b.wav")             # the data analysis has read the file
+#   manifest.append('analysed', "a_b.wav", label=0)  # and labelled it
+#   manifest.append('evicted', "a_b.wav", reason='for more space')
+#   recordings, lineCount, tornLineCount = replayManifest("datasets/manifest.jsonl")
+#   recordings["a_b.wav"]   # {'state': 'evicted', 'rawPath': ..., 'path': ..., 'size': ..., 'time': ..., 'isLoaded': True, 'labels': [0], ...}
+#   manifest.compact(recordings)  # keep the recordings which are not evicted
+#   getManifestFilename("records/a_b.flac")  # a_b.wav, the key of a recording
+#==========================================================================
+
+import json
+import os
+import threading
+import time
+from MaintletLog import logger
+
+MANIFEST_EVENTS = ('captured', 'written', 'loaded', 'analysed', 'uploaded', 'evicted')
+
+def getManifestFilename(filepath):
+    """ Get the key of the recording of a file (any storage format): the WAV filename of its database row """
+    return os.path.splitext(os.path.basename(filepath))[0] + '.wav'
+
+def replayManifest(filepath):
+    """
+    Fold the events of a journal into the latest state of each recording
+
+    Args:
+        filepath (str): The journal.
+
+    Returns:
+        tuple: (dict filename -> state in journal order, number of lines, number of torn or unknown lines).
+               state: 'state' (the latest event), 'time' (of the first written event), 'rawPath' (first written path),
+               'path' and 'size' (latest written file), 'isLoaded', 'isUploaded' and 'labels' (in order).
+    """
+    recordings = {}
+    lineCount = 0
+    tornLineCount = 0
+    try:
+        f = open(filepath, 'rb')
+    except FileNotFoundError:
+        return recordings, 0, 0
+    with f:
+        for line in f:
+            lineCount += 1
+            try:
+                record = json.loads(line)
+                event = record['event']
+                filename = record['file']
+            except (ValueError, KeyError):
+                # the line a crash has cut
+                tornLineCount += 1
+                continue
+            if event not in MANIFEST_EVENTS:
+                tornLineCount += 1
+                continue
+            state = recordings.get(filename)
+            if state == None:
+                state = recordings[filename] = {'state': event, 'time': None, 'rawPath': None, 'path': record.get('path'), 'size': 0,
+                                                'isLoaded': False, 'isUploaded': False, 'labels': []}
+            if event == 'written':
+                if state['rawPath'] == None:
+                    state['rawPath'] = record['path']
+                    state['time'] = record['t']
+                state['path'] = record['path']
+                state['size'] = record.get('size', 0)
+            elif event == 'loaded':
+                state['isLoaded'] = True
+            elif event == 'analysed':
+                # only a loaded file is labelled
+                state['isLoaded'] = True
+                if record.get('label') != None:
+                    state['labels'].append(record['label'])
+            elif event == 'uploaded':
+                state['isUploaded'] = True
+            # a later lifecycle event never moves a recording back (e.g., the compressed file of an analysed recording)
+            if MANIFEST_EVENTS.index(event) >= MANIFEST_EVENTS.index(state['state']):
+                state['state'] = event
+    return recordings, lineCount, tornLineCount
+
+class MaintletManifest:
+    def __init__(self, filepath):
+        """
+        Open (or create) a journal for appending
+
+        Args:
+            filepath (str): The journal.
+        """
+        self.filepath = filepath
+        self.lock = threading.Lock()
+        self.fd = os.open(self.filepath, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self.totalEvent = 0
+        # end a line torn by a crash, the next event starts on its own line
+        with open(self.filepath, 'rb') as f:
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    os.write(self.fd, b'\n')
+
+    def append(self, event, filename, **fields):
+        """
+        Append an event of a recording
+
+        Args:
+            event (str): One of MANIFEST_EVENTS.
+            filename (str): The recording, the filename of its database row (the WAV filename).
+            **fields: path, size, label, reason, ... (JSON values).
+        """
+        record = {'t': round(time.time(), 3), 'event': event, 'file': filename}
+        record.update(fields)
+        line = (json.dumps(record, separators=(',', ':')) + '\n').encode()
+        with self.lock:
+            # one write per line, appends of other threads and processes never interleave inside it
+            os.write(self.fd, line)
+            self.totalEvent += 1
+
+    def sync(self):
+        """ Flush the journal to the disk """
+        with self.lock:
+            os.fsync(self.fd)
+
+    def compact(self, recordings):
+        """
+        Rewrite the journal with the recordings which are not evicted, in journal order
+
+        Args:
+            recordings (dict): The states of replayManifest (after the reconciliation).
+        """
+        tmpFilepath = self.filepath + '.tmp'
+        with self.lock:
+            with open(tmpFilepath, 'w') as f:
+                for filename, state in recordings.items():
+                    if state['state'] in ('captured', 'evicted'):
+                        continue
+                    records = [{'t': state['time'], 'event': 'written', 'file': filename, 'path': state['rawPath'], 'size': state['size']}]
+                    if state['path'] != state['rawPath']:
+                        records.append({'t': state['time'], 'event': 'written', 'file': filename, 'path': state['path'], 'size': state['size']})
+                    if state['isLoaded']:
+                        records.append({'t': state['time'], 'event': 'loaded', 'file': filename})
+                        records.extend({'t': state['time'], 'event': 'analysed', 'file': filename, 'label': label} for label in state['labels'])
+                    if state['isUploaded']:
+                        records.append({'t': state['time'], 'event': 'uploaded', 'file': filename})
+                    for record in records:
+                        f.write(json.dumps(record, separators=(',', ':')) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmpFilepath, self.filepath)
+            # the old descriptor points to the replaced file
+            os.close(self.fd)
+            self.fd = os.open(self.filepath, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        logger.info(f"Manifest: {self.filepath} is compacted")
+
+    def close(self):
+        """ Flush and close the journal """
+        with self.lock:
+            os.fsync(self.fd)
+            os.close(self.fd)
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    import tempfile
+    filepath = os.path.join(tempfile.mkdtemp(), 'manifest.jsonl')
+    manifest = MaintletManifest(filepath)
+    for i in range(4):
+        manifest.append('captured', f"f{i}.wav", path=f"records/f{i}.wav")
+    for i in range(3):
+        manifest.append('written', f"f{i}.wav", path=f"records/f{i}.wav", size=1000)
+    manifest.append('written', "f0.wav", path="records/f0.flac", size=500)
+    manifest.append('loaded', "f0.wav")
+    manifest.append('analysed', "f0.wav", label=1)
+    manifest.append('evicted', "f1.wav", reason='for more space')
+    # a crash in the middle of a line, the journal is opened again after the restart
+    os.write(manifest.fd, b'{"t":1.0,"event":"writ')
+    manifest.close()
+    manifest = MaintletManifest(filepath)
+    manifest.append('written', "f3.wav", path="records/f3.wav", size=1000)
+    recordings, lineCount, tornLineCount = replayManifest(filepath)
+    print(lineCount, tornLineCount)
+    for filename, state in recordings.items():
+        print(filename, state['state'], state['path'], state['isLoaded'], state['labels'])
+    startTime = time.time()
+    for i in range(10000):
+        manifest.append('written', f"x{i}.wav", path=f"records/x{i}.wav", size=768044)
+    print(f"append {(time.time() - startTime) / 10000 * 1e6:.1f} us")
+    startTime = time.time()
+    recordings, lineCount, tornLineCount = replayManifest(filepath)
+    print(f"replay {lineCount} lines {(time.time() - startTime) * 1e3:.1f} ms")
+    manifest.compact(recordings)
+    print(replayManifest(filepath)[1:], recordings["f0.wav"] == replayManifest(filepath)[0]["f0.wav"])
+    manifest.close()
+#============================= END OF TEST CODE ==============================
@@ -0,0 +1,150 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  Decode interleaved little-endian PCM data (16/24/32 bit) to numpy arrays
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   y = decodePCM(dataBuffer, sampleWidth=2, channelCount=8)
+#   y.shape == (frameCount, channelCount), y[:, i] is the strided view of channel i
+#
+#   16 bit and 32 bit: y is a view of dataBuffer (no copy)
+#   24 bit           : y is one new int32 array (sign-extended)
+#   asFloat=True     : y is one new float32 array scaled to [-1, 1)
+#
+#   encodePCM(y, sampleWidth=2, out=None) is the inverse of decodePCM(asFloat=True), y: (frameCount, channelCount) float
+#
+#   packChannels(dataBuffer, sampleWidth=2, channelCount=8, channelIndices=[0, 1], out=fileBuffer[offset:offset+size])
+#   copies channels 0 and 1 of each frame into out (interleaved, any sample width, no decoding)
+#==========================================================================
+
+import numpy as np
+
+CONVERSION_BLOCK_SIZE = 1 << 16 # samples per block of the in-place int32 to float32 conversion
+
+def getFullScale(sampleWidth):
+    """ Get the full scale value of a signed PCM sample with the given width in byte """
+    return float(1 << (8 * sampleWidth - 1))
+
+def decodePCM(dataBuffer, sampleWidth, channelCount, asFloat=False):
+    """
+    Decode interleaved PCM data to a (frameCount, channelCount) array
+
+    Args:
+        dataBuffer (bytes-like): The raw PCM data (bytes, bytearray, memoryview).
+        sampleWidth (int): The sample width in byte, 2, 3 or 4.
+        channelCount (int): The number of interleaved channels.
+        asFloat (bool, optional): Return float32 samples scaled to [-1, 1). Defaults to False.
+
+    Returns:
+        np.ndarray: The decoded samples with shape (frameCount, channelCount).
+    """
+    if sampleWidth == 2 or sampleWidth == 4:
+        dt = np.dtype(np.int16 if sampleWidth == 2 else np.int32).newbyteorder('<')
+        y = np.frombuffer(dataBuffer, dtype=dt)
+        if asFloat:
+            y = y.astype(np.float32)
+            y *= np.float32(1 / getFullScale(sampleWidth))
+    elif sampleWidth == 3:
+        d3 = np.frombuffer(dataBuffer, dtype=np.uint8).reshape(-1, 3)
+        # put the three bytes in the upper three bytes of an int32 and shift them back, the arithmetic shift extends the sign
+        # the float32 output has the same item size, so the same allocation is reused for the conversion
+        y = np.empty(d3.shape[0], dtype=np.float32 if asFloat else np.int32)
+        y32 = y.view(np.dtype(np.int32).newbyteorder('<'))
+        d4 = y32.view(np.uint8).reshape(-1, 4)
+        d4[:, 0] = 0
+        d4[:, 1:] = d3
+        y32 >>= 8
+        if asFloat:
+            # convert in place block by block, numpy would copy the whole overlapping input otherwise
+            scale = np.float32(1 / getFullScale(sampleWidth))
+            for start in range(0, y.shape[0], CONVERSION_BLOCK_SIZE):
+                end = start + CONVERSION_BLOCK_SIZE
+                np.multiply(y32[start:end], scale, out=y[start:end], casting='unsafe')
+    else:
+        raise ValueError(f"Unsupported sample width: {sampleWidth}")
+
+    return y.reshape(-1, channelCount)
+
+def encodePCM(y, sampleWidth, out=None):
+    """
+    Encode float samples in [-1, 1) to interleaved little-endian PCM (rounded and clipped)
+
+    Args:
+        y (np.ndarray): Samples with shape (frameCount, channelCount).
+        sampleWidth (int): The sample width in byte, 2, 3 or 4.
+        out (writable bytes-like, optional): The destination with the exact encoded size. Defaults to None (a new array).
+
+    Returns:
+        np.ndarray: The encoded data as a flat uint8 array (a view of out if given).
+    """
+    if sampleWidth not in (2, 3, 4):
+        raise ValueError(f"Unsupported sample width: {sampleWidth}")
+    fullScale = getFullScale(sampleWidth)
+    x = np.clip(np.rint(np.asarray(y, dtype=np.float64) * fullScale), -fullScale, fullScale - 1)
+    if sampleWidth == 2:
+        data = x.astype('<i2').view(np.uint8)
+    else:
+        data = x.astype('<i4').view(np.uint8).reshape(-1, 4)[:, :sampleWidth]
+    if out is None:
+        return np.ascontiguousarray(data).reshape(-1)
+    dst = np.frombuffer(out, dtype=np.uint8)
+    dst.reshape(data.shape)[...] = data
+    return dst
+
+def packChannels(dataBuffer, sampleWidth, channelCount, channelIndices, out=None):
+    """
+    Copy some channels of interleaved PCM data into a smaller interleaved buffer
+
+    Args:
+        dataBuffer (bytes-like): The raw PCM data.
+        sampleWidth (int): The sample width in byte.
+        channelCount (int): The number of interleaved channels in dataBuffer.
+        channelIndices (list): The channels to keep, in output order.
+        out (writable bytes-like, optional): The destination with the exact packed size. Defaults to None (a new array).
+
+    Returns:
+        np.ndarray: The packed data as a flat uint8 array (a view of out if given).
+    """
+    src = np.frombuffer(dataBuffer, dtype=np.uint8).reshape(-1, channelCount, sampleWidth)
+    shape = (src.shape[0], len(channelIndices), sampleWidth)
+    dst = np.empty(shape, dtype=np.uint8) if out is None else np.frombuffer(out, dtype=np.uint8).reshape(shape)
+    np.take(src, channelIndices, axis=1, out=dst)
+    return dst.reshape(-1)
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    channelCount = 8
+    samples = np.array([0, 1, -1, 8388607, -8388608, 123456, -123456, 42] * 4, dtype=np.int32)
+
+    # 24 bit
+    raw = samples.astype('<i4').view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    y = decodePCM(raw, 3, channelCount)
+    print(y.shape, y.dtype, np.array_equal(y.flatten(), samples))
+    print(decodePCM(raw, 3, channelCount, asFloat=True)[0])
+
+    # 16 bit
+    samples16 = np.array([0, 1, -1, 32767, -32768, 1234, -1234, 42] * 4, dtype='<i2')
+    y = decodePCM(samples16.tobytes(), 2, channelCount)
+    print(y.shape, y.dtype, np.array_equal(y.flatten(), samples16), y[:, 3].strides)
+    print(decodePCM(samples16.tobytes(), 2, channelCount, asFloat=True)[0])
+
+    # 32 bit
+    y = decodePCM(samples.astype('<i4').tobytes(), 4, channelCount)
+    print(y.shape, y.dtype, np.array_equal(y.flatten(), samples))
+
+    # pack channels 1 and 3 of the 24 bit data
+    out = bytearray(len(raw) // channelCount * 2)
+    packChannels(raw, 3, channelCount, [1, 3], out=memoryview(out))
+    print(np.array_equal(decodePCM(out, 3, 2), decodePCM(raw, 3, channelCount)[:, [1, 3]]))
+
+    # encodePCM is the inverse of decodePCM(asFloat=True)
+    for sampleWidth, raw in [(2, samples16.tobytes()), (3, raw), (4, samples.astype('<i4').tobytes())]:
+        print(sampleWidth, bytes(encodePCM(decodePCM(raw, sampleWidth, channelCount, asFloat=True), sampleWidth)) == raw)
+#============================= END OF TEST CODE ==============================
@@ -0,0 +1,414 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  A long-lived WAV writer service
+#                        (1) a bounded work queue and a fixed number of writer threads (no thread per file)
+#                        (2) files are written to the tmp folder and moved to the record folder in capture order
+#                        (3) track in-flight bytes, queue depth and write latency
+#                        (4) a streaming WAV file which takes chunks in a memory-mapped file as they arrive (flushed once when it is closed)
+#                        (5) the summary sidecar of a file (MaintletFileSummary) is committed with the file
+#                        (6) a 'fileCommitted' event (path, size, format) is published for every committed file, in capture order
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   writer = MaintletRecordWriter(tmpFolderPath, workerCount=2, queueSize=4, onPrepare=f1, onFinish=f2, commitQ=fileCommittedQ)
+#   writer.start()
+#   isAccepted = writer.submit(filepath, dataBuffer, channelCount, sampleWidth, samplingRate, context=None, summary=None)
+#   writer.getStatus()
+#   writer.stop()
+#
+#   onPrepare(job) is called by a writer thread before the file is written (e.g., insert the database entry)
+#   onFinish(job) is called after the file is committed or failed (e.g., return the buffer to the pool)
+#   job.context is any object given by the caller (e.g., the storage group of the file)
+#
+#   Streaming mode (no file buffer in RAM):
+#   streamingFile = MaintletStreamingWavFile(filepath, tmpFolderPath, channelCount, sampleWidth, samplingRate, dataSizeInByte)
+#   streamingFile.write(offset, chunk)    # for each chunk
+#   writer.submitStream(streamingFile, context=None, summary=None)  # header fix-up and rename are done by a writer thread in capture order
+#
+#   summary (MaintletFileSummary) is saved as <name>.summary.npz and moved to the record folder just before the file
+#
+#   commitQ receives MaintletMessage('fileCommitted', job.getCommitEvent()) right after each file is moved to its final path
+#==========================================================================
+
+import wave
+import os
+import time
+import queue
+import threading
+import mmap
+import struct
+from MaintletLog import logger
+from MaintletSharedObjects import timer
+from MaintletMessage import MaintletMessage
+from MaintletSummary import getSummaryFilepath
+
+WAV_HEADER_SIZE = 44
+
+def createWavHeader(channelCount, sampleWidth, samplingRate, dataSizeInByte):
+    """
+    Create the 44-byte header of a PCM WAV file (the same header written by the wave module)
+
+    Returns:
+        bytes: The header.
+    """
+    blockAlign = channelCount * sampleWidth
+    return struct.pack('<4sI4s4sIHHIIHH4sI',
+                       b'RIFF', 36 + dataSizeInByte, b'WAVE',
+                       b'fmt ', 16, 1, channelCount, samplingRate, samplingRate * blockAlign, blockAlign, sampleWidth * 8,
+                       b'data', dataSizeInByte)
+
+class MaintletStreamingWavFile:
+    def __init__(self, filepath, tmpFolderPath, channelCount, sampleWidth, samplingRate, dataSizeInByte):
+        """
+        Preallocate a WAV file (header + data) in the tmp folder and map it into memory.
+        Chunks are written at their offsets as they arrive, so the whole file is never held in RAM.
+
+        Args:
+            filepath (str): The final path of the file in the record folder.
+            tmpFolderPath (str): The folder of the preallocated file.
+            channelCount (int): The number of channels.
+            sampleWidth (int): The sample width in byte.
+            samplingRate (int): The sampling rate.
+            dataSizeInByte (int): The expected size of the PCM data.
+        """
+        self.filepath = filepath
+        self.tmpFilepath = f"{tmpFolderPath}/{os.path.basename(filepath)}.part"
+        self.channelCount = channelCount
+        self.sampleWidth = sampleWidth
+        self.samplingRate = samplingRate
+        self.dataSizeInByte = dataSizeInByte
+        self.writtenSizeInByte = 0 # the end of the written data
+
+        fileSize = WAV_HEADER_SIZE + dataSizeInByte
+        self.fd = os.open(self.tmpFilepath, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        if hasattr(os, 'posix_fallocate'):
+            # reserve the blocks now, so we will not run out of space in the middle of a file
+            os.posix_fallocate(self.fd, 0, fileSize)
+        else:
+            os.ftruncate(self.fd, fileSize)
+        self.mmap = mmap.mmap(self.fd, fileSize)
+        self.mmap[0:WAV_HEADER_SIZE] = createWavHeader(channelCount, sampleWidth, samplingRate, dataSizeInByte)
+
+    def write(self, offset, data):
+        """
+        Write a chunk at its offset in the data section, the kernel writes the dirty pages back in the background
+
+        Args:
+            offset (int): The offset of the chunk in the data section.
+            data (bytes): The chunk.
+        """
+        start = WAV_HEADER_SIZE + offset
+        self.mmap[start:start + len(data)] = data
+        self.writtenSizeInByte = max(self.writtenSizeInByte, offset + len(data))
+        # no msync here: the caller is the assembler thread, a synchronous flush would block it on the disk (SD card)
+
+    def close(self):
+        """ Fix up the header with the written size, flush and close the file (called by a writer thread) """
+        if self.writtenSizeInByte != self.dataSizeInByte:
+            self.mmap[0:WAV_HEADER_SIZE] = createWavHeader(self.channelCount, self.sampleWidth, self.samplingRate, self.writtenSizeInByte)
+        self.mmap.flush()
+        self.mmap.close()
+        if self.writtenSizeInByte != self.dataSizeInByte:
+            os.ftruncate(self.fd, WAV_HEADER_SIZE + self.writtenSizeInByte)
+        os.close(self.fd)
+
+    def abort(self):
+        """ Close and remove the preallocated file """
+        self.mmap.close()
+        os.close(self.fd)
+        os.remove(self.tmpFilepath)
+
+class MaintletWriteJob:
+    def __init__(self, seq, filepath, dataBuffer, channelCount, sampleWidth, samplingRate, streamingFile=None, context=None, summary=None):
+        """
+        A file to be written by the writer service
+
+        Args:
+            seq (int): The capture order of the file.
+            filepath (str): The final path of the file in the record folder.
+            dataBuffer (bytearray): The PCM data, None for a streaming file.
+            channelCount (int): The number of channels.
+            sampleWidth (int): The sample width in byte.
+            samplingRate (int): The sampling rate.
+            streamingFile (MaintletStreamingWavFile, optional): The streaming file which already holds the data. Defaults to None.
+            context (any, optional): An object of the caller passed back to onPrepare and onFinish. Defaults to None.
+            summary (MaintletFileSummary, optional): The summary saved next to the file. Defaults to None.
+        """
+        self.seq = seq
+        self.filepath = filepath
+        self.dataBuffer = dataBuffer
+        self.channelCount = channelCount
+        self.sampleWidth = sampleWidth
+        self.samplingRate = samplingRate
+        self.streamingFile = streamingFile
+        self.context = context
+        self.summary = summary
+        self.isSummaryWritten = False
+        self.sizeInByte = len(dataBuffer) if streamingFile == None else streamingFile.writtenSizeInByte
+        self.submitTime = time.time()
+        self.isCommitted = False
+
+    def getCommitEvent(self):
+        """
+        Get the payload of the 'fileCommitted' event of the job
+
+        Returns:
+            dict: filepath, sizeInByte (the whole file), channelCount, sampleWidth, samplingRate, summaryFilepath ('' if none), seq.
+        """
+        event = {}
+        event['filepath'] = self.filepath
+        event['sizeInByte'] = WAV_HEADER_SIZE + self.sizeInByte
+        event['channelCount'] = self.channelCount
+        event['sampleWidth'] = self.sampleWidth
+        event['samplingRate'] = self.samplingRate
+        event['summaryFilepath'] = getSummaryFilepath(self.filepath) if self.isSummaryWritten else ''
+        event['seq'] = self.seq
+        return event
+
+class MaintletRecordWriter:
+    def __init__(self, tmpFolderPath, workerCount=1, queueSize=4, onPrepare=None, onFinish=None, commitQ=None):
+        """
+        Init the writer service
+
+        Args:
+            tmpFolderPath (str): Files are written here first and then moved to their final path.
+            workerCount (int, optional): The number of writer threads. Defaults to 1.
+            queueSize (int, optional): The maximum number of queued files. Defaults to 4.
+            onPrepare (func, optional): Called with the job before writing. Defaults to None.
+            onFinish (func, optional): Called with the job after it is committed or failed. Defaults to None.
+            commitQ (queue.Queue, optional): Receives a 'fileCommitted' event for each committed file. Defaults to None.
+        """
+        self.tmpFolderPath = tmpFolderPath
+        self.workerCount = max(int(workerCount), 1)
+        self.queueSize = max(int(queueSize), 1)
+        self.onPrepare = onPrepare
+        self.onFinish = onFinish
+        self.commitQ = commitQ
+        self.jobQ = queue.Queue(maxsize=self.queueSize)
+        self.workers = []
+
+        # capture order
+        self.nextSubmitSeq = 0
+        self.nextCommitSeq = 0
+        self.commitCondition = threading.Condition()
+
+        # statistics
+        self.statLock = threading.Lock()
+        self.inFlightBytes = 0
+        self.inFlightFiles = 0
+        self.totalWrittenFile = 0
+        self.totalFailedFile = 0
+        self.totalRejectedFile = 0
+        self.lastWriteLatency = 0
+        self.maxWriteLatency = 0
+        self.totalWriteLatency = 0
+
+    def start(self):
+        """ Start writer threads """
+        for i in range(self.workerCount):
+            thread = threading.Thread(target=self.workerLoop, daemon=True)
+            thread.name = f"recordWriter{i}"
+            thread.start()
+            self.workers.append(thread)
+
+    def stop(self):
+        """ Write all queued files and stop writer threads """
+        for i in range(len(self.workers)):
+            self.jobQ.put(None)
+        for thread in self.workers:
+            thread.join()
+        self.workers = []
+
+    def submit(self, filepath, dataBuffer, channelCount, sampleWidth, samplingRate, context=None, summary=None):
+        """
+        Queue a file for writing. It never blocks the caller.
+
+        Returns:
+            bool: False if the queue is full and the file is rejected.
+        """
+        # only the file assembler submits jobs, so the sequence number does not need a lock
+        job = MaintletWriteJob(self.nextSubmitSeq, filepath, dataBuffer, channelCount, sampleWidth, samplingRate, context=context, summary=summary)
+        return self.submitJob(job)
+
+    def submitStream(self, streamingFile, context=None, summary=None):
+        """
+        Queue a streaming file for the header fix-up and the commit. It never blocks the caller.
+
+        Returns:
+            bool: False if the queue is full and the file is rejected.
+        """
+        job = MaintletWriteJob(self.nextSubmitSeq, streamingFile.filepath, None, streamingFile.channelCount,
+                               streamingFile.sampleWidth, streamingFile.samplingRate, streamingFile=streamingFile, context=context, summary=summary)
+        return self.submitJob(job)
+
+    def submitJob(self, job):
+        """ Put a job to the bounded queue """
+        filepath = job.filepath
+        try:
+            self.jobQ.put_nowait(job)
+        except queue.Full:
+            self.totalRejectedFile += 1
+            logger.warning(f"RecordWriter queue is full, reject {filepath} (total rejected: {self.totalRejectedFile})")
+            return False
+        self.nextSubmitSeq += 1
+        with self.statLock:
+            self.inFlightBytes += job.sizeInByte
+            self.inFlightFiles += 1
+        return True
+
+    def workerLoop(self):
+        """ The thread routine of a writer thread """
+        while True:
+            job = self.jobQ.get()
+            if job is None:
+                break
+            self.handleJob(job)
+
+    def handleJob(self, job):
+        """ Prepare, write and commit one file """
+        tmpFilepath = f"{self.tmpFolderPath}/{os.path.basename(job.filepath)}.part"
+        isWritten = False
+        try:
+            if self.onPrepare != None:
+                self.onPrepare(job)
+            with timer.getTime(f"<Save wave file>_<{os.path.basename(__file__)}:#x_#x>") as mt:
+                if job.streamingFile != None:
+                    job.streamingFile.close()
+                else:
+                    self.writeWav(job, tmpFilepath)
+            isWritten = True
+            if job.summary != None:
+                self.writeSummary(job)
+        except Exception as e:
+            logger.error(f"RecordWriter fails to write {job.filepath}: {e}")
+        finally:
+            self.commit(job, tmpFilepath, isWritten)
+            self.updateStatistics(job)
+            if self.onFinish != None:
+                self.onFinish(job)
+
+    def writeWav(self, job, filepath):
+        """ Write the PCM data of a job to a WAV file """
+        wf = wave.open(filepath, 'wb')
+        wf.setnchannels(job.channelCount)
+        wf.setsampwidth(job.sampleWidth)
+        wf.setframerate(job.samplingRate)
+        wf.writeframes(job.dataBuffer)
+        wf.close()
+
+    def moveToRecordFolder(self, tmpFilepath, filepath, retryCount=3):
+        """
+        Move a written file to its final path, the shard of the record folder (e.g., records/YYYY/MM/DD/HH) is created
+        by its first file. The eviction removes empty shards, so the shard is created again if it is removed in between.
+        """
+        for i in range(retryCount):
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            try:
+                os.replace(tmpFilepath, filepath)
+                return
+            except FileNotFoundError:
+                if i == retryCount - 1 or not os.path.exists(tmpFilepath):
+                    raise
+
+    def writeSummary(self, job):
+        """ Save the summary sidecar of a job to the tmp folder, the file is kept without it if this fails """
+        try:
+            job.summary.save(self.getTmpSummaryFilepath(job))
+            job.isSummaryWritten = True
+        except Exception as e:
+            logger.error(f"RecordWriter fails to write the summary of {job.filepath}: {e}")
+
+    def getTmpSummaryFilepath(self, job):
+        """ Get the path of the summary sidecar of a job in the tmp folder """
+        return f"{self.tmpFolderPath}/{os.path.basename(getSummaryFilepath(job.filepath))}.part"
+
+    def commit(self, job, tmpFilepath, isWritten):
+        """ Move the file to its final path after all earlier files are committed """
+        with self.commitCondition:
+            while self.nextCommitSeq != job.seq:
+                self.commitCondition.wait()
+            try:
+                if isWritten:
+                    # the sidecar is in place when the file appears in the record folder
+                    if job.isSummaryWritten:
+                        self.moveToRecordFolder(self.getTmpSummaryFilepath(job), getSummaryFilepath(job.filepath))
+                    self.moveToRecordFolder(tmpFilepath, job.filepath)
+                    job.isCommitted = True
+                    if self.commitQ != None:
+                        # published under the commit order, consumers get the files in capture order
+                        self.commitQ.put(MaintletMessage('fileCommitted', job.getCommitEvent()))
+            except OSError as e:
+                logger.error(f"RecordWriter fails to commit {job.filepath}: {e}")
+            finally:
+                self.nextCommitSeq += 1
+                self.commitCondition.notify_all()
+
+    def updateStatistics(self, job):
+        """ Update in-flight bytes and write latency """
+        latency = time.time() - job.submitTime
+        with self.statLock:
+            self.inFlightBytes -= job.sizeInByte
+            self.inFlightFiles -= 1
+            if job.isCommitted:
+                self.totalWrittenFile += 1
+                self.lastWriteLatency = latency
+                self.maxWriteLatency = max(self.maxWriteLatency, latency)
+                self.totalWriteLatency += latency
+            else:
+                self.totalFailedFile += 1
+
+    def getQueueDepth(self):
+        """ Get the number of files waiting in the queue """
+        return self.jobQ.qsize()
+
+    def getStatus(self):
+        """
+        Get statistics of the writer service
+
+        Returns:
+            dict: statistics
+        """
+        with self.statLock:
+            status = {}
+            status['queueDepth'] = self.getQueueDepth()
+            status['inFlightFiles'] = self.inFlightFiles
+            status['inFlightBytes'] = self.inFlightBytes
+            status['totalWrittenFile'] = self.totalWrittenFile
+            status['totalFailedFile'] = self.totalFailedFile
+            status['totalRejectedFile'] = self.totalRejectedFile
+            status['lastWriteLatency'] = round(self.lastWriteLatency, 5)
+            status['maxWriteLatency'] = round(self.maxWriteLatency, 5)
+            status['meanWriteLatency'] = round(self.totalWriteLatency / self.totalWrittenFile, 5) if self.totalWrittenFile > 0 else 0
+        return status
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    from MaintletConfig import pathNameConfig
+    def onFinish(job):
+        print(f"{job.seq} {job.filepath} committed: {job.isCommitted}")
+    writer = MaintletRecordWriter(pathNameConfig['tmpFolderPath'], workerCount=3, queueSize=8, onFinish=onFinish)
+    writer.start()
+    for i in range(8):
+        # files with different sizes finish in a different order, but they are committed in capture order
+        dataBuffer = bytearray(48000 * 2 * 8 * (8 - i))
+        writer.submit(f"{pathNameConfig['recordFolderPath']}/test{i}.wav", dataBuffer, 8, 2, 48000)
+    print(writer.getStatus())
+
+    # streaming file, the last chunk is missing, so the header is fixed up
+    streamingFile = MaintletStreamingWavFile(f"{pathNameConfig['recordFolderPath']}/testStream.wav", pathNameConfig['tmpFolderPath'], 8, 2, 48000, 10 * 76800)
+    for i in range(9):
+        streamingFile.write(i * 76800, bytes([i]) * 76800)
+    writer.submitStream(streamingFile)
+    writer.stop()
+    print(writer.getStatus())
+    wf = wave.open(f"{pathNameConfig['recordFolderPath']}/testStream.wav")
+    print(wf.getnchannels(), wf.getsampwidth(), wf.getframerate(), wf.getnframes())
+    wf.close()
+#============================= END OF TEST CODE ==============================
@@ -0,0 +1,133 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  Retention policies of the record files
+#                        (1) a recording enters the storage catalog with its timestamp as retention key, files are evicted
+#                            in key order when the disk is full
+#                        (2) when the data analysis labels a recording, each policy can move its key: a later key keeps it longer,
+#                            an earlier key evicts it first
+#                        (3) a policy can also expire the recordings whose key is older than a limit, even if the disk is not full
+#                        (4) a new policy implements onLabel and/or getExpiryKey of MaintletRetentionPolicy
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   policies = getRetentionPolicies(experimentConfig)  # from maxFileAge, anomalyRetention, stableThinning, stableEarlyEviction
+#   key = applyLabel(policies, key, label)              # label of the data analysis: 1 anomalous, 0 normal
+#   maxKey = getExpiryKey(policies, time.time())        # evict every recording with a smaller key, None if nothing expires
+#==========================================================================
+
+SECONDS_PER_DAY = 86400
+
+class MaintletRetentionPolicy:
+    """ A policy which keeps every recording at its timestamp """
+    def onLabel(self, key, label):
+        """
+        Move the retention key of a recording labelled by the data analysis
+
+        Args:
+            key (float): The current key of the recording.
+            label (int): 1 anomalous, 0 normal.
+
+        Returns:
+            float: The new key.
+        """
+        return key
+
+    def getExpiryKey(self, now):
+        """ Get the key below which recordings expire, None if this policy never expires them """
+        return None
+
+class MaintletAnomalyRetention(MaintletRetentionPolicy):
+    def __init__(self, extraRetention):
+        """
+        Keep anomalous recordings longer
+
+        Args:
+            extraRetention (float): Seconds added to the key of an anomalous recording.
+        """
+        self.extraRetention = extraRetention
+
+    def onLabel(self, key, label):
+        return key + self.extraRetention if label == 1 else key
+
+class MaintletStableThinning(MaintletRetentionPolicy):
+    def __init__(self, keepEvery, earlyEviction):
+        """
+        Thin out stable periods: in a run of normal recordings, only every Nth one keeps its key
+
+        Args:
+            keepEvery (int): N, the first recording of the run and every Nth after it are kept.
+            earlyEviction (float): Seconds removed from the key of the other recordings of the run.
+        """
+        self.keepEvery = max(int(keepEvery), 1)
+        self.earlyEviction = earlyEviction
+        self.runLength = 0 # normal recordings since the last anomalous one
+
+    def onLabel(self, key, label):
+        if label != 0:
+            self.runLength = 0
+            return key
+        self.runLength += 1
+        if (self.runLength - 1) % self.keepEvery == 0:
+            return key
+        return key - self.earlyEviction
+
+class MaintletMaxAge(MaintletRetentionPolicy):
+    def __init__(self, maxAge):
+        """
+        Expire old recordings
+
+        Args:
+            maxAge (float): Seconds a recording is kept after its key.
+        """
+        self.maxAge = maxAge
+
+    def getExpiryKey(self, now):
+        return now - self.maxAge
+
+def getRetentionPolicies(experimentConfig):
+    """
+    Build the retention policies of the configuration
+
+    Args:
+        experimentConfig (dict): maxFileAge, anomalyRetention and stableEarlyEviction in day, stableThinning.
+
+    Returns:
+        list: MaintletRetentionPolicy, the policies which are disabled (0, or 1 for stableThinning) are not included.
+    """
+    policies = []
+    if experimentConfig.get("anomalyRetention", 0) > 0:
+        policies.append(MaintletAnomalyRetention(experimentConfig["anomalyRetention"] * SECONDS_PER_DAY))
+    if experimentConfig.get("stableThinning", 1) > 1:
+        policies.append(MaintletStableThinning(experimentConfig["stableThinning"], experimentConfig["stableEarlyEviction"] * SECONDS_PER_DAY))
+    if experimentConfig.get("maxFileAge", 0) > 0:
+        policies.append(MaintletMaxAge(experimentConfig["maxFileAge"] * SECONDS_PER_DAY))
+    return policies
+
+def applyLabel(policies, key, label):
+    """ Move a key with every policy in order """
+    for policy in policies:
+        key = policy.onLabel(key, label)
+    return key
+
+def getExpiryKey(policies, now):
+    """ Get the strictest expiry key of the policies, None if no policy expires recordings """
+    maxKeys = [e for e in (policy.getExpiryKey(now) for policy in policies) if e != None]
+    return max(maxKeys) if len(maxKeys) > 0 else None
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    config = {"maxFileAge": 30, "anomalyRetention": 7, "stableThinning": 3, "stableEarlyEviction": 1}
+    policies = getRetentionPolicies(config)
+    print([type(policy).__name__ for policy in policies])
+    labels = [0, 0, 0, 0, 1, 0, 0]
+    # keys in day: normal runs keep every 3rd one, the anomalous one is kept 7 days longer
+    print([(applyLabel(policies, i * SECONDS_PER_DAY, label) / SECONDS_PER_DAY) for i, label in enumerate(labels)])
+    print(getExpiryKey(policies, now=40 * SECONDS_PER_DAY) / SECONDS_PER_DAY, getExpiryKey([], now=0))
+#============================= END OF TEST CODE ==============================
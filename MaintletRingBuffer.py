@@ -0,0 +1,398 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  A preallocated multi-slot ring buffer for captured audio chunks
+#                        (1) the producer (record callback) only copies a chunk into the next slot and advances the write index
+#                        (2) consumers (file assembler, feature extraction, ...) read slots with their own read index
+#                        (3) optionally, the ring lives in shared memory and other processes read windows of consecutive slots
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   1. Create a ring buffer with a fixed number of slots of a fixed size
+#       ringBuffer = MaintletRingBuffer(slotCount=50, slotSizeInByte=76800)
+#   2. Register a reader for each consumer (before the producer starts)
+#       reader = ringBuffer.registerReader("recordAssembler")
+#   3. Producer (record callback)
+#       ringBuffer.write(in_data, adcTime, status)
+#   4. Consumer thread
+#       seq = reader.next(timeout=0.5)   # None if no new slot arrives in time
+#       data = reader.getSlot(seq)       # a memoryview of the slot, copy it before using it later
+#       if not reader.isValid(seq): the slot was overwritten while we were copying it
+#
+#   The producer never waits for consumers. If a consumer falls behind by more than
+#   the capacity of the ring, the producer overwrites the oldest slots and both sides
+#   count the overrun (back-pressure accounting).
+#
+#   5. Windows of consecutive slots (e.g., overlapping analysis windows) without copying
+#       ringBuffer = MaintletRingBuffer(slotCount=50, slotSizeInByte=76800, mirrorSlotCount=9, shared=True)
+#       ringBuffer.getWindow(seq, chunkCount=10)     # a contiguous memoryview of slots seq ... seq + 9
+#       In another process
+#       view = MaintletSharedRingBufferView(ringBuffer.getSharedDescriptor())
+#       window = view.getWindow(seq, chunkCount=10)
+#       if not view.isValid(seq): the window was overwritten while we were reading it
+#       ringBuffer.close()                           # the owner frees the shared memory
+#
+#   The first mirrorSlotCount slots are also written after the last slot, so a window of up to
+#   mirrorSlotCount + 1 slots is contiguous even when it wraps around the end of the ring.
+#==========================================================================
+
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+from MaintletLog import logger
+
+class MaintletRingBuffer:
+    def __init__(self, slotCount, slotSizeInByte, mirrorSlotCount=0, shared=False):
+        """
+        Init a ring buffer. All memory is allocated here, nothing is allocated in write().
+
+        Args:
+            slotCount (int): The number of slots in the ring.
+            slotSizeInByte (int): The size of each slot (one callback chunk).
+            mirrorSlotCount (int, optional): The number of slots copied after the last slot, a window of up to
+                                             mirrorSlotCount + 1 slots is contiguous. Defaults to 0.
+            shared (bool, optional): Allocate the ring in shared memory for other processes. Defaults to False.
+        """
+        self.slotCount = int(slotCount)
+        self.slotSizeInByte = int(slotSizeInByte)
+        self.mirrorSlotCount = min(int(mirrorSlotCount), self.slotCount - 1)
+        dataSizeInByte = (self.slotCount + self.mirrorSlotCount) * self.slotSizeInByte
+        self.sharedMemory = None
+        if shared:
+            # header: the write index and the ADC time of each slot (read by other processes), then the slots
+            self.sharedMemory = shared_memory.SharedMemory(create=True, size=getSharedRingBufferSize(self.slotCount, dataSizeInByte))
+            self.buffer = self.sharedMemory.buf
+            self.sharedWriteIndex, self.sharedAdcTime, self.bufferView = mapSharedRingBuffer(self.sharedMemory.buf, self.slotCount, dataSizeInByte)
+        else:
+            self.buffer = bytearray(dataSizeInByte)
+            self.bufferView = memoryview(self.buffer)
+        # per slot metadata
+        self.slotAdcTime = [0.0] * self.slotCount
+        self.slotStatus = [0] * self.slotCount
+        self.slotLength = [0] * self.slotCount
+        # sequence number of the next slot to be written, it never wraps
+        self.writeIndex = 0
+        self.readers = []
+        # back-pressure accounting on the producer side
+        self.totalOverrun = 0 # number of slots overwritten before a reader consumed them (summed over readers)
+
+    def registerReader(self, name):
+        """
+        Register a consumer. The reader starts from the current write index.
+
+        Args:
+            name (str): The name of the consumer (for logging).
+
+        Returns:
+            MaintletRingBufferReader: The reader object.
+        """
+        reader = MaintletRingBufferReader(self, name)
+        self.readers.append(reader)
+        return reader
+
+    def unregisterReader(self, reader):
+        """ Remove a consumer from the ring buffer """
+        if reader in self.readers:
+            self.readers.remove(reader)
+
+    def write(self, data, adcTime, status):
+        """
+        Copy one chunk into the next slot and advance the write index (producer side)
+
+        Args:
+            data (bytes): The chunk from the record callback.
+            adcTime (float): The input_buffer_adc_time of the chunk.
+            status (int): The status flag of the record callback.
+
+        Returns:
+            int: The sequence number of the written slot.
+        """
+        seq = self.writeIndex
+        slot = seq % self.slotCount
+        start = slot * self.slotSizeInByte
+        length = len(data)
+        self.bufferView[start:start + length] = data
+        if slot < self.mirrorSlotCount:
+            mirrorStart = (self.slotCount + slot) * self.slotSizeInByte
+            self.bufferView[mirrorStart:mirrorStart + length] = data
+        self.slotAdcTime[slot] = adcTime
+        self.slotStatus[slot] = status
+        self.slotLength[slot] = length
+        # publish the slot
+        if self.sharedMemory != None:
+            self.sharedAdcTime[slot] = adcTime
+            self.sharedWriteIndex[0] = seq + 1
+        self.writeIndex = seq + 1
+        for reader in self.readers:
+            if seq - reader.readIndex >= self.slotCount:
+                self.totalOverrun += 1
+            reader.dataReady.set()
+        return seq
+
+    def getSlot(self, seq):
+        """ Get a memoryview of the data of a slot given its sequence number """
+        slot = seq % self.slotCount
+        start = slot * self.slotSizeInByte
+        return self.bufferView[start:start + self.slotLength[slot]]
+
+    def getWindow(self, seq, chunkCount):
+        """
+        Get a contiguous memoryview of chunkCount consecutive full slots starting at seq
+
+        Args:
+            seq (int): The sequence number of the first slot.
+            chunkCount (int): The number of slots, at most mirrorSlotCount + 1.
+
+        Returns:
+            memoryview: The data of the slots.
+        """
+        return getRingBufferWindow(self.bufferView, self.slotCount, self.slotSizeInByte, self.mirrorSlotCount, seq, chunkCount)
+
+    def getSharedDescriptor(self):
+        """
+        Get what another process needs to attach to the shared ring buffer
+
+        Returns:
+            dict: name, slotCount, slotSizeInByte and mirrorSlotCount, None if the ring is not shared
+        """
+        if self.sharedMemory == None:
+            return None
+        return {'name': self.sharedMemory.name, 'slotCount': self.slotCount,
+                'slotSizeInByte': self.slotSizeInByte, 'mirrorSlotCount': self.mirrorSlotCount}
+
+    def close(self):
+        """ Free the shared memory (owner side), the ring buffer cannot be used afterwards """
+        if self.sharedMemory == None:
+            return
+        self.sharedWriteIndex = self.sharedAdcTime = self.bufferView = self.buffer = None
+        try:
+            self.sharedMemory.close()
+        except BufferError:
+            # a consumer still holds a view of a slot, the memory is released when the view is gone
+            pass
+        try:
+            self.sharedMemory.unlink()
+        except FileNotFoundError:
+            pass
+        self.sharedMemory = None
+
+    def getSlotAdcTime(self, seq):
+        """ Get the ADC time of a slot given its sequence number """
+        return self.slotAdcTime[seq % self.slotCount]
+
+    def getSlotStatus(self, seq):
+        """ Get the callback status of a slot given its sequence number """
+        return self.slotStatus[seq % self.slotCount]
+
+    def isValid(self, seq):
+        """
+        Check if a slot still holds the data of the given sequence number.
+        The slot of seq is overwritten when the producer starts writing seq + slotCount.
+        """
+        return seq < self.writeIndex and self.writeIndex - seq < self.slotCount
+
+    def getStatus(self):
+        """
+        Get the back-pressure statistics of the ring buffer and all readers
+
+        Returns:
+            dict: statistics
+        """
+        status = {}
+        status['writeIndex'] = self.writeIndex
+        status['totalOverrun'] = self.totalOverrun
+        for reader in self.readers:
+            status[reader.name] = reader.getStatus()
+        return status
+
+
+class MaintletSharedRingBufferView:
+    def __init__(self, descriptor):
+        """
+        Attach to a shared ring buffer created by another process (read only)
+
+        Args:
+            descriptor (dict): MaintletRingBuffer.getSharedDescriptor() of the owner.
+        """
+        self.name = descriptor['name']
+        self.slotCount = descriptor['slotCount']
+        self.slotSizeInByte = descriptor['slotSizeInByte']
+        self.mirrorSlotCount = descriptor['mirrorSlotCount']
+        try:
+            # the owner frees the memory, the resource tracker of this process must not unlink it (Python >= 3.13)
+            self.sharedMemory = shared_memory.SharedMemory(name=self.name, track=False)
+        except TypeError:
+            # older Python: a forked process shares the resource tracker of the owner, registering the name again is a no-op
+            self.sharedMemory = shared_memory.SharedMemory(name=self.name)
+        dataSizeInByte = (self.slotCount + self.mirrorSlotCount) * self.slotSizeInByte
+        self.sharedWriteIndex, self.sharedAdcTime, self.bufferView = mapSharedRingBuffer(self.sharedMemory.buf, self.slotCount, dataSizeInByte)
+
+    def getWindow(self, seq, chunkCount):
+        """ Get a contiguous memoryview of chunkCount consecutive slots starting at seq, see MaintletRingBuffer.getWindow """
+        return getRingBufferWindow(self.bufferView, self.slotCount, self.slotSizeInByte, self.mirrorSlotCount, seq, chunkCount)
+
+    def getSlotAdcTime(self, seq):
+        """ Get the ADC time of a slot given its sequence number """
+        return float(self.sharedAdcTime[seq % self.slotCount])
+
+    def isValid(self, seq):
+        """ Check if the slot of seq (and all later written slots) has not been overwritten, call it after copying the data out """
+        writeIndex = int(self.sharedWriteIndex[0])
+        return seq < writeIndex and writeIndex - seq < self.slotCount
+
+    def close(self):
+        """ Detach from the shared memory """
+        self.sharedWriteIndex = self.sharedAdcTime = self.bufferView = None
+        try:
+            self.sharedMemory.close()
+        except BufferError:
+            pass
+
+
+def getSharedRingBufferSize(slotCount, dataSizeInByte):
+    """ Get the size of a shared ring buffer: write index, ADC time of each slot, slots """
+    return 8 + 8 * slotCount + dataSizeInByte
+
+def mapSharedRingBuffer(buf, slotCount, dataSizeInByte):
+    """
+    Map the header and the slots of a shared ring buffer
+
+    Returns:
+        tuple: (writeIndex (int64 array of 1), adcTime (float64 array of slotCount), memoryview of the slots)
+    """
+    writeIndex = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=0)
+    adcTime = np.ndarray((slotCount,), dtype=np.float64, buffer=buf, offset=8)
+    dataStart = 8 + 8 * slotCount
+    return writeIndex, adcTime, buf[dataStart:dataStart + dataSizeInByte]
+
+def getRingBufferWindow(bufferView, slotCount, slotSizeInByte, mirrorSlotCount, seq, chunkCount):
+    """ Get a contiguous memoryview of chunkCount consecutive slots starting at seq (the first slots are mirrored after the last slot) """
+    if chunkCount > mirrorSlotCount + 1:
+        raise ValueError(f"A window of {chunkCount} slots needs at least {chunkCount - 1} mirror slots, the ring has {mirrorSlotCount}")
+    start = (seq % slotCount) * slotSizeInByte
+    return bufferView[start:start + chunkCount * slotSizeInByte]
+
+
+class MaintletRingBufferReader:
+    def __init__(self, ringBuffer, name):
+        """
+        Init a reader (consumer) of a ring buffer
+
+        Args:
+            ringBuffer (MaintletRingBuffer): The ring buffer.
+            name (str): The name of the consumer.
+        """
+        self.ringBuffer = ringBuffer
+        self.name = name
+        self.readIndex = ringBuffer.writeIndex # sequence number of the next slot to be read
+        self.dataReady = threading.Event()
+        # back-pressure accounting on the consumer side
+        self.totalLostSlot = 0 # slots overwritten before this reader reached them
+        self.maxLag = 0 # the maximum number of unread slots we have seen
+
+    def next(self, timeout=None):
+        """
+        Wait for the next slot
+
+        Args:
+            timeout (float, optional): Maximum waiting time in seconds. Defaults to None (wait forever).
+
+        Returns:
+            int: The sequence number of the next slot, None if timeout.
+        """
+        ringBuffer = self.ringBuffer
+        while self.readIndex >= ringBuffer.writeIndex:
+            self.dataReady.clear()
+            # check again, the producer might publish a slot before we clear the event
+            if self.readIndex < ringBuffer.writeIndex:
+                break
+            if not self.dataReady.wait(timeout):
+                return None
+
+        lag = ringBuffer.writeIndex - self.readIndex
+        if lag > self.maxLag:
+            self.maxLag = lag
+        # the producer has overwritten slots we have not read, skip to the oldest valid slot
+        if lag >= ringBuffer.slotCount:
+            lost = lag - ringBuffer.slotCount + 1
+            self.totalLostSlot += lost
+            self.readIndex += lost
+            logger.warning(f"RingBuffer reader {self.name} falls behind, {lost} slots are lost (total: {self.totalLostSlot})")
+
+        seq = self.readIndex
+        self.readIndex += 1
+        return seq
+
+    def getSlot(self, seq):
+        """ Get a memoryview of the data of a slot given its sequence number """
+        return self.ringBuffer.getSlot(seq)
+
+    def isValid(self, seq):
+        """ Check if the slot has not been overwritten, call it after copying the data out """
+        return self.ringBuffer.isValid(seq)
+
+    def getLag(self):
+        """ Get the number of unread slots """
+        return self.ringBuffer.writeIndex - self.readIndex
+
+    def getStatus(self):
+        """
+        Get the back-pressure statistics of this reader
+
+        Returns:
+            dict: statistics
+        """
+        status = {}
+        status['readIndex'] = self.readIndex
+        status['lag'] = self.getLag()
+        status['maxLag'] = self.maxLag
+        status['totalLostSlot'] = self.totalLostSlot
+        return status
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    import time
+    ringBuffer = MaintletRingBuffer(slotCount=4, slotSizeInByte=8)
+    reader = ringBuffer.registerReader("test")
+
+    # normal case
+    for i in range(3):
+        ringBuffer.write(bytes([i]) * 8, adcTime=i * 0.1, status=0)
+    for i in range(3):
+        seq = reader.next(timeout=0.1)
+        print(seq, bytes(reader.getSlot(seq)), ringBuffer.getSlotAdcTime(seq), reader.isValid(seq))
+    print(reader.next(timeout=0.1)) # None
+
+    # slow consumer
+    for i in range(10):
+        ringBuffer.write(bytes([i]) * 8, adcTime=i * 0.1, status=0)
+    seq = reader.next(timeout=0.1)
+    print(seq, bytes(reader.getSlot(seq)), reader.isValid(seq))
+    print(ringBuffer.getStatus())
+
+    # producer thread
+    def produce():
+        for i in range(100):
+            ringBuffer.write(bytes([i % 256]) * 8, adcTime=i * 0.1, status=0)
+            time.sleep(0.001)
+    threading.Thread(target=produce).start()
+    count = 0
+    while reader.next(timeout=0.5) is not None:
+        count += 1
+    print(count, ringBuffer.getStatus())
+
+    # windows across the end of a shared ring
+    ringBuffer = MaintletRingBuffer(slotCount=5, slotSizeInByte=2, mirrorSlotCount=2, shared=True)
+    view = MaintletSharedRingBufferView(ringBuffer.getSharedDescriptor())
+    for i in range(7):
+        ringBuffer.write(bytes([i]) * 2, adcTime=i * 0.1, status=0)
+    print(bytes(view.getWindow(4, 3)), view.getSlotAdcTime(4), view.isValid(4), view.isValid(1))
+    view.close()
+    ringBuffer.close()
+#============================= END OF TEST CODE ==============================
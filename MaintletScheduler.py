@@ -0,0 +1,162 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  Adaptive duty cycle of the interval record mode
+#                        (1) the data analysis reports the anomaly score and label of each analysed file
+#                        (2) the record interval is halved (down to continuous capture) when the scores trend up or a safezone is left
+#                        (3) the record interval is doubled after a long stable period
+#                        (4) the interval is never shortened (and is lengthened) while the CPU, thermal or disk budget is exceeded
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   scheduler = MaintletDutyCycleScheduler(initialInterval=2, minInterval=0, maxInterval=60, stableCount=10,
+#                                          trendWindow=10, trendThreshold=0.01,
+#                                          maxCpuLoad=0.8, maxCpuTemperature=75, minFreeDiskSpace=1024)
+#   newInterval = scheduler.update(anomalyScore, label, cpuTemperature, freeDiskSpace) # None: no change
+#
+#   The data collection module applies newInterval without reopening the record stream
+#==========================================================================
+
+import os
+import numpy as np
+from MaintletLog import logger
+
+class MaintletDutyCycleScheduler:
+    def __init__(self, initialInterval, minInterval, maxInterval, stableCount, trendWindow, trendThreshold,
+                 maxCpuLoad, maxCpuTemperature, minFreeDiskSpace):
+        """
+        Init the scheduler
+
+        Args:
+            initialInterval (int): The record interval at start in second.
+            minInterval (int): The shortest record interval in second, 0 is continuous capture.
+            maxInterval (int): The longest record interval in second.
+            stableCount (int): The number of consecutive normal results before the interval is lengthened.
+            trendWindow (int): The number of anomaly scores used to estimate the trend.
+            trendThreshold (float): The scores trend up if the slope per result is above trendThreshold * mean score.
+            maxCpuLoad (float): The CPU budget, 1-minute load average per core.
+            maxCpuTemperature (float): The thermal budget in Celsius.
+            minFreeDiskSpace (float): The disk budget in MB.
+        """
+        self.interval = int(initialInterval)
+        self.minInterval = int(minInterval)
+        self.maxInterval = int(maxInterval)
+        self.stableCount = int(stableCount)
+        self.trendWindow = max(int(trendWindow), 2)
+        self.trendThreshold = float(trendThreshold)
+        self.maxCpuLoad = float(maxCpuLoad)
+        self.maxCpuTemperature = float(maxCpuTemperature)
+        self.minFreeDiskSpace = float(minFreeDiskSpace)
+
+        self.scores = [] # the latest trendWindow anomaly scores
+        self.stableCounter = 0
+        self.totalShorten = 0
+        self.totalLengthen = 0
+
+    def getCpuLoad(self):
+        """ Get the 1-minute load average per core """
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+
+    def isOverBudget(self, cpuTemperature, freeDiskSpace):
+        """
+        Check the CPU, thermal and disk budgets
+
+        Args:
+            cpuTemperature (float): The CPU temperature in Celsius.
+            freeDiskSpace (float): The free disk space in MB.
+
+        Returns:
+            str: The exceeded budget, '' if all budgets are respected.
+        """
+        if self.getCpuLoad() > self.maxCpuLoad:
+            return 'cpu'
+        if cpuTemperature > self.maxCpuTemperature:
+            return 'thermal'
+        if freeDiskSpace < self.minFreeDiskSpace:
+            return 'disk'
+        return ''
+
+    def isTrendingUp(self):
+        """ Check if the latest anomaly scores trend up (least squares slope) """
+        if len(self.scores) < self.trendWindow:
+            return False
+        slope = np.polyfit(np.arange(len(self.scores)), self.scores, 1)[0]
+        return slope > self.trendThreshold * abs(np.mean(self.scores))
+
+    def update(self, anomalyScore, label, cpuTemperature, freeDiskSpace):
+        """
+        Update the record interval with the result of an analysed file
+
+        Args:
+            anomalyScore (float): The anomaly score of the file.
+            label (int): 1 if the file is out of all safezones (abnormal), 0 otherwise.
+            cpuTemperature (float): The CPU temperature in Celsius.
+            freeDiskSpace (float): The free disk space in MB.
+
+        Returns:
+            int: The new record interval in second, None if the interval does not change.
+        """
+        self.scores.append(anomalyScore)
+        del self.scores[:-self.trendWindow]
+
+        budget = self.isOverBudget(cpuTemperature, freeDiskSpace)
+        if budget != '':
+            # back off whatever the analysis says
+            self.stableCounter = 0
+            return self.setInterval(max(self.interval * 2, 1), f"{budget} budget exceeded")
+
+        if label == 1 or self.isTrendingUp():
+            self.stableCounter = 0
+            return self.setInterval(self.interval // 2, "safezone left" if label == 1 else "anomaly score trends up")
+
+        self.stableCounter += 1
+        if self.stableCounter >= self.stableCount:
+            self.stableCounter = 0
+            return self.setInterval(max(self.interval * 2, 1), "stable")
+        return None
+
+    def setInterval(self, interval, reason):
+        """ Clip and apply a new interval, return None if it does not change """
+        interval = min(max(interval, self.minInterval), self.maxInterval)
+        if interval == self.interval:
+            return None
+        if interval < self.interval:
+            self.totalShorten += 1
+        else:
+            self.totalLengthen += 1
+        logger.info(f"DutyCycleScheduler: record interval {self.interval} S -> {interval} S ({reason})")
+        self.interval = interval
+        return interval
+
+    def getStatus(self):
+        """
+        Get the statistics of the scheduler
+
+        Returns:
+            dict: statistics
+        """
+        status = {}
+        status['interval'] = self.interval
+        status['totalShorten'] = self.totalShorten
+        status['totalLengthen'] = self.totalLengthen
+        return status
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    scheduler = MaintletDutyCycleScheduler(initialInterval=2, minInterval=0, maxInterval=16, stableCount=5,
+                                           trendWindow=5, trendThreshold=0.01,
+                                           maxCpuLoad=100, maxCpuTemperature=75, minFreeDiskSpace=0)
+    rng = np.random.default_rng(0)
+    # stable, then a degradation, then stable again
+    scores = list(0.5 + 0.001 * rng.standard_normal(30)) + list(0.5 + 0.02 * np.arange(10)) + list(0.7 + 0.001 * rng.standard_normal(30))
+    for i, score in enumerate(scores):
+        scheduler.update(score, label=0, cpuTemperature=50, freeDiskSpace=1000)
+    print(scheduler.getStatus())
+    print(scheduler.update(0.7, label=0, cpuTemperature=80, freeDiskSpace=1000), "(thermal budget)")
+#============================= END OF TEST CODE ==============================
@@ -1,13 +1,46 @@
 class MaintletSensor:
-    def __init__(self, setting):
+    def __init__(self, setting, name='', channel=0):
         """
         Init a Maintlet sensor
 
         Args:
             setting (dict): a dictionary contains setting of a sensor
                 - If you want to add attribute, please change the ini file and Sensor.py
+            name (str, optional): The key of the sensor in sensorConfig. Defaults to ''.
+            channel (int, optional): The merged channel of the sensor if setting has no 'channel'. Defaults to 0.
         """        
+        self.name = name
         self.type = setting['type']
         self.location = setting['location']
+        self.decimation = int(setting.get('decimation', 1)) # the sensor is saved at samplingRate / decimation
+        self.channel = int(setting.get('channel', channel)) # the captured channel (channels of all input devices are merged)
         if self.type == 'NC':
             self.location = ''
+
+    def __str__(self):
+        """ name:type:location:channel, saved in the database """
+        return f"{self.name}:{self.type}:{self.location}:{self.channel}"
+
+def createSensors(sensorConfig):
+    """
+    Create the sensors of sensorConfig, any number of sensors is supported
+
+    Args:
+        sensorConfig (dict): sensor name -> setting, sensor i is recorded on channel i unless its setting has a 'channel'.
+
+    Returns:
+        list: A list of MaintletSensor.
+    """
+    return [MaintletSensor(setting, name, i) for i, (name, setting) in enumerate(sensorConfig.items())]
+
+def getConnectedChannelIndices(sensors):
+    """
+    Get the channel indices of connected sensors
+
+    Args:
+        sensors (list): A list of MaintletSensor.
+
+    Returns:
+        list: Sorted channels of sensors whose type is not NC.
+    """
+    return sorted(set(sensor.channel for sensor in sensors if sensor.type != 'NC'))
@@ -8,15 +8,25 @@
 #===========================================================================
 
 from MaintletTimer import MaintletTimer
-from MaintletConfig import experimentFolderPath
-from multiprocessing import Queue
+from MaintletConfig import experimentFolderPath, pathNameConfig
+from MaintletManifest import MaintletManifest
+from multiprocessing import Queue, resource_tracker
+import queue
 import time
 #===========================================================================
 #                            SHARED OBJECT #?
 #===========================================================================
 timer = MaintletTimer(record=True, logging=True, experimentFolderPath = experimentFolderPath)
 fileSystemToDataAnalysisQ = Queue()
+dataAnalysisToFileSystemQ = Queue() # file paths the analysis has loaded, so the file system can release raw files
+dataAnalysisToDataCollectionQ = Queue() # analysis results for the adaptive duty cycle
+dataCollectionToDataAnalysisQ = Queue() # analysis window descriptors of the continuous mode
+# the shared record ring buffer (continuous mode) is created after the data analysis process is forked,
+# start the resource tracker now so that all processes share it and only the owner frees the memory
+resource_tracker.ensure_running()
 networkingOutQ = Queue()
+fileCommittedQ = queue.Queue() # 'fileCommitted' events of the record writer (same process), in capture order
+manifest = MaintletManifest(pathNameConfig['manifestPath']) # journal of the recording lifecycle
 #============================= END OF SHARED OBJECT ==============================
 
 #===========================================================================
@@ -0,0 +1,174 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  Vectorized statistics of multi-channel data
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   y = decodePCM(dataBuffer, sampleWidth, channelCount)        # (frameCount, channelCount)
+#   stats = computeChannelStatistics(y, channelIndices=[0, 1], scale=1/100)
+#   stats.shape == (len(channelIndices), len(STATISTICS_FIELD_NAMES))
+#   stats[k, STATISTICS_FIELD_NAMES.index('RMS')] is the RMS of channel channelIndices[k]
+#
+#   rollingFeatures = MaintletRollingChannelFeatures(channelCount=2, windowChunkCount=10)
+#   rollingFeatures.update(x)                          # x: (frameCount, 2) float chunk
+#   features = rollingFeatures.getFeatures()           # (2, len(ROLLING_FEATURE_NAMES))
+#==========================================================================
+
+import numpy as np
+
+STATISTICS_FIELD_NAMES = ['RMS', 'Range', 'MAX', 'MIN', 'STD']
+STATISTICS_BLOCK_SIZE = 16384 # frames per block of the float64 accumulation, a block stays in the CPU cache
+
+def computeChannelStatistics(y, channelIndices=None, scale=1.0):
+    """
+    Compute RMS, range, max, min and std of several channels at once.
+    The selected channels are gathered once into a channel-major copy, so every reduction walks
+    contiguous memory. Max and min run on the raw samples. The sum and the sum of squares are
+    accumulated block by block in float64 and shared by RMS, mean and std.
+
+    Args:
+        y (np.ndarray): Samples with shape (frameCount, channelCount).
+        channelIndices (list, optional): Channels to compute (e.g., skip NC channels). Defaults to None (all channels).
+        scale (float, optional): A positive linear scale applied to the results. Defaults to 1.0.
+
+    Returns:
+        np.ndarray: float64 array with shape (len(channelIndices), len(STATISTICS_FIELD_NAMES)).
+    """
+    if channelIndices is None:
+        channelIndices = list(range(y.shape[1]))
+    channelIndices = np.asarray(channelIndices, dtype=np.intp)
+    channelCount = len(channelIndices)
+    frameCount = y.shape[0]
+    stats = np.zeros((channelCount, len(STATISTICS_FIELD_NAMES)), dtype=np.float64)
+    if channelCount == 0 or frameCount == 0:
+        return stats
+
+    # (channelCount, frameCount), one copy of the selected channels only
+    if channelCount == y.shape[1] and np.array_equal(channelIndices, np.arange(channelCount)):
+        x = np.ascontiguousarray(y.T)
+    else:
+        x = np.ascontiguousarray(y[:, channelIndices].T)
+    _max = x.max(axis=1).astype(np.float64)
+    _min = x.min(axis=1).astype(np.float64)
+
+    sum1 = np.zeros(channelCount, dtype=np.float64)
+    sum2 = np.zeros(channelCount, dtype=np.float64)
+    scratch = np.empty((channelCount, min(STATISTICS_BLOCK_SIZE, frameCount)), dtype=np.float64)
+    for start in range(0, frameCount, STATISTICS_BLOCK_SIZE):
+        block = x[:, start:start + STATISTICS_BLOCK_SIZE]
+        xf = scratch[:, :block.shape[1]]
+        xf[...] = block
+        sum1 += xf.sum(axis=1)
+        sum2 += np.einsum('ij,ij->i', xf, xf)
+
+    mean = sum1 / frameCount
+    meanSquare = sum2 / frameCount
+    variance = np.maximum(meanSquare - mean * mean, 0)
+    stats[:, 0] = np.sqrt(meanSquare)
+    stats[:, 1] = _max - _min
+    stats[:, 2] = _max
+    stats[:, 3] = _min
+    stats[:, 4] = np.sqrt(variance)
+    stats *= scale
+    return stats
+
+ROLLING_FEATURE_NAMES = ['RMS', 'Peak', 'CrestFactor', 'Kurtosis']
+
+class MaintletRollingChannelFeatures:
+    def __init__(self, channelCount, windowChunkCount):
+        """
+        Rolling RMS, peak, crest factor and kurtosis over the last windowChunkCount chunks.
+        Each chunk is reduced to its raw moments (sum of x, x^2, x^3, x^4) and its peak. The window
+        totals are updated by adding the new chunk and subtracting the chunk that leaves the window,
+        so an update costs the same whatever the window length is.
+
+        Args:
+            channelCount (int): The number of channels in each chunk.
+            windowChunkCount (int): The number of chunks in the rolling window.
+        """
+        self.channelCount = channelCount
+        self.windowChunkCount = max(int(windowChunkCount), 1)
+        # per chunk values: frame count, sum x, sum x^2, sum x^3, sum x^4
+        self.chunkMoments = np.zeros((self.windowChunkCount, 5, channelCount), dtype=np.float64)
+        self.chunkPeaks = np.zeros((self.windowChunkCount, channelCount), dtype=np.float64)
+        self.totalMoments = np.zeros((5, channelCount), dtype=np.float64)
+        self.updateCount = 0
+
+    def update(self, x):
+        """
+        Add one chunk to the window
+
+        Args:
+            x (np.ndarray): float samples with shape (frameCount, channelCount).
+        """
+        slot = self.updateCount % self.windowChunkCount
+        x2 = x * x
+        moments = self.chunkMoments[slot]
+        self.totalMoments -= moments
+        moments[0] = x.shape[0]
+        moments[1] = x.sum(axis=0)
+        moments[2] = x2.sum(axis=0)
+        moments[3] = (x2 * x).sum(axis=0)
+        moments[4] = (x2 * x2).sum(axis=0)
+        self.totalMoments += moments
+        self.chunkPeaks[slot] = np.maximum(x.max(axis=0), -x.min(axis=0))
+        self.updateCount += 1
+        # rebuild the totals once per window so the rounding error of add/subtract does not build up
+        if self.updateCount % self.windowChunkCount == 0:
+            self.totalMoments = self.chunkMoments.sum(axis=0)
+
+    def getFeatures(self):
+        """
+        Get features of the current window
+
+        Returns:
+            np.ndarray: float64 array with shape (channelCount, len(ROLLING_FEATURE_NAMES)).
+        """
+        features = np.zeros((self.channelCount, len(ROLLING_FEATURE_NAMES)), dtype=np.float64)
+        n = self.totalMoments[0]
+        if self.updateCount == 0 or not np.all(n > 0):
+            return features
+        mean = self.totalMoments[1] / n
+        meanSquare = self.totalMoments[2] / n
+        meanCube = self.totalMoments[3] / n
+        meanFourth = self.totalMoments[4] / n
+        variance = np.maximum(meanSquare - mean * mean, 0)
+        centralFourth = meanFourth - 4 * mean * meanCube + 6 * mean * mean * meanSquare - 3 * mean ** 4
+        rms = np.sqrt(meanSquare)
+        peak = self.chunkPeaks[:min(self.updateCount, self.windowChunkCount)].max(axis=0)
+        features[:, 0] = rms
+        features[:, 1] = peak
+        features[:, 2] = np.divide(peak, rms, out=np.zeros_like(peak), where=rms > 0)
+        features[:, 3] = np.divide(centralFourth, variance * variance, out=np.zeros_like(variance), where=variance > 0)
+        return features
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    y = rng.integers(-30000, 30000, size=(48000, 8)).astype(np.int16)
+    channelIndices = [0, 1, 5]
+    stats = computeChannelStatistics(y, channelIndices, scale=1/100)
+    for k, i in enumerate(channelIndices):
+        channelData = y[:, i] / 100
+        expected = [np.sqrt(np.mean(channelData**2)), np.max(channelData) - np.min(channelData), np.max(channelData), np.min(channelData), np.std(channelData)]
+        print(i, np.allclose(stats[k], expected), dict(zip(STATISTICS_FIELD_NAMES, np.round(stats[k], 3))))
+
+    # rolling features of the last 10 chunks compared with a direct computation
+    x = rng.normal(size=(4800 * 25, 2))
+    rollingFeatures = MaintletRollingChannelFeatures(channelCount=2, windowChunkCount=10)
+    for start in range(0, x.shape[0], 4800):
+        rollingFeatures.update(x[start:start + 4800])
+    window = x[-4800 * 10:]
+    rms = np.sqrt(np.mean(window**2, axis=0))
+    peak = np.max(np.abs(window), axis=0)
+    kurtosis = np.mean((window - window.mean(axis=0))**4, axis=0) / np.var(window, axis=0)**2
+    expected = np.stack([rms, peak, peak / rms, kurtosis], axis=1)
+    print(np.allclose(rollingFeatures.getFeatures(), expected), dict(zip(ROLLING_FEATURE_NAMES, np.round(rollingFeatures.getFeatures()[0], 3))))
+#============================= END OF TEST CODE ==============================
@@ -0,0 +1,335 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  In-memory catalog of the record files
+#                        (1) the record folder is scanned once when the catalog is seeded, it is then updated with
+#                            the write (commit, compression) and delete events of the file system module
+#                        (2) a min-heap keeps the files by retention key (the timestamp of the file, moved by the
+#                            retention policies), the next file to evict is found in O(log n)
+#                        (3) the bytes and files of the catalog are running totals, the summary sidecar of a recording
+#                            (the files with the same name and another extension) is counted with it and removed with its last file
+#                        (4) a batch eviction takes files from the heap until enough bytes are freed, under one lock
+#                        (5) the record folder can be sharded (MaintletStorageLayout), an empty shard is removed with its last file
+#                        (6) a file which is still used (e.g., queued for the compression or the data analysis) is pinned,
+#                            the evictions skip it until it is unpinned
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   catalog = MaintletStorageCatalog(folderPath="records", extensions=('.wav', '.flac'))
+#   catalog.seed()                                   # one scan of the folder
+#   catalog.add("records/a_b.wav", sizeInByte=768044)   # a committed file, the key is its modification time
+#   catalog.add("records/a_b.flac", key=catalog.getKey("records/a_b.wav"))  # same place in the order
+#   catalog.remove("records/a_b.wav")                # a file deleted by its owner
+#   key = catalog.getRecordingKey("records/a_b.wav")  # the key of the recording, the wav may be gone
+#   catalog.setRecordingKey("records/a_b.wav", key)  # move every file of the recording (retention policies)
+#   evicted = catalog.evictBatch(minSizeInByte=400 * 1024 * 1024)  # [(filepath, bytes freed, isLastFile), ...]
+#   evicted = catalog.evictBatch(maxKey=time.time() - 86400)       # every file with a key older than one day
+#   evicted = catalog.evictBatch(minSizeInByte=..., beforeDelete=journal)  # journal([(filepath, isLastFile), ...]) before the deletes
+#   catalog.pin("records/a_b.wav") ... catalog.unpin("records/a_b.wav")  # not evicted in between (pins are counted)
+#   catalog.getStatus()                              # {'totalFile': ..., 'totalSizeInByte': ..., ...}
+#==========================================================================
+
+import heapq
+import os
+import threading
+from MaintletLog import logger
+from MaintletSummary import getSummaryFilepath
+from MaintletStorageLayout import scanRecordFolder
+
+class MaintletStorageCatalog:
+    def __init__(self, folderPath, extensions):
+        """
+        Init an empty catalog
+
+        Args:
+            folderPath (str): The record folder.
+            extensions (tuple): The extensions of record files (the sidecars are not record files).
+        """
+        self.folderPath = folderPath
+        self.extensions = tuple(extensions)
+        self.entries = {} # filepath -> (key, sizeInByte)
+        self.heap = [] # (key, filepath), entries which were removed or moved are skipped when they reach the top
+        self.recordings = {} # recording (filepath without extension) -> {'sidecarSize': int, 'filepaths': set}
+        self.pins = {} # filepath -> number of users of the file
+        self.totalSizeInByte = 0
+        self.totalEvictedFile = 0
+        self.totalEvictedSizeInByte = 0
+        self.lock = threading.Lock()
+
+    def seed(self):
+        """ Add all record files of the folder and of its shards (the only directory scan of the catalog) """
+        for entry in scanRecordFolder(self.folderPath):
+            if entry.name.endswith(self.extensions):
+                stat = entry.stat()
+                self.add(entry.path, key=stat.st_mtime, sizeInByte=stat.st_size)
+        logger.info(f"StorageCatalog: {len(self.entries)} files, {self.totalSizeInByte} byte in {self.folderPath}")
+
+    def add(self, filepath, key=None, sizeInByte=None):
+        """
+        Add a record file, or update it if it is in the catalog
+
+        Args:
+            filepath (str): The path of the file.
+            key (float, optional): The retention key, smaller keys are evicted first. Defaults to None (the modification time of the file).
+            sizeInByte (int, optional): The size of the file. Defaults to None (stat the file).
+        """
+        if key == None or sizeInByte == None:
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                return
+            key = stat.st_mtime if key == None else key
+            sizeInByte = stat.st_size if sizeInByte == None else sizeInByte
+        recording = os.path.splitext(filepath)[0]
+        with self.lock:
+            if filepath in self.entries:
+                self._removeEntry(filepath)
+            self.entries[filepath] = (key, sizeInByte)
+            heapq.heappush(self.heap, (key, filepath))
+            self.totalSizeInByte += sizeInByte
+            files = self.recordings.get(recording)
+            if files == None:
+                files = self.recordings[recording] = {'sidecarSize': self._getSidecarSize(filepath), 'filepaths': set()}
+                self.totalSizeInByte += files['sidecarSize']
+            files['filepaths'].add(filepath)
+
+    def remove(self, filepath):
+        """
+        Remove a file which was deleted by its owner (e.g., a raw file after its compression)
+
+        Returns:
+            bool: False if the file is not in the catalog.
+        """
+        with self.lock:
+            if filepath not in self.entries:
+                return False
+            self._removeEntry(filepath)
+            return True
+
+    def pin(self, filepath):
+        """ Keep a file out of the evictions until it is unpinned, a file can be pinned by several users """
+        with self.lock:
+            self.pins[filepath] = self.pins.get(filepath, 0) + 1
+
+    def unpin(self, filepath):
+        """ Release a pin of a file """
+        with self.lock:
+            count = self.pins.get(filepath, 0) - 1
+            if count > 0:
+                self.pins[filepath] = count
+            else:
+                self.pins.pop(filepath, None)
+
+    def getKey(self, filepath):
+        """ Get the retention key of a file, None if it is not in the catalog """
+        entry = self.entries.get(filepath)
+        return entry[0] if entry != None else None
+
+    def getRecordingKey(self, filepath):
+        """ Get the retention key of the recording of a file (the file itself may be gone), None if it is not in the catalog """
+        with self.lock:
+            files = self.recordings.get(os.path.splitext(filepath)[0])
+            if files == None:
+                return None
+            return min(self.entries[path][0] for path in files['filepaths'])
+
+    def setRecordingKey(self, filepath, key):
+        """
+        Move every file of the recording of a file to a new retention key
+
+        Returns:
+            bool: False if the recording is not in the catalog.
+        """
+        recording = os.path.splitext(filepath)[0]
+        with self.lock:
+            files = self.recordings.get(recording)
+            if files == None:
+                return False
+            for path in files['filepaths']:
+                self.entries[path] = (key, self.entries[path][1])
+                heapq.heappush(self.heap, (key, path))
+            self._compactHeap()
+            return True
+
+    def popOldest(self, maxKey=None):
+        """
+        Remove the file with the smallest retention key from the catalog (the file is not deleted)
+
+        Args:
+            maxKey (float, optional): Only a file with a smaller key is removed. Defaults to None (no limit).
+
+        Returns:
+            tuple: (filepath, sizeInByte, isLastFile of its recording), (None, 0, False) if there is no such file.
+        """
+        with self.lock:
+            skipped = []
+            result = self._popOldest(maxKey, skipped)
+            self._restorePinned(skipped)
+            return result
+
+    def evictBatch(self, minSizeInByte=0, maxKey=None, beforeDelete=None):
+        """
+        Delete files in retention order, and the sidecar of a recording with its last file
+
+        Args:
+            minSizeInByte (int, optional): Stop once this many bytes of the catalog are freed. Defaults to 0 (one file).
+            maxKey (float, optional): Only files with a smaller key are evicted. Defaults to None (no limit).
+            beforeDelete (function, optional): Called with [(filepath, isLastFile), ...] once the batch has left the catalog
+                                               and before its files are deleted (e.g., to journal the eviction). Defaults to None.
+
+        Returns:
+            list: (filepath, bytes freed, isLastFile of its recording) of the evicted files.
+        """
+        batch = []
+        with self.lock:
+            # the whole batch leaves the catalog at once
+            catalogSizeInByte = self.totalSizeInByte
+            skipped = []
+            while True:
+                filepath, sizeInByte, isLastFile = self._popOldest(maxKey, skipped)
+                if filepath == None:
+                    break
+                batch.append((filepath, isLastFile))
+                if maxKey == None and catalogSizeInByte - self.totalSizeInByte >= minSizeInByte:
+                    break
+            self._restorePinned(skipped)
+        if beforeDelete != None and len(batch) > 0:
+            beforeDelete(batch)
+        evicted = []
+        for filepath, isLastFile in batch:
+            freedSizeInByte = 0
+            for path in (filepath, getSummaryFilepath(filepath) if isLastFile else None):
+                if path == None:
+                    continue
+                try:
+                    freedSizeInByte += os.stat(path).st_size
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.critical(f"StorageCatalog: cannot remove {path}: {e}")
+            if isLastFile:
+                self._removeEmptyShards(os.path.dirname(filepath))
+            evicted.append((filepath, freedSizeInByte, isLastFile))
+            self.totalEvictedFile += 1
+            self.totalEvictedSizeInByte += freedSizeInByte
+        return evicted
+
+    def _popOldest(self, maxKey, skipped):
+        """ The routine of popOldest (self.lock is held), the pinned files are taken out of the heap into skipped """
+        while len(self.heap) > 0:
+            key, filepath = self.heap[0]
+            entry = self.entries.get(filepath)
+            if entry == None or entry[0] != key:
+                # removed, or moved to another key
+                heapq.heappop(self.heap)
+                continue
+            if maxKey != None and key >= maxKey:
+                break
+            heapq.heappop(self.heap)
+            if filepath in self.pins:
+                skipped.append((key, filepath))
+                continue
+            isLastFile = self._removeEntry(filepath)
+            return filepath, entry[1], isLastFile
+        return None, 0, False
+
+    def _restorePinned(self, skipped):
+        """ Put the pinned files skipped by an eviction back into the heap (self.lock is held) """
+        for item in skipped:
+            heapq.heappush(self.heap, item)
+
+    def _removeEmptyShards(self, folderPath):
+        """ Remove a shard of the record folder (e.g., records/YYYY/MM/DD/HH) and its parents once they are empty """
+        while os.path.normpath(folderPath) != os.path.normpath(self.folderPath) and folderPath.startswith(self.folderPath):
+            try:
+                os.rmdir(folderPath)
+            except OSError:
+                # not empty
+                break
+            folderPath = os.path.dirname(folderPath)
+
+    def _getSidecarSize(self, filepath):
+        try:
+            return os.path.getsize(getSummaryFilepath(filepath))
+        except OSError:
+            return 0
+
+    def _compactHeap(self):
+        """ Rebuild the heap if most of its items are stale (self.lock is held) """
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            self.heap = [(entry[0], path) for path, entry in self.entries.items()]
+            heapq.heapify(self.heap)
+
+    def _removeEntry(self, filepath):
+        """ Remove an entry and update the totals (self.lock is held), return True if it was the last file of its recording """
+        key, sizeInByte = self.entries.pop(filepath)
+        self.totalSizeInByte -= sizeInByte
+        self._compactHeap()
+        recording = os.path.splitext(filepath)[0]
+        files = self.recordings[recording]
+        files['filepaths'].discard(filepath)
+        if len(files['filepaths']) > 0:
+            return False
+        del self.recordings[recording]
+        self.totalSizeInByte -= files['sidecarSize']
+        return True
+
+    def getStatus(self):
+        """
+        Get the statistics of the catalog
+
+        Returns:
+            dict: statistics
+        """
+        status = {}
+        status['totalFile'] = len(self.entries)
+        status['totalSizeInByte'] = self.totalSizeInByte
+        status['totalPinnedFile'] = len(self.pins)
+        status['totalEvictedFile'] = self.totalEvictedFile
+        status['totalEvictedSizeInByte'] = self.totalEvictedSizeInByte
+        return status
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    import tempfile
+    import time
+    folderPath = tempfile.mkdtemp()
+    for i in range(5):
+        with open(f"{folderPath}/file{i}.wav", 'wb') as f:
+            f.write(b'\x00' * 1000)
+        with open(f"{folderPath}/file{i}.summary.npz", 'wb') as f:
+            f.write(b'\x00' * 100)
+        os.utime(f"{folderPath}/file{i}.wav", (1000 + i, 1000 + i))
+    catalog = MaintletStorageCatalog(folderPath, extensions=('.wav', '.flac'))
+    catalog.seed()
+    print(catalog.getStatus())  # 5 files, 5500 byte
+    # file0 is compressed, the flac keeps the place of the wav and the wav is removed by its owner
+    with open(f"{folderPath}/file0.flac", 'wb') as f:
+        f.write(b'\x00' * 500)
+    catalog.add(f"{folderPath}/file0.flac", key=catalog.getKey(f"{folderPath}/file0.wav"))
+    os.unlink(f"{folderPath}/file0.wav")
+    catalog.remove(f"{folderPath}/file0.wav")
+    print(catalog.getStatus())  # 5 files, 5000 byte
+    # file1 is kept longer, file2 is still used
+    catalog.setRecordingKey(f"{folderPath}/file1.wav", 2000)
+    catalog.pin(f"{folderPath}/file2.wav")
+    print(catalog.evictBatch(minSizeInByte=1200))  # file0.flac (600 byte), file3.wav (1100 byte)
+    catalog.unpin(f"{folderPath}/file2.wav")
+    print(catalog.evictBatch(maxKey=1004))  # file2.wav
+    print(sorted(os.listdir(folderPath)), catalog.getStatus())
+    for i in range(100000):
+        catalog.entries[f"x{i}"] = (i, 1)
+        catalog.recordings[f"x{i}"] = {'sidecarSize': 0, 'filepaths': {f"x{i}"}}
+        heapq.heappush(catalog.heap, (i, f"x{i}"))
+    startTime = time.time()
+    for i in range(1000):
+        catalog.popOldest()
+    print(f"popOldest {(time.time() - startTime) / 1000 * 1e6:.1f} us with 100000 files")
+#============================= END OF TEST CODE ==============================
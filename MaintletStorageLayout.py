@@ -0,0 +1,190 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  Storage layout of recorded files
+#                        (1) stored channels are grouped by their decimation factor (a WAV file has one sampling rate)
+#                        (2) each group is saved in its own file, decimated groups have a rate suffix, e.g., <timestamp>_<mac>_12000Hz.wav
+#                        (3) the record folder is flat, or sharded by the time in the filename (<timestamp> is %m_%d_%Y_%H_%M_%S_%f),
+#                            e.g., records/2026/10/17/13/10_17_2026_13_05_09_123456_<mac>.wav for the 'hourly' layout
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   specs = getStorageGroupSpecs(storedChannelIndices=[0, 1, 2], decimationFactors={2: 4}, samplingRate=48000, recordChunk=4800)
+#   specs == [(1, [0, 1]), (4, [2])]
+#
+#   The file assembler keeps one MaintletStorageGroup per spec
+#   group = MaintletStorageGroup(factor=4, channelIndices=[2], samplingRate=48000, sampleWidth=2, channelCount=8,
+#                                recordChunk=4800, recordFileDuration=1)
+#   group.getFilepath("records/xxx.wav")     # records/xxx_12000Hz.wav
+#   group.convertChunk(chunk, out=...)       # pack (and decimate) a captured chunk
+#
+#   Record folder layout ('flat', 'daily' or 'hourly')
+#   getRecordFilepath("records", "10_17_2026_13_05_09_123456_mac.wav", 'hourly')  # records/2026/10/17/13/10_17_...wav
+#   for entry in scanRecordFolder("records"): ...  # os.DirEntry of every file in the folder and its shards
+#==========================================================================
+
+import os
+import queue
+from MaintletPCM import decodePCM, encodePCM, packChannels
+from MaintletDecimation import MaintletPolyphaseDecimator
+
+def getStorageGroupSpecs(storedChannelIndices, decimationFactors, samplingRate, recordChunk):
+    """
+    Group the stored channels by their decimation factor
+
+    Args:
+        storedChannelIndices (list): The captured channel indices stored in files.
+        decimationFactors (dict): channel index -> decimation factor, a missing channel is not decimated.
+        samplingRate (int): The capture sampling rate.
+        recordChunk (int): The number of frames of a captured chunk.
+
+    Returns:
+        list: [(factor, channelIndices), ...] sorted by factor.
+    """
+    groups = {}
+    for channelIndex in storedChannelIndices:
+        factor = int(decimationFactors.get(channelIndex, 1))
+        if factor < 1 or recordChunk % factor != 0 or samplingRate % factor != 0:
+            raise ValueError(f"Channel {channelIndex}: the decimation factor {factor} has to divide recordChunk {recordChunk} and samplingRate {samplingRate}")
+        groups.setdefault(factor, []).append(channelIndex)
+    return sorted(groups.items())
+
+def getStorageGroupSuffix(factor, samplingRate):
+    """ Get the filename suffix of a group, full-rate files have no suffix """
+    return '' if factor == 1 else f"_{samplingRate // factor}Hz"
+
+def getStorageGroupSuffixOfFile(filepath, suffixes):
+    """ Get the suffix of a recorded file given the suffixes of all groups """
+    name = filepath.rsplit('.', 1)[0]
+    for suffix in suffixes:
+        if suffix != '' and name.endswith(suffix):
+            return suffix
+    return ''
+
+RECORD_FOLDER_LAYOUTS = {'flat': 0, 'daily': 3, 'hourly': 4} # layout -> depth of the shards (year, month, day, hour)
+
+def getRecordSubfolder(filename, layout):
+    """
+    Get the shard of a record file (or of its sidecar) from the timestamp in its name
+
+    Args:
+        filename (str): The name of the file, e.g., 10_17_2026_13_05_09_123456_<mac>.wav.
+        layout (str): A key of RECORD_FOLDER_LAYOUTS.
+
+    Returns:
+        str: e.g., '2026/10/17/13' ('' for the flat layout), None if the name has no timestamp.
+    """
+    depth = RECORD_FOLDER_LAYOUTS[layout]
+    if depth == 0:
+        return ''
+    tokens = filename.split('_', 4)
+    if len(tokens) < 5 or not all(e.isdigit() for e in tokens[:4]):
+        return None
+    month, day, year, hour = tokens[:4]
+    return '/'.join((year, month, day, hour)[:depth])
+
+def getRecordFilepath(recordFolderPath, filename, layout):
+    """ Get the path of a record file in the layout (a name without timestamp stays at the top of the folder) """
+    subfolder = getRecordSubfolder(filename, layout)
+    if subfolder == None or subfolder == '':
+        return f"{recordFolderPath}/{filename}"
+    return f"{recordFolderPath}/{subfolder}/{filename}"
+
+def scanRecordFolder(recordFolderPath):
+    """
+    Iterate over the files of a record folder and of its shards (any layout)
+
+    Yields:
+        os.DirEntry: A file.
+    """
+    folderPaths = [recordFolderPath]
+    while len(folderPaths) > 0:
+        with os.scandir(folderPaths.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    folderPaths.append(entry.path)
+                elif entry.is_file():
+                    yield entry
+
+class MaintletStorageGroup:
+    def __init__(self, factor, channelIndices, samplingRate, sampleWidth, channelCount, recordChunk, recordFileDuration):
+        """
+        The channels saved in one file and the output state of the current file
+
+        Args:
+            factor (int): The decimation factor of the group.
+            channelIndices (list): The captured channel indices of the group.
+            samplingRate (int): The capture sampling rate.
+            sampleWidth (int): The sample width in byte.
+            channelCount (int): The number of captured channels.
+            recordChunk (int): The number of frames of a captured chunk.
+            recordFileDuration (int): The duration of a file in second.
+        """
+        self.factor = factor
+        self.channelIndices = list(channelIndices)
+        self.capturedChannelCount = channelCount
+        self.channelCount = len(self.channelIndices) # channels in the file
+        self.sampleWidth = sampleWidth
+        self.samplingRate = samplingRate // factor # sampling rate of the file
+        self.suffix = getStorageGroupSuffix(factor, samplingRate)
+        self.isPacked = self.channelIndices != list(range(channelCount))
+        self.chunkSizeInByte = recordChunk // factor * sampleWidth * self.channelCount
+        self.fileSizeInByte = self.samplingRate * sampleWidth * self.channelCount * recordFileDuration
+        self.decimator = MaintletPolyphaseDecimator(factor, self.channelCount) if factor > 1 else None
+        self.chunkBuffer = bytearray(self.chunkSizeInByte) # a converted chunk (streaming mode)
+        self.bufferPool = queue.Queue() # file buffers (buffered mode)
+        # metadata saved in the database
+        self.channelMap = ','.join(str(e) for e in self.channelIndices)
+        self.channelRates = ','.join(str(self.samplingRate) for e in self.channelIndices)
+        # the output of the current file
+        self.filepath = ""
+        self.outputBuffer = None # the file buffer (buffered mode)
+        self.outputStream = None # the memory-mapped file (streaming mode)
+        self.summary = None # the summary of the current file (MaintletFileSummary)
+
+    def getFilepath(self, filepath):
+        """ Add the suffix of the group to a record file path """
+        name, extension = filepath.rsplit('.', 1)
+        return f"{name}{self.suffix}.{extension}"
+
+    def convertChunk(self, chunk, out=None):
+        """
+        Convert a captured chunk to the file format of the group (keep the group channels and decimate them)
+
+        Args:
+            chunk (bytes-like): A captured chunk with all channels.
+            out (writable bytes-like, optional): The destination with size chunkSizeInByte. Defaults to None.
+
+        Returns:
+            bytes-like: The converted chunk (out if given).
+        """
+        if self.decimator != None:
+            x = decodePCM(chunk, self.sampleWidth, self.capturedChannelCount, asFloat=True)[:, self.channelIndices]
+            return encodePCM(self.decimator.process(x), self.sampleWidth, out=out)
+        if self.isPacked:
+            return packChannels(chunk, self.sampleWidth, self.capturedChannelCount, self.channelIndices, out=out)
+        if out is None:
+            return chunk
+        out[:] = chunk
+        return out
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    import numpy as np
+    specs = getStorageGroupSpecs([0, 1, 2], {2: 4}, 48000, 4800)
+    print(specs)
+    groups = [MaintletStorageGroup(factor, channelIndices, 48000, 2, 8, 4800, 1) for factor, channelIndices in specs]
+    chunk = (np.random.default_rng(0).normal(size=(4800, 8)) * 1000).astype('<i2').tobytes()
+    for group in groups:
+        converted = group.convertChunk(chunk, out=memoryview(group.chunkBuffer))
+        print(group.getFilepath("records/a_b.wav"), group.channelMap, group.channelRates, len(converted) == group.chunkSizeInByte)
+    print(getStorageGroupSuffixOfFile("records/a_b_12000Hz.wav", [g.suffix for g in groups]))
+    for layout in RECORD_FOLDER_LAYOUTS:
+        print(layout, getRecordFilepath("records", "10_17_2026_13_05_09_123456_02:fc:00:00:00:01_12000Hz.wav", layout), getRecordFilepath("records", "a_b.wav", layout))
+#============================= END OF TEST CODE ==============================
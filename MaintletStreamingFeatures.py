@@ -0,0 +1,160 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  Streaming per-chunk feature extraction
+#                        (1) read each captured chunk from the record ring buffer with its own reader (no disk, no file boundary)
+#                        (2) update rolling per-channel RMS, peak, crest factor and kurtosis at chunk resolution
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   1. Register a reader before the record stream starts
+#       reader = recordRingBuffer.registerReader("streamingFeatures")
+#       streamingFeatures = MaintletStreamingFeatures(reader, sampleWidth=2, channelCount=8, channelIndices=[0, 1], windowChunkCount=10)
+#   2. Listen to the features (called in the feature thread, keep it short)
+#       streamingFeatures.addListener(lambda seq, adcTime, features: ...)
+#   3. start / stop the feature thread
+#       streamingFeatures.start()
+#       streamingFeatures.getLatestFeatures() # (seq, adcTime, features) of the latest chunk
+#       streamingFeatures.stop()
+#==========================================================================
+
+import logging
+import threading
+import numpy as np
+from MaintletLog import logger
+from MaintletPCM import decodePCM
+from MaintletStatistics import MaintletRollingChannelFeatures, ROLLING_FEATURE_NAMES
+
+class MaintletStreamingFeatures:
+    def __init__(self, reader, sampleWidth, channelCount, channelIndices, windowChunkCount):
+        """
+        Init the streaming feature stage
+
+        Args:
+            reader (MaintletRingBufferReader): The reader of the record ring buffer.
+            sampleWidth (int): The sample width in byte.
+            channelCount (int): The number of interleaved channels in a chunk.
+            channelIndices (list): Channels to compute (e.g., skip NC channels).
+            windowChunkCount (int): The length of the rolling window in chunks.
+        """
+        self.reader = reader
+        self.sampleWidth = sampleWidth
+        self.channelCount = channelCount
+        self.channelIndices = list(channelIndices)
+        self.rollingFeatures = MaintletRollingChannelFeatures(len(self.channelIndices), windowChunkCount)
+        self.listeners = []
+        self.latestFeatures = None # (seq, adcTime, features)
+        self.totalChunk = 0
+        self.totalInvalidChunk = 0 # chunks overwritten while we were decoding them
+        self.thread = None
+        self.stopThread = False
+
+    def addListener(self, listener):
+        """
+        Add a function called with (seq, adcTime, features) after each chunk
+
+        Args:
+            listener (function): features is a (len(channelIndices), len(ROLLING_FEATURE_NAMES)) array.
+        """
+        self.listeners.append(listener)
+
+    def start(self):
+        """ Start the feature thread """
+        self.stopThread = False
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+        self.thread.name = 'streamingFeatures'
+        self.thread.start()
+
+    def stop(self):
+        """ Stop the feature thread """
+        self.stopThread = True
+        if self.thread != None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def loop(self):
+        """ The thread routine of the feature stage """
+        while self.stopThread == False:
+            seq = self.reader.next(timeout=0.5)
+            if seq is None:
+                continue
+            try:
+                self.processChunk(seq)
+            except Exception as e:
+                logger.error(f"StreamingFeatures: fail to process chunk {seq}: {e}")
+
+    def processChunk(self, seq):
+        """
+        Update the rolling features with one chunk of the ring buffer
+
+        Args:
+            seq (int): The sequence number of the chunk.
+        """
+        if len(self.channelIndices) == 0:
+            return
+        # decodePCM copies the selected channels out of the slot, so the slot can be reused afterwards
+        x = decodePCM(self.reader.getSlot(seq), self.sampleWidth, self.channelCount, asFloat=True)[:, self.channelIndices]
+        adcTime = self.reader.ringBuffer.getSlotAdcTime(seq)
+        if not self.reader.isValid(seq):
+            self.totalInvalidChunk += 1
+            return
+        self.rollingFeatures.update(x)
+        features = self.rollingFeatures.getFeatures()
+        self.latestFeatures = (seq, adcTime, features)
+        self.totalChunk += 1
+
+        for listener in self.listeners:
+            listener(seq, adcTime, features)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"StreamingFeatures {seq}: {dict(zip(ROLLING_FEATURE_NAMES, np.round(features[0], 4)))}")
+
+    def getLatestFeatures(self):
+        """
+        Get the features after the latest chunk
+
+        Returns:
+            tuple: (seq, adcTime, features), None if no chunk has been processed
+        """
+        return self.latestFeatures
+
+    def getStatus(self):
+        """
+        Get the statistics of the feature stage
+
+        Returns:
+            dict: statistics
+        """
+        status = {}
+        status['totalChunk'] = self.totalChunk
+        status['totalInvalidChunk'] = self.totalInvalidChunk
+        status.update(self.reader.getStatus())
+        return status
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    import time
+    from MaintletRingBuffer import MaintletRingBuffer
+    channelCount = 8
+    recordChunk = 4800
+    sampleWidth = 2
+    ringBuffer = MaintletRingBuffer(slotCount=50, slotSizeInByte=recordChunk * channelCount * sampleWidth)
+    streamingFeatures = MaintletStreamingFeatures(ringBuffer.registerReader("streamingFeatures"), sampleWidth, channelCount, channelIndices=[0, 1], windowChunkCount=10)
+    streamingFeatures.addListener(lambda seq, adcTime, features: print(seq, round(adcTime, 2), np.round(features[:, 0], 4)))
+    streamingFeatures.start()
+
+    rng = np.random.default_rng(0)
+    for i in range(20):
+        chunk = (rng.normal(size=(recordChunk, channelCount)) * 1000 * (1 + i // 10)).astype('<i2')
+        ringBuffer.write(chunk.tobytes(), adcTime=i * 0.1, status=0)
+        time.sleep(0.01)
+    time.sleep(0.5)
+    streamingFeatures.stop()
+    print(streamingFeatures.getStatus())
+#============================= END OF TEST CODE ==============================
@@ -0,0 +1,197 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  Per-file summary sidecar
+#                        (1) the summary of a file is updated with each chunk while the file is assembled
+#                        (2) it holds min/max envelopes of every channel at several bin sizes, the RMS of every chunk
+#                            and the statistics of the whole file (STATISTICS_FIELD_NAMES)
+#                        (3) the writer saves it next to the file (<name>.summary.npz), consumers plot waveforms and read
+#                            stats without loading the PCM data
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   summary = MaintletFileSummary(channelCount=2, sampleWidth=2, samplingRate=48000, chunkFrameCount=4800, chunkCount=10)
+#   summary.update(chunkIndex, chunk)                # chunk: interleaved PCM of the file format
+#   summary.save(getSummaryFilepath("records/a_b.wav"))  # records/a_b.summary.npz
+#
+#   summary = loadSummary("records/a_b.summary.npz") # dict, None if there is no sidecar
+#   summary['stats'][k, STATISTICS_FIELD_NAMES.index('RMS')]   # RMS of channel k of the file (full scale is 1)
+#   summary['chunkRms'][i, k]                                  # RMS of chunk i
+#   envelopeMin, envelopeMax, binSize = getSummaryEnvelope(summary, maxBinCount=1000)  # full scale is 1
+#==========================================================================
+
+import os
+import numpy as np
+from MaintletPCM import decodePCM, getFullScale
+from MaintletStatistics import STATISTICS_FIELD_NAMES
+
+SUMMARY_EXTENSION = '.summary.npz'
+ENVELOPE_BIN_SIZES = (64, 512, 4096) # frames of the file per envelope bin
+
+def getSummaryFilepath(filepath):
+    """ Get the sidecar path of a record file (any storage format) """
+    return os.path.splitext(filepath)[0] + SUMMARY_EXTENSION
+
+def loadSummary(filepath):
+    """
+    Load a summary sidecar
+
+    Args:
+        filepath (str): The path of the sidecar (getSummaryFilepath) or of its record file.
+
+    Returns:
+        dict: The arrays of the summary, None if the sidecar does not exist or cannot be read.
+    """
+    if not filepath.endswith(SUMMARY_EXTENSION):
+        filepath = getSummaryFilepath(filepath)
+    try:
+        with np.load(filepath) as f:
+            return dict(f)
+    except (OSError, ValueError):
+        return None
+
+def getSummaryEnvelope(summary, maxBinCount):
+    """
+    Get the finest envelope with at most maxBinCount bins (the coarsest one if none)
+
+    Returns:
+        tuple: (min, max) float arrays with shape (binCount, channelCount) scaled to full scale 1, and the bin size in frames.
+    """
+    binSizes = list(summary['binSizes'])
+    binSize = binSizes[-1]
+    for e in binSizes:
+        if len(summary[f"envelopeMin{e}"]) <= maxBinCount:
+            binSize = e
+            break
+    scale = 1 / float(summary['fullScale'])
+    return summary[f"envelopeMin{binSize}"] * scale, summary[f"envelopeMax{binSize}"] * scale, int(binSize)
+
+class MaintletFileSummary:
+    def __init__(self, channelCount, sampleWidth, samplingRate, chunkFrameCount, chunkCount, binSizes=ENVELOPE_BIN_SIZES):
+        """
+        Init an empty summary, all arrays are allocated here
+
+        Args:
+            channelCount (int): The number of channels in the file.
+            sampleWidth (int): The sample width in byte.
+            samplingRate (int): The sampling rate of the file.
+            chunkFrameCount (int): The frames of a chunk of the file.
+            chunkCount (int): The number of chunks in the file.
+            binSizes (tuple, optional): The bin sizes of the envelopes in frames. Defaults to ENVELOPE_BIN_SIZES.
+        """
+        self.channelCount = int(channelCount)
+        self.sampleWidth = int(sampleWidth)
+        self.samplingRate = int(samplingRate)
+        self.chunkFrameCount = int(chunkFrameCount)
+        self.chunkCount = int(chunkCount)
+        self.binSizes = [int(e) for e in binSizes]
+        frameCount = self.chunkFrameCount * self.chunkCount
+        dtype = np.int16 if self.sampleWidth == 2 else np.int32
+        self.envelopeMins = {}
+        self.envelopeMaxs = {}
+        for binSize in self.binSizes:
+            binCount = -(-frameCount // binSize)
+            self.envelopeMins[binSize] = np.full((binCount, self.channelCount), np.iinfo(dtype).max, dtype=dtype)
+            self.envelopeMaxs[binSize] = np.full((binCount, self.channelCount), np.iinfo(dtype).min, dtype=dtype)
+        self.chunkSums = np.zeros((self.chunkCount, self.channelCount), dtype=np.float64)
+        self.chunkSquareSums = np.zeros((self.chunkCount, self.channelCount), dtype=np.float64)
+        self.chunkFrameCounts = np.zeros(self.chunkCount, dtype=np.int64)
+
+    def update(self, chunkIndex, chunk):
+        """
+        Add a chunk of the file
+
+        Args:
+            chunkIndex (int): The index of the chunk in the file.
+            chunk (bytes-like): The interleaved PCM data of the chunk (file format).
+        """
+        y = decodePCM(chunk, self.sampleWidth, self.channelCount)
+        frameCount = y.shape[0]
+        if frameCount == 0:
+            return
+        start = chunkIndex * self.chunkFrameCount
+        for binSize in self.binSizes:
+            # bins follow the frame index in the file, the first bin of a chunk may continue the last bin of the previous chunk
+            binStarts = np.arange((-start) % binSize, frameCount, binSize)
+            if len(binStarts) == 0 or binStarts[0] != 0:
+                binStarts = np.concatenate(([0], binStarts))
+            binIndices = (start + binStarts) // binSize
+            envelopeMin = self.envelopeMins[binSize]
+            envelopeMax = self.envelopeMaxs[binSize]
+            envelopeMin[binIndices] = np.minimum(envelopeMin[binIndices], np.minimum.reduceat(y, binStarts, axis=0))
+            envelopeMax[binIndices] = np.maximum(envelopeMax[binIndices], np.maximum.reduceat(y, binStarts, axis=0))
+        x = y.astype(np.float64)
+        self.chunkSums[chunkIndex] = x.sum(axis=0)
+        self.chunkSquareSums[chunkIndex] = np.einsum('ij,ij->j', x, x)
+        self.chunkFrameCounts[chunkIndex] = frameCount
+
+    def getArrays(self):
+        """
+        Get the arrays of the sidecar
+
+        Returns:
+            dict: binSizes, envelopeMin<binSize>, envelopeMax<binSize> (PCM values), chunkRms and stats (full scale is 1), ...
+        """
+        fullScale = getFullScale(self.sampleWidth)
+        frameCount = max(int(self.chunkFrameCounts.sum()), 1)
+        chunkFrameCounts = np.maximum(self.chunkFrameCounts, 1)[:, np.newaxis]
+        mean = self.chunkSums.sum(axis=0) / frameCount
+        meanSquare = self.chunkSquareSums.sum(axis=0) / frameCount
+        finest = self.binSizes[0]
+        _max = self.envelopeMaxs[finest].max(axis=0).astype(np.float64)
+        _min = self.envelopeMins[finest].min(axis=0).astype(np.float64)
+
+        stats = np.zeros((self.channelCount, len(STATISTICS_FIELD_NAMES)), dtype=np.float64)
+        stats[:, 0] = np.sqrt(meanSquare)
+        stats[:, 1] = _max - _min
+        stats[:, 2] = _max
+        stats[:, 3] = _min
+        stats[:, 4] = np.sqrt(np.maximum(meanSquare - mean * mean, 0))
+
+        arrays = {}
+        arrays['samplingRate'] = np.int64(self.samplingRate)
+        arrays['chunkFrameCount'] = np.int64(self.chunkFrameCount)
+        arrays['fullScale'] = np.float64(fullScale)
+        arrays['binSizes'] = np.array(self.binSizes, dtype=np.int64)
+        for binSize in self.binSizes:
+            arrays[f"envelopeMin{binSize}"] = self.envelopeMins[binSize]
+            arrays[f"envelopeMax{binSize}"] = self.envelopeMaxs[binSize]
+        arrays['chunkRms'] = (np.sqrt(self.chunkSquareSums / chunkFrameCounts) / fullScale).astype(np.float32)
+        arrays['stats'] = stats / fullScale
+        arrays['statisticsFieldNames'] = np.array(STATISTICS_FIELD_NAMES)
+        return arrays
+
+    def save(self, filepath):
+        """ Save the sidecar (uncompressed npz) """
+        # np.savez adds .npz to a path without it, a file object keeps the given name
+        with open(filepath, 'wb') as f:
+            np.savez(f, **self.getArrays())
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    import tempfile
+    import time
+    from MaintletStatistics import computeChannelStatistics
+    rng = np.random.default_rng(0)
+    channelCount, chunkFrameCount, chunkCount = 2, 1200, 40
+    y = (rng.normal(size=(chunkFrameCount * chunkCount, channelCount)) * 3000).astype('<i2')
+    summary = MaintletFileSummary(channelCount, 2, 12000, chunkFrameCount, chunkCount)
+    startTime = time.time()
+    for i in range(chunkCount):
+        summary.update(i, y[i * chunkFrameCount:(i + 1) * chunkFrameCount].tobytes())
+    print(f"update {(time.time() - startTime) / chunkCount * 1e6:.1f} us per chunk")
+    filepath = getSummaryFilepath(os.path.join(tempfile.mkdtemp(), "a_b.wav"))
+    summary.save(filepath)
+    loaded = loadSummary(filepath)
+    print(filepath, os.path.getsize(filepath), "byte, PCM", y.nbytes, "byte")
+    print(np.allclose(loaded['stats'], computeChannelStatistics(y, scale=1 / 32768)))
+    envelopeMin, envelopeMax, binSize = getSummaryEnvelope(loaded, maxBinCount=200)
+    fullBinCount = len(y) // binSize
+    print(binSize, envelopeMin.shape, np.array_equal(envelopeMax[:fullBinCount, 0] * 32768, y[:fullBinCount * binSize, 0].reshape(-1, binSize).max(axis=1)))
+#============================= END OF TEST CODE ==============================
@@ -7,13 +7,62 @@
 #  @description    :  A class for database table entry
 #===========================================================================
 
-# Todo: use namedtuple instead
 # Todo: type safe
 # Todo: inheritance, create a base class ... 
 
 import json
+from operator import attrgetter
+
+# The column layout of the table: (attribute name, default value) in database order
+TABLE_COLUMNS = (
+    ('key', ''), # record time _ macaddress
+    ('filename', ''),
+    ('duration', 0),
+    ('samplingRate', 0),
+    ('sampleWidth', 0),
+    ('recordChunk', 0),
+    ('playbackSamplingRate', 0),
+    ('playbackSampleWidth', 0),
+    ('playbackChunk', 0),
+    ('playbackFileNames', ''), # need flatten
+    ('sensor1Type', ''),
+    ('sensor1Location', ''),
+    ('sensor2Type', ''),
+    ('sensor2Location', ''),
+    ('sensor3Type', ''),
+    ('sensor3Location', ''),
+    ('sensor4Type', ''),
+    ('sensor4Location', ''),
+    ('sensor5Type', ''),
+    ('sensor5Location', ''),
+    ('sensor6Type', ''),
+    ('sensor6Location', ''),
+    ('volumes', ''),
+    ('experimentName', ''),
+    ('experimentDescription', ''),
+    ('deviceMac', ''),
+    ('deviceDescription', ''),
+    ('recordTime', ''),
+    ('tableName', ''),
+    ('transactionStatus', ''), # finished unfinished evicted (the file was deleted to free disk space) lost (the process stopped before the file was written)
+    ('storageFormat', 'wav'), # wav, flac or mdz
+    ('compressionRatio', 0), # raw size / compressed size
+    ('compressionCpuTime', 0), # encoder CPU time in second
+    ('channelMap', ''), # captured channel index of each channel in the file, e.g., '0,1'
+    ('channelRates', ''), # sampling rate of each channel in the file, e.g., '48000,48000'
+    ('sensors', ''), # every sensor as name:type:location:channel, separated by ';' (sensor1 ... sensor6 are also in their own columns)
+    ('gaps', ''), # discontinuities of the file as offset:length (in frames of the file), separated by ',', e.g., '4800:120'
+)
+TABLE_COLUMN_NAMES = tuple(name for name, default in TABLE_COLUMNS)
+_getTableValues = attrgetter(*TABLE_COLUMN_NAMES) # entry -> tuple of values in column order
 
 class TableEntryForRecordedFile:
+    # no per-entry __dict__, the column layout is shared by all entries
+    # _publishMessage caches getTableEntryValuesForPublishMessage(), any column write clears it
+    __slots__ = TABLE_COLUMN_NAMES + ('_publishMessage',)
+    # computed once: the attributes of CREATE TABLE
+    _tableAttributes = str(TABLE_COLUMN_NAMES + ("PRIMARY KEY (key)",)).replace('"', '').replace("'", '')
+
     def __init__(self, message=''):
         """
         Init a table entry.
@@ -21,38 +70,35 @@ class TableEntryForRecordedFile:
         Args:
             message (str, optional): A formatted message which can be used to initialize a table entry. Defaults to ''.
         """        
-        self.key = '' # record time _ macaddress
-        self.filename = ''
-        self.duration = 0
-        self.samplingRate = 0
-        self.sampleWidth = 0
-        self.recordChunk = 0
-        self.playbackSamplingRate = 0
-        self.playbackSampleWidth = 0
-        self.playbackChunk = 0
-        self.playbackFileNames = '' # need flatten
-        self.sensor1Type = ''
-        self.sensor1Location = ''
-        self.sensor2Type = ''
-        self.sensor2Location = ''
-        self.sensor3Type = ''
-        self.sensor3Location = ''
-        self.sensor4Type = ''
-        self.sensor4Location = ''
-        self.sensor5Type = ''
-        self.sensor5Location = ''
-        self.sensor6Type = ''
-        self.sensor6Location = ''
-        self.volumes = ''
-        self.experimentName = ''
-        self.experimentDescription = ''
-        self.deviceMac = ''
-        self.deviceDescription = ''
-        self.recordTime = ''
-        self.tableName = ''
-        self.transactionStatus = '' # finished unfinished
+        for setValue, (name, default) in zip(_columnSetters, TABLE_COLUMNS):
+            setValue(self, default)
+        object.__setattr__(self, '_publishMessage', None)
         if message != '':
             self.initWithMessage(message)
+
+    def clone(self):
+        """
+        Copy the entry (all values are immutable, so a shallow copy is a full copy)
+
+        Returns:
+            TableEntryForRecordedFile: The new entry.
+        """
+        entry = TableEntryForRecordedFile.__new__(TableEntryForRecordedFile)
+        # the values are the same, so is the cached message
+        for setValue, value in zip(_columnSetters, _getTableValues(self)):
+            setValue(entry, value)
+        object.__setattr__(entry, '_publishMessage', self._publishMessage)
+        return entry
+
+    __copy__ = clone
+
+    def __deepcopy__(self, memo):
+        return self.clone()
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        # the values are immutable, so a write is the only way to change the cached message
+        object.__setattr__(self, '_publishMessage', None)
     
     def updateKey(self):
         """
@@ -71,42 +117,16 @@ class TableEntryForRecordedFile:
         The format should satisfy the tokenization below. 
 
         Args:
-            message (string): A tuple string
+            message (string): A tuple string of values in the order of TABLE_COLUMNS (getTableEntryValuesForPublishMessage),
+                              missing trailing columns (older tables) keep their default values
         """        
         if type(message) is tuple:
             pass
         elif type(message) is str:
             # convert string to tuple
             message = eval(message)
-        self.key = message[0] # record time _ macaddress
-        self.filename = message[1]
-        self.duration = message[2]
-        self.samplingRate = message[3]
-        self.sampleWidth = message[4]
-        self.recordChunk = message[5]
-        self.playbackSamplingRate = message[6]
-        self.playbackSampleWidth = message[7]
-        self.playbackChunk = message[8]
-        self.playbackFileNames = message[9]
-        self.sensor1Type = message[10]
-        self.sensor1Location = message[11]
-        self.sensor2Type = message[12]
-        self.sensor2Location = message[13]
-        self.sensor3Type = message[14]
-        self.sensor3Location = message[15]
-        self.sensor4Type = message[16]
-        self.sensor4Location = message[17]
-        self.sensor5Type = message[18]
-        self.sensor5Location = message[19]
-        self.sensor6Type = message[20]
-        self.sensor6Location = message[21]
-        self.experimentName = message[22]
-        self.experimentDescription = message[23]
-        self.deviceMac = message[24]
-        self.deviceDescription = message[25]
-        self.recordTime = message[26]
-        self.tableName = message[27]
-        self.transactionStatus = message[28]
+        for name, value in zip(TABLE_COLUMN_NAMES, message):
+            setattr(self, name, value)
 
     def getTableAttributes(self):
         """
@@ -119,15 +139,10 @@ class TableEntryForRecordedFile:
         (key, filename, duration, samplingRate, sampleWidth, recordChunk, playbackSamplingRate, playbackSampleWidth, 
         playbackChunk, playbackFileNames, sensor1Type, sensor1Location, sensor2Type, sensor2Location, sensor3Type, 
         sensor3Location, sensor4Type, sensor4Location, sensor5Type, sensor5Location, sensor6Type, sensor6Location, 
-        experimentName, experimentDescription, deviceMac, deviceDescription, recordTime, tableName, transactionStatus, 
-        PRIMARY KEY (key))
+        volumes, experimentName, experimentDescription, deviceMac, deviceDescription, recordTime, tableName, transactionStatus, 
+        storageFormat, compressionRatio, compressionCpuTime, channelMap, channelRates, sensors, gaps, PRIMARY KEY (key))
         """        
-        primaryKeysEntry = f"PRIMARY KEY (key)"
-        attributes = list(self.__dict__.keys())
-        attributes.append(primaryKeysEntry) 
-        attributes = tuple(attributes)
-        attributes = str(attributes).replace('"', '').replace("'", '')
-        return attributes
+        return self._tableAttributes
 
     def getTableEntryValuesForDatabase(self):
         """
@@ -136,18 +151,30 @@ class TableEntryForRecordedFile:
         Returns:
             list: A list of values of a table entry.
         """        
-        return [tuple(self.__dict__.values())]
+        return [_getTableValues(self)]
 
     def getTableEntryValuesForPublishMessage(self):
         """
         Get table values used for sending message.
 
         Returns:
-            string: A string can be used to compose a message.
+            string: A string can be used to compose a message (cached until a column is written).
         """        
-
-        return str(tuple(self.__dict__.values()))
+        message = self._publishMessage
+        if message == None:
+            message = str(_getTableValues(self))
+            object.__setattr__(self, '_publishMessage', message)
+        return message
  
+    def getColumnDefaults(self):
+        """
+        Get the columns with their default values, for adding the new columns to a table created by an older version
+
+        Returns:
+            tuple: (attribute name, default value) in database order.
+        """
+        return TABLE_COLUMNS
+
     def getAttributeCount(self):
         """
         Get the number of attributes in an entry
@@ -155,7 +182,16 @@ class TableEntryForRecordedFile:
         Returns:
             int: The number of attributes in an entry
         """
-        return len(tuple(self.__dict__.keys()))
+        return len(TABLE_COLUMN_NAMES)
+
+    def toDict(self):
+        """
+        Get the table entry in the dict format with key = attribute name, value = attribute value
+
+        Returns:
+            dict: A new dict in the order of TABLE_COLUMNS.
+        """
+        return dict(zip(TABLE_COLUMN_NAMES, _getTableValues(self)))
 
     def getTableEntryInDictFormat(self):
         """
@@ -164,14 +200,14 @@ class TableEntryForRecordedFile:
         Returns:
             dict: A table entry in the dict format.
         """
-        return self.__dict__
+        return self.toDict()
 
     def getDebugInfo(self):
         """
         For debug purpose, print all outputs of methods in this class. 
         """
         return f"""getTableAttributes: {self.getTableAttributes()}
-getAttriubteCount: {self.getAttriubteCount()}
+getAttributeCount: {self.getAttributeCount()}
 getTableValuesForDatabase: {self.getTableEntryValuesForDatabase()}
 getTableEntryValuesForPublishMessage: {self.getTableEntryValuesForPublishMessage()}
 getTableEntryInDictFormat: {self.getTableEntryInDictFormat()}"""
@@ -183,7 +219,10 @@ getTableEntryInDictFormat: {self.getTableEntryInDictFormat()}"""
         Returns:
             string: A formatted string of dict.
         """
-        return json.dumps(self.__dict__, indent=2) 
+        return json.dumps(self.toDict(), indent=2) 
+
+# the slot descriptors of the columns, they write a value without clearing the cached message
+_columnSetters = tuple(TableEntryForRecordedFile.__dict__[name].__set__ for name in TABLE_COLUMN_NAMES)
 
 #===========================================================================
 #                            TEST CODE
@@ -200,10 +239,26 @@ if __name__ == '__main__':
 
     print("Synthesized data")
     print("#######################################################")
-    tempTuple = tuple(f"{i+1}" for i in range(tableEntry.getAttriubteCount()))
+    tempTuple = tuple(f"{i+1}" for i in range(tableEntry.getAttributeCount()))
     tableEntry2 = TableEntryForRecordedFile(f"{tempTuple}")
     print(tableEntry2)
     print(tableEntry2.getDebugInfo())
+
+    print()
+
+    print("Clone")
+    print("#######################################################")
+    import copy
+    import timeit
+    tableEntry3 = tableEntry2.clone()
+    tableEntry3.filename = 'clone.wav'
+    print(tableEntry2.filename, tableEntry3.filename, TableEntryForRecordedFile(tableEntry3.getTableEntryValuesForPublishMessage()).toDict() == tableEntry3.toDict())
+    print(f"clone {timeit.timeit(tableEntry2.clone, number=10000) * 100:.2f} us, deepcopy of a dict-based entry",
+          f"{timeit.timeit(lambda: copy.deepcopy(tableEntry2.toDict()), number=10000) * 100:.2f} us")
+    # the cached message follows the column writes
+    tableEntry3.transactionStatus = 'finished'
+    print(eval(tableEntry3.getTableEntryValuesForPublishMessage())[TABLE_COLUMN_NAMES.index('transactionStatus')],
+          f"cached publish message {timeit.timeit(tableEntry3.getTableEntryValuesForPublishMessage, number=10000) * 100:.3f} us")
 #============================= END OF TEST CODE ==============================
 
     
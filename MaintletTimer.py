@@ -57,14 +57,19 @@ class MaintletTimer:
                 yield
             finally:
                 elapsedTime = time.time() - startTime
-                logger.info(f"{taskName}: {round(elapsedTime,5)} Seconds.")
-                if self.logging:
-                    timeRecord = [round(startTime,5), round(elapsedTime, 5)]
-                    if taskName not in self.timeRecords.keys():
-                        self.timeRecords[taskName] = []
-                    self.timeRecords[taskName].append(timeRecord)
+                self.addTime(taskName, startTime, elapsedTime)
         else:
             yield
+
+    def addTime(self, taskName, startTime, elapsedTime):
+        """ Record a duration measured outside of getTime (e.g., across threads) """
+        if self.record:
+            logger.info(f"{taskName}: {round(elapsedTime,5)} Seconds.")
+            if self.logging:
+                timeRecord = [round(startTime,5), round(elapsedTime, 5)]
+                if taskName not in self.timeRecords.keys():
+                    self.timeRecords[taskName] = []
+                self.timeRecords[taskName].append(timeRecord)
     
     def saveTimeToFile(self):
         if self.logging:
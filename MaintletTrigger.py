@@ -0,0 +1,149 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  Event trigger of the trigger record mode
+#                        (1) listen to the streaming features, a chunk triggers a record if a feature crosses its threshold
+#                            or the RMS changes faster than the change rate
+#                        (2) a keep-alive record is triggered if nothing is recorded for a while
+#                        (3) the record starts a pre-trigger window before the triggering chunk (taken from the ring buffer history)
+#===========================================================================
+
+#==========================================================================
+#                              Usage
+#   trigger = MaintletRecordTrigger(thresholds={'RMS': 0.2, 'Kurtosis': 8}, changeRate=1.0,
+#                                   preTriggerChunkCount=5, keepAliveChunkCount=600)
+#   streamingFeatures.addListener(trigger.onFeatures)          # called in the feature thread
+#
+#   In the file assembler (chunk seq, no file is open)
+#   startSeq = trigger.poll(seq, oldestSeq)                    # None: do not record
+#   ... record from startSeq to endSeq ...
+#   trigger.notifyRecorded(endSeq)
+#==========================================================================
+
+import threading
+import numpy as np
+from MaintletLog import logger
+from MaintletStatistics import ROLLING_FEATURE_NAMES
+
+class MaintletRecordTrigger:
+    def __init__(self, thresholds, changeRate, preTriggerChunkCount, keepAliveChunkCount):
+        """
+        Init the record trigger
+
+        Args:
+            thresholds (dict): feature name (ROLLING_FEATURE_NAMES) -> threshold, a chunk triggers if any channel is above it.
+            changeRate (float): A chunk triggers if the RMS of any channel changes by more than changeRate (relative) since the previous chunk. 0 disables it.
+            preTriggerChunkCount (int): The number of chunks recorded before the triggering chunk.
+            keepAliveChunkCount (int): A keep-alive record is triggered after keepAliveChunkCount chunks without record. 0 disables it.
+        """
+        for name in thresholds:
+            if name not in ROLLING_FEATURE_NAMES:
+                raise ValueError(f"Unknown trigger feature {name}, available features: {ROLLING_FEATURE_NAMES}")
+        self.thresholdIndices = [ROLLING_FEATURE_NAMES.index(name) for name in thresholds]
+        self.thresholdValues = np.array(list(thresholds.values()), dtype=np.float64)
+        self.rmsIndex = ROLLING_FEATURE_NAMES.index('RMS')
+        self.changeRate = float(changeRate)
+        self.preTriggerChunkCount = int(preTriggerChunkCount)
+        self.keepAliveChunkCount = int(keepAliveChunkCount)
+
+        self.lock = threading.Lock()
+        self.pendingSeq = None # the earliest triggering chunk which is not recorded yet
+        self.pendingReason = ''
+        self.lastRecordedSeq = None # the last chunk of the latest record
+        self.prevRms = None
+        self.totalTrigger = {'threshold': 0, 'changeRate': 0, 'keepAlive': 0} # records started by each reason
+
+    def onFeatures(self, seq, adcTime, features):
+        """
+        Check the features of a chunk (a listener of MaintletStreamingFeatures, called in the feature thread)
+
+        Args:
+            seq (int): The sequence number of the chunk.
+            adcTime (float): The ADC time of the chunk.
+            features (np.ndarray): The rolling features with shape (channel count, len(ROLLING_FEATURE_NAMES)).
+        """
+        reason = ''
+        if len(self.thresholdIndices) > 0 and np.any(features[:, self.thresholdIndices] > self.thresholdValues):
+            reason = 'threshold'
+        rms = features[:, self.rmsIndex]
+        if reason == '' and self.changeRate > 0 and self.prevRms is not None:
+            if np.any(np.abs(rms - self.prevRms) > self.changeRate * np.maximum(self.prevRms, 1e-6)):
+                reason = 'changeRate'
+        self.prevRms = rms.copy()
+        if reason == '':
+            return
+        with self.lock:
+            if self.lastRecordedSeq is not None and seq <= self.lastRecordedSeq:
+                # the chunk is already in a record
+                return
+            if self.pendingSeq is None:
+                self.pendingSeq = seq
+                self.pendingReason = reason
+
+    def poll(self, seq, oldestSeq):
+        """
+        Decide whether a record starts at a chunk (called by the file assembler when no file is open)
+
+        Args:
+            seq (int): The sequence number of the current chunk.
+            oldestSeq (int): The oldest chunk which is still available in the ring buffer.
+
+        Returns:
+            int: The first chunk of the record (at most seq), None if we do not record.
+        """
+        with self.lock:
+            if self.lastRecordedSeq is None:
+                # the keep-alive period starts with the first chunk
+                self.lastRecordedSeq = seq - 1
+            if self.pendingSeq is not None and self.pendingSeq <= seq:
+                triggerSeq, reason = self.pendingSeq, self.pendingReason
+                self.pendingSeq = None
+                startSeq = max(triggerSeq - self.preTriggerChunkCount, self.lastRecordedSeq + 1, oldestSeq)
+            elif self.keepAliveChunkCount > 0 and seq - self.lastRecordedSeq >= self.keepAliveChunkCount:
+                triggerSeq, reason = seq, 'keepAlive'
+                startSeq = seq
+            else:
+                return None
+        self.totalTrigger[reason] += 1
+        logger.info(f"RecordTrigger: {reason} at chunk {triggerSeq}, record from chunk {startSeq}")
+        return startSeq
+
+    def notifyRecorded(self, endSeq):
+        """ A record ends at chunk endSeq (called by the file assembler) """
+        with self.lock:
+            self.lastRecordedSeq = endSeq
+            if self.pendingSeq is not None and self.pendingSeq <= endSeq:
+                self.pendingSeq = None
+
+    def getStatus(self):
+        """
+        Get the statistics of the trigger
+
+        Returns:
+            dict: records started by each reason
+        """
+        return dict(self.totalTrigger)
+
+#===========================================================================
+#                            TEST CODE
+#===========================================================================
+if __name__ == '__main__':
+    trigger = MaintletRecordTrigger(thresholds={'RMS': 0.5}, changeRate=1.0, preTriggerChunkCount=3, keepAliveChunkCount=20)
+    quiet = np.full((2, len(ROLLING_FEATURE_NAMES)), 0.1)
+    loud = np.full((2, len(ROLLING_FEATURE_NAMES)), 0.6)
+    recordLength = 10
+    seq = 0
+    while seq < 60:
+        trigger.onFeatures(seq, seq * 0.1, loud if seq in (12, 13, 40) else quiet)
+        startSeq = trigger.poll(seq, oldestSeq=seq - 8)
+        if startSeq is not None:
+            endSeq = startSeq + recordLength - 1
+            print(f"record chunks {startSeq} - {endSeq}")
+            trigger.notifyRecorded(endSeq)
+            seq = endSeq
+        seq += 1
+    print(trigger.getStatus())
+#============================= END OF TEST CODE ==============================
@@ -30,7 +30,7 @@ from MaintletDatabase import MaintletDatabase
 from MaintletTable import TableEntryForRecordedFile
 from MaintletFileSystem import MaintletFileSystem
 from MaintletDataAnalysis import MaintletDataAnalysis
-from MaintletSharedObjects import fileSystemToDataAnalysisQ, networkingOutQ
+from MaintletSharedObjects import fileSystemToDataAnalysisQ, dataAnalysisToFileSystemQ, dataAnalysisToDataCollectionQ, dataCollectionToDataAnalysisQ, networkingOutQ
 from MaintletNetworkManager import MaintletNetworkManager
 import MaintletHTTPServer
 from MaintletGainControl import setMultiMixers, currentVolumes
@@ -83,11 +83,11 @@ if __name__ == "__main__":
     #currentVolumes = defaultVolumes # setup the default gains
     #setMultiMixers(currentVolumes)
     dataCollectionManager = MaintletDataCollection(databaseHandler=databaseManager)
-    fileSystemManager = MaintletFileSystem()
+    fileSystemManager = MaintletFileSystem(databaseHandler=databaseManager)
     dataAnalyser = MaintletDataAnalysis(networkManager=networkManager)
 
     # start processes and threads
-    dataAnalyserProcess = Process(target=dataAnalyser.run, args=(fileSystemToDataAnalysisQ, networkingOutQ), daemon=True)
+    dataAnalyserProcess = Process(target=dataAnalyser.run, args=(fileSystemToDataAnalysisQ, networkingOutQ, dataAnalysisToFileSystemQ, dataAnalysisToDataCollectionQ, dataCollectionToDataAnalysisQ), daemon=True)
     maintletHTTPServerProcess = Process(target=MaintletHTTPServer.run, daemon=True)
     dataCollectorThread = threading.Thread(target = dataCollectionManager.run, daemon=True)
     fileSystemManagerThread = threading.Thread(target = fileSystemManager.run, daemon=True)
@@ -0,0 +1,61 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  Micro-benchmark of MaintletPCM.decodePCM against the old convertRawToNpArray
+#                     Usage (from the repo root): python3 utilities/benchmarkPCM.py
+#===========================================================================
+
+import os
+import sys
+import timeit
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from MaintletPCM import decodePCM
+
+samplingRate = 48000
+channelCount = 8
+duration = 20 # unit: second
+repeat = 5
+
+def legacyConvertRawToNpArray(dataBuffer):
+    """ The 24-bit path of the old MaintletDataCollection.convertRawToNpArray (flat interleaved output) """
+    d3 = np.frombuffer(dataBuffer, dtype=np.uint8).reshape(-1, 3)
+    signs = np.array((d3[:, 2] >= 0x80) * 0xFF)
+    d4 = np.concatenate((d3, signs.reshape(-1, 1)), axis=1)
+    d4 = d4.flatten()
+    d4 = d4.astype(np.ubyte)
+    d4 = d4.tobytes()
+    dt = np.dtype(np.int32)
+    dt = dt.newbyteorder('<')
+    y = np.frombuffer(d4, dtype=dt)
+    return y
+
+def bench(name, func):
+    elapsedTime = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(f"{name:<40} {elapsedTime*1000:>10.2f} ms")
+    return elapsedTime
+
+if __name__ == '__main__':
+    frameCount = samplingRate * duration
+    print(f"{duration} S of {channelCount} channels at {samplingRate} Hz, best of {repeat}")
+    rng = np.random.default_rng(0)
+    samples = rng.integers(-(1 << 23), 1 << 23, size=frameCount * channelCount, dtype=np.int32)
+
+    # 24 bit
+    raw24 = samples.astype('<i4').view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    assert np.array_equal(legacyConvertRawToNpArray(raw24), decodePCM(raw24, 3, channelCount).flatten())
+    legacyTime = bench("legacy convertRawToNpArray (24 bit)", lambda: legacyConvertRawToNpArray(raw24))
+    newTime = bench("decodePCM (24 bit)", lambda: decodePCM(raw24, 3, channelCount))
+    print(f"{'speedup':<40} {legacyTime/newTime:>10.2f} x")
+    bench("decodePCM (24 bit, float32)", lambda: decodePCM(raw24, 3, channelCount, asFloat=True))
+
+    # 16 bit and 32 bit (not supported by the legacy implementation)
+    raw16 = (samples >> 8).astype('<i2').tobytes()
+    raw32 = samples.astype('<i4').tobytes()
+    bench("decodePCM (16 bit)", lambda: decodePCM(raw16, 2, channelCount))
+    bench("decodePCM (16 bit, float32)", lambda: decodePCM(raw16, 2, channelCount, asFloat=True))
+    bench("decodePCM (32 bit)", lambda: decodePCM(raw32, 4, channelCount))
+    bench("decodePCM (32 bit, float32)", lambda: decodePCM(raw32, 4, channelCount, asFloat=True))
@@ -0,0 +1,68 @@
+#===========================================================================
+#  ?                                ABOUT
+#  @author         :  Beitong Tian
+#  @email          :  beitong2@illinois.edu
+#  @repo           :  NA
+#  @createdOn      :  10/17/2026
+#  @description    :  Convert the record folders of experiment folders to another layout (flat, daily or hourly)
+#                     Usage (from the repo root): python3 utilities/migrateRecordLayout.py hourly results/10-17-2026-11-14-23 [...] [--dry-run]
+#                        (1) record files and their sidecars are renamed in place (no copy), a file already in place is skipped
+#                        (2) partial files (*.part) and names without timestamp are left at the top of the record folder
+#                        (3) shards left empty are removed, the database keeps the filenames so it needs no update
+#                        (4) stop the Maintlet processes of an experiment before migrating it
+#===========================================================================
+
+import argparse
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from MaintletStorageLayout import RECORD_FOLDER_LAYOUTS, getRecordFilepath, scanRecordFolder
+
+recordFolderName = 'records' # pathNameConfig["recordFolderName"], MaintletConfig is not imported because it creates an experiment folder
+
+def migrateRecordFolder(recordFolderPath, layout, isDryRun=False):
+    """
+    Move every file of a record folder to its place in a layout
+
+    Args:
+        recordFolderPath (str): The record folder of an experiment.
+        layout (str): A key of RECORD_FOLDER_LAYOUTS.
+        isDryRun (bool, optional): Only count the moves. Defaults to False.
+
+    Returns:
+        dict: movedFile, keptFile and removedFolder.
+    """
+    result = {'movedFile': 0, 'keptFile': 0, 'removedFolder': 0}
+    # list first, the scan must not see the files it has moved
+    for entry in list(scanRecordFolder(recordFolderPath)):
+        if entry.name.endswith('.part'):
+            result['keptFile'] += 1
+            continue
+        filepath = getRecordFilepath(recordFolderPath, entry.name, layout)
+        if os.path.normpath(filepath) == os.path.normpath(entry.path):
+            result['keptFile'] += 1
+            continue
+        if not isDryRun:
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            os.replace(entry.path, filepath)
+        result['movedFile'] += 1
+    if not isDryRun:
+        # remove the empty shards, deepest first
+        for folderPath, folderNames, filenames in os.walk(recordFolderPath, topdown=False):
+            if os.path.normpath(folderPath) != os.path.normpath(recordFolderPath) and len(os.listdir(folderPath)) == 0:
+                os.rmdir(folderPath)
+                result['removedFolder'] += 1
+    return result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert the record folders of experiment folders to another layout")
+    parser.add_argument('layout', choices=list(RECORD_FOLDER_LAYOUTS))
+    parser.add_argument('experimentFolderPaths', nargs='+', help="experiment folders (e.g., results/10-17-2026-11-14-23) or record folders")
+    parser.add_argument('--dry-run', dest='isDryRun', action='store_true', help="only count the files to move")
+    args = parser.parse_args()
+    for path in args.experimentFolderPaths:
+        recordFolderPath = path if os.path.basename(os.path.normpath(path)) == recordFolderName else os.path.join(path, recordFolderName)
+        if not os.path.isdir(recordFolderPath):
+            print(f"{recordFolderPath}: not a folder, skip it")
+            continue
+        print(f"{recordFolderPath}: {migrateRecordFolder(recordFolderPath, args.layout, args.isDryRun)}")